@@ -0,0 +1,311 @@
+"""
+Asyncio API Gateway for Library Management System
+ASGI app serving the same /api/* route table as gateway.py. Proxied calls go
+through one shared aiohttp connection pool per upstream, so a single process
+keeps thousands of upstream calls in flight without pinning a thread to each.
+Routes the gateway answers itself (login, signup, stats) fall through to the
+Flask gateway
+
+Run: uvicorn async_gateway:create_app --factory --port 5000
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import asynccontextmanager
+
+import aiohttp
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import gateway
+from utils import identity, pagination, upstream
+from utils.breaker import Bulkhead, CircuitBreaker, UpstreamUnavailable
+from utils.proxy_routes import (PROXY_ROUTES, CACHE_TTLS, PURGES, STREAMED_UPLOADS, STREAMED_DOWNLOADS,
+                                FORWARD_REQUEST_HEADERS, FORWARD_RESPONSE_HEADERS, CHUNK_SIZE, UNAVAILABLE,
+                                error_envelope, needs_error_envelope, starlette_path)
+from utils.singleflight import AsyncSingleFlight
+
+ASYNC_POOL_SIZE = int(os.environ.get('ASYNC_UPSTREAM_POOL_SIZE', 512))
+UPSTREAM_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, UpstreamUnavailable)
+UpstreamResponse = namedtuple('UpstreamResponse', 'status headers body')
+CORS_ORIGINS = ['http://localhost:4200', 'http://localhost:3000', 'http://frontend', 'http://localhost']
+
+
+class AsyncUpstream:
+    """Shared aiohttp connection pool to one backend service; paths are relative to base_url"""
+
+    def __init__(self, name, base_url, pool_size=ASYNC_POOL_SIZE,
+                 connect_timeout=upstream.CONNECT_TIMEOUT, read_timeout=upstream.READ_TIMEOUT,
+                 breaker=None, bulkhead=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        # In-flight calls cost a socket rather than a thread here, so the cap tracks the pool
+        self.bulkhead = bulkhead or Bulkhead(max_concurrent=pool_size)
+        self.session = None  # opened on the serving event loop by start()
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size),
+            # Bodies are passed through as-is, Content-Encoding and all
+            auto_decompress=False,
+            # Waiting for a free pooled connection counts against the read budget
+            timeout=aiohttp.ClientTimeout(connect=self.timeout[1], sock_connect=self.timeout[0],
+                                          sock_read=self.timeout[1]),
+        )
+
+    async def request(self, method, path, stream=False, **kwargs):
+        """Send one request and return the fully read response; with stream=True
+        return the open aiohttp response instead, which the caller must release"""
+        if not self.bulkhead.acquire():
+            raise UpstreamUnavailable('too many requests in flight')
+        try:
+            if not self.breaker.allow():
+                raise UpstreamUnavailable('circuit open', retry_after=self.breaker.retry_after())
+            with self._lock:
+                self.requests += 1
+            started, failed = time.monotonic(), True
+            try:
+                response = await self.session.request(method, self.base_url + path, **kwargs)
+                if stream:
+                    failed = response.status >= 500
+                    return response
+                try:
+                    body = await response.read()
+                finally:
+                    response.release()
+                failed = response.status >= 500
+                return UpstreamResponse(response.status, response.headers, body)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                with self._lock:
+                    self.errors += 1
+                raise
+            finally:
+                self.breaker.record(failed, time.monotonic() - started)
+        finally:
+            self.bulkhead.release()
+
+    def stats(self):
+        connector = self.session.connector if self.session else None
+        idle = sum(len(conns) for conns in connector._conns.values()) if connector else 0
+        busy = len(connector._acquired) if connector else 0
+        with self._lock:
+            return {
+                'url': self.base_url,
+                'requests': self.requests,
+                'errors': self.errors,
+                'openConnections': idle + busy,
+                'idleConnections': idle,
+                'poolSize': self.pool_size,
+                'timeout': {'connect': self.timeout[0], 'read': self.timeout[1]},
+                'breaker': self.breaker.stats(),
+                'bulkhead': self.bulkhead.stats(),
+            }
+
+    async def aclose(self):
+        if self.session:
+            await self.session.close()
+
+
+def _cors_headers(request):
+    """Same CORS headers gateway.py adds in after_request"""
+    headers = {}
+    origin = request.headers.get('origin')
+    if origin in CORS_ORIGINS:
+        headers['Access-Control-Allow-Origin'] = origin
+    headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization,X-Requested-With'
+    headers['Access-Control-Allow-Methods'] = 'GET,PUT,POST,DELETE,OPTIONS'
+    headers['Access-Control-Allow-Credentials'] = 'true'
+    return headers
+
+
+def unavailable(request, route, error):
+    headers = _cors_headers(request)
+    if isinstance(error, UpstreamUnavailable):
+        headers['Retry-After'] = str(error.retry_after)
+    return JSONResponse({'error': f'{UNAVAILABLE[route.upstream]}: {error!s}'}, status_code=503, headers=headers)
+
+
+async def cached_read(request, service, route, cache, flights, path, headers):
+    """Async counterpart of gateway._cached_read"""
+    ttl, stale_ttl = CACHE_TTLS[route.endpoint]
+    headers.pop('If-None-Match', None)
+    params = request.query_params.multi_items()
+    key = (route.endpoint, request.path_params.get('book_id'), request.url.query.encode(), headers['Accept-Encoding'])
+
+    async def fetch():
+        response = await service.request('GET', path, params=params, headers=headers)
+        return (response.status,
+                [(name, response.headers[name]) for name in FORWARD_RESPONSE_HEADERS if name in response.headers],
+                response.body)
+
+    async def fetch_shared():
+        return await flights.do(key, fetch)
+
+    async def refresh(epoch):
+        try:
+            status, response_headers, body = await fetch_shared()
+            if status == 200:
+                cache.store(key, epoch, response_headers, body, ttl, stale_ttl)
+        except UPSTREAM_ERRORS:
+            pass  # keep serving the stale copy until it expires
+        finally:
+            cache.finish_refresh(key)
+
+    entry, state = cache.lookup(key)
+    if state == 'STALE' and cache.claim_refresh(key):
+        task = asyncio.ensure_future(refresh(cache.epoch))
+        request.app.state.background.add(task)
+        task.add_done_callback(request.app.state.background.discard)
+
+    if entry is None:
+        epoch = cache.epoch
+        try:
+            status, response_headers, body = await fetch_shared()
+        except UPSTREAM_ERRORS as e:
+            return unavailable(request, route, e)
+        if needs_error_envelope(status, dict(response_headers).get('Content-Type')):
+            return JSONResponse(error_envelope(status), status_code=status, headers=_cors_headers(request))
+        if status != 200:
+            return Response(body, status_code=status, headers={**dict(response_headers), **_cors_headers(request)})
+        cache.store(key, epoch, response_headers, body, ttl, stale_ttl)
+    else:
+        response_headers, body = entry.headers, entry.body
+
+    headers = {**dict(response_headers), **_cors_headers(request), 'X-Gateway-Cache': state}
+    etag = headers.get('ETag')
+    if etag and request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag, 'X-Gateway-Cache': state, **_cors_headers(request)})
+    return Response(body, headers=headers)
+
+
+def _identity_header(flask_app, authorization):
+    """gateway.identity_header in the Flask app's context; checking revocations
+    can query SQLite, so callers run this on a worker thread"""
+    with flask_app.app_context():
+        return gateway.identity_header(authorization)
+
+
+def streamed(request, response):
+    """Relay an open upstream response chunk by chunk; nothing is buffered"""
+    if needs_error_envelope(response.status, response.headers.get('Content-Type')):
+        response.release()
+        return JSONResponse(error_envelope(response.status), status_code=response.status,
+                            headers=_cors_headers(request))
+
+    async def body():
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                yield chunk
+        finally:
+            response.release()
+
+    headers = {name: response.headers[name] for name in FORWARD_RESPONSE_HEADERS if name in response.headers}
+    headers.update(_cors_headers(request))
+    return StreamingResponse(body(), status_code=response.status, headers=headers)
+
+
+def proxy(route):
+    """Endpoint forwarding one route-table entry to its upstream"""
+    async def endpoint(request):
+        if request.method == 'OPTIONS':
+            return JSONResponse(None, headers=_cors_headers(request))
+
+        service = request.app.state.upstreams[route.upstream]
+        cache = request.app.state.response_cache
+        headers = {name: request.headers[name] for name in FORWARD_REQUEST_HEADERS if name in request.headers}
+        headers.setdefault('Accept-Encoding', 'identity')
+        path = route.target.format(**request.path_params)
+        # Unbounded listings are relayed as they stream, never cached
+        download = route.endpoint in STREAMED_DOWNLOADS or request.query_params.get('limit') == pagination.UNBOUNDED
+        if route.endpoint in CACHE_TTLS and not download:
+            return await cached_read(request, service, route, cache, request.app.state.single_flight, path, headers)
+        authorization = request.headers.get('authorization')
+        if authorization and identity.enabled():
+            headers.update(await run_in_threadpool(_identity_header, request.app.state.flask_app, authorization))
+
+        if route.endpoint in STREAMED_UPLOADS:
+            body = {'data': request.stream(),
+                    'timeout': aiohttp.ClientTimeout(sock_connect=service.timeout[0],
+                                                     sock_read=STREAMED_UPLOADS[route.endpoint])}
+        else:
+            body = {'data': await request.body() or None}
+
+        try:
+            response = await service.request(route.method, path,
+                                             params=request.query_params.multi_items(), headers=headers,
+                                             stream=download, **body)
+        except UPSTREAM_ERRORS as e:
+            return unavailable(request, route, e)
+        if download:
+            return streamed(request, response)
+
+        if route.endpoint in PURGES and response.status < 400:
+            param = PURGES[route.endpoint]
+            cache.purge(book_id=request.path_params.get(param), all_books=param == '*')
+
+        if needs_error_envelope(response.status, response.headers.get('Content-Type')):
+            return JSONResponse(error_envelope(response.status), status_code=response.status,
+                                headers=_cors_headers(request))
+
+        headers = {name: response.headers[name] for name in FORWARD_RESPONSE_HEADERS if name in response.headers}
+        headers.update(_cors_headers(request))
+        return Response(response.body, status_code=response.status, headers=headers)
+
+    endpoint.__name__ = route.endpoint
+    return endpoint
+
+
+def create_app():
+    """ASGI application factory"""
+    upstreams = {
+        'book-service': AsyncUpstream('book-service', os.environ.get('BOOK_SERVICE_URL', 'http://book-service:5001')),
+        'member-service': AsyncUpstream('member-service', os.environ.get('MEMBER_SERVICE_URL', 'http://member-service:5002')),
+        'transaction-service': AsyncUpstream('transaction-service', os.environ.get('TRANSACTION_SERVICE_URL', 'http://transaction-service:5003')),
+    }
+
+    # Login, signup and the stats endpoint stay in Flask; its stats report these pools
+    flask_app = gateway.create_app()
+    flask_app.extensions['upstreams'] = upstreams
+    response_cache = flask_app.extensions['response_cache']
+    single_flight = flask_app.extensions['single_flight'] = AsyncSingleFlight()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        for service in upstreams.values():
+            await service.start()
+        yield
+        for service in upstreams.values():
+            await service.aclose()
+
+    routes = [Route(starlette_path(route.rule), proxy(route), methods=[route.method, 'OPTIONS'])
+              for route in PROXY_ROUTES]
+    routes.append(Mount('/', app=WSGIMiddleware(flask_app)))
+
+    app = Starlette(routes=routes, lifespan=lifespan)
+    app.state.flask_app = flask_app  # app context for JWT verification
+    app.state.upstreams = upstreams
+    app.state.response_cache = response_cache
+    app.state.single_flight = single_flight
+    app.state.background = set()  # in-flight stale-while-revalidate refreshes
+    return app
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 5000))
+    print(f"\n🚀 Starting async Gateway server on port {port}")
+    uvicorn.run(create_app(), host='0.0.0.0', port=port)
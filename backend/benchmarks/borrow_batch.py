@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Circulation desk throughput: batch vs per-item borrow and return
+The transaction-service runs in its own process; desks check a few books out
+to each patron and back in again, once with one request per book and once
+with one POST /borrow/batch plus one POST /return/batch per patron
+
+Usage: python -m benchmarks.borrow_batch [--patrons 100] [--books 8] [--desks 8]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+
+import app as app_module
+import transaction_service
+from benchmarks.gateway_passthrough import free_port, wait_for_port
+from utils import claims
+
+
+def setup_database(path, patrons, titles):
+    """Schema plus enough copies of every title for each patron to hold one"""
+    app_module.DATABASE = path
+    app_module.init_db()
+
+    conn = sqlite3.connect(path)
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl)
+        VALUES (?, 'Author', '', 'Fiction', 2024, '', ?, ?, '')
+    ''', [(f'Title {i}', patrons, patrons) for i in range(titles)])
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role, isActive)
+        VALUES (?, 'x', 'Desk', 'Patron', 'member', 1)
+    ''', [(f'patron{i}@test.com',) for i in range(patrons)])
+    conn.commit()
+    conn.close()
+
+
+def serve(path, port):
+    import logging
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    transaction_service.DATABASE = path
+    make_server('127.0.0.1', port, transaction_service.app, threaded=True).serve_forever()
+
+
+def patron_tokens(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT * FROM users WHERE email LIKE 'patron%'").fetchall()
+    conn.close()
+    with transaction_service.app.app_context():
+        return [create_access_token(identity=str(row['id']), additional_claims=claims.token_claims(row))
+                for row in rows]
+
+
+def per_item_visit(base, token, book_ids):
+    session = requests.Session()
+    session.headers['Authorization'] = f'Bearer {token}'
+    loans = []
+    for book_id in book_ids:
+        response = session.post(f'{base}/borrow/{book_id}', json={})
+        assert response.status_code == 201, response.text
+        loans.append(response.json()['id'])
+    for transaction_id in loans:
+        response = session.post(f'{base}/return/{transaction_id}', json={})
+        assert response.status_code == 200, response.text
+    return 2 * len(book_ids)
+
+
+def batch_visit(base, token, book_ids):
+    session = requests.Session()
+    session.headers['Authorization'] = f'Bearer {token}'
+    response = session.post(f'{base}/borrow/batch', json={'bookIds': book_ids})
+    assert response.json()['failed'] == 0, response.text
+    loans = [int(result['transaction']['id']) for result in response.json()['results']]
+    response = session.post(f'{base}/return/batch', json={'transactionIds': loans})
+    assert response.json()['failed'] == 0, response.text
+    return 2 * len(book_ids)
+
+
+def run(visit, base, visits, desks):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=desks) as pool:
+        items = sum(pool.map(lambda args: visit(base, *args), visits))
+    return items, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--patrons', type=int, default=100)
+    parser.add_argument('--books', type=int, default=8, help='books per patron visit')
+    parser.add_argument('--titles', type=int, default=200)
+    parser.add_argument('--desks', type=int, default=8, help='concurrent circulation desks')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    setup_database(path, args.patrons, args.titles)
+    tokens = patron_tokens(path)
+    rng = random.Random(17)
+    visits = [(token, rng.sample(range(1, args.titles + 1), args.books)) for token in tokens]
+
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(path, port), daemon=True)
+    server.start()
+    wait_for_port(port)
+    base = f'http://127.0.0.1:{port}'
+
+    try:
+        for label, visit in (('per-item', per_item_visit), ('batch', batch_visit)):
+            items, wall = run(visit, base, visits, args.desks)
+            print(f"[{label:>8}] {items} borrows+returns in {wall:6.2f}s   {items / wall:8.1f} items/s")
+    finally:
+        server.terminate()
+        server.join()
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(path + suffix)
+            except OSError:
+                pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
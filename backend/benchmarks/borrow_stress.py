@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Checkout-rush stress test for the borrow path
+Many workers race for the last copies of one book; the run fails if more
+loans are issued than copies exist
+
+Usage: python -m benchmarks.borrow_stress [--workers 64] [--copies 5] [--naive]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from utils import circulation
+from utils.db import ConnectionManager
+
+
+def setup_database(path, workers, copies):
+    """Create the schema with one contended book and one member per worker"""
+    app_module.DATABASE = path
+    app_module.init_db()
+
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        INSERT INTO books (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl)
+        VALUES ('Contended Title', 'Author', '', 'Fiction', 2024, '', ?, ?, '')
+    ''', (copies, copies))
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role, isActive)
+        VALUES (?, 'x', 'Load', 'Tester', 'member', 1)
+    ''', [(f'load{i}@test.com',) for i in range(workers)])
+    conn.commit()
+    conn.close()
+
+
+def naive_borrow(conn, book_id, user_id, due_date):
+    """The original read-check-write sequence, kept for comparison"""
+    row = conn.execute("SELECT availableCopies FROM books WHERE id = ?", (book_id,)).fetchone()
+    if row[0] <= 0:
+        raise circulation.CirculationError('Book not available')
+    time.sleep(0.001)  # the gap between check and write that a busy worker sees
+    conn.execute('''
+        INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status)
+        VALUES (?, ?, 'issue', ?, ?, 'active')
+    ''', (book_id, user_id, datetime.now(), due_date))
+    conn.execute("UPDATE books SET availableCopies = availableCopies - 1 WHERE id = ?", (book_id,))
+    conn.commit()
+
+
+def run(workers, copies, naive=False):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        setup_database(path, workers, copies)
+        db_pool = ConnectionManager(path)
+        borrow = naive_borrow if naive else circulation.borrow_book
+
+        barrier = threading.Barrier(workers)
+        results = {'ok': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker(user_id):
+            conn = db_pool.connect()
+            barrier.wait()
+            try:
+                borrow(conn, 1, user_id, datetime.now() + timedelta(days=14))
+                outcome = 'ok'
+            except circulation.CirculationError:
+                outcome = 'rejected'
+            except sqlite3.Error:
+                outcome = 'errors'
+            finally:
+                conn.close()
+            with lock:
+                results[outcome] += 1
+
+        threads = [threading.Thread(target=worker, args=(i + 1,)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        conn = sqlite3.connect(path)
+        available = conn.execute("SELECT availableCopies FROM books WHERE id = 1").fetchone()[0]
+        loans = conn.execute("SELECT COUNT(*) FROM transactions WHERE bookId = 1 AND status = 'active'").fetchone()[0]
+        conn.close()
+        db_pool.close_all()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(path + suffix)
+            except OSError:
+                pass
+
+    return {
+        'elapsed': elapsed,
+        'issued': results['ok'],
+        'rejected': results['rejected'],
+        'errors': results['errors'],
+        'loans': loans,
+        'available': available,
+        'oversold': loans > copies or available < 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--copies', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--naive', action='store_true', help='run the old unlocked borrow path')
+    args = parser.parse_args()
+
+    mode = 'naive' if args.naive else 'immediate'
+    oversold_rounds = 0
+    for round_no in range(1, args.rounds + 1):
+        result = run(args.workers, args.copies, args.naive)
+        oversold_rounds += result['oversold']
+        print(f"[{mode}] round {round_no}: {result['issued']} issued, {result['rejected']} rejected, "
+              f"{result['errors']} errors, {result['loans']} active loans, "
+              f"availableCopies={result['available']} ({result['elapsed'] * 1000:.1f} ms)")
+
+    if oversold_rounds:
+        print(f"❌ Oversold in {oversold_rounds}/{args.rounds} rounds")
+        return 1
+    print(f"✅ No oversell across {args.rounds} rounds of {args.workers} workers for {args.copies} copies")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
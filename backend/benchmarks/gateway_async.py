@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Slow-upstream load against the Flask and asyncio gateways
+A stand-in member-service answers every request after a fixed delay; many
+concurrent clients hit /api/members (not cached by the gateway) through each gateway and we report
+throughput and latency. The Flask gateway holds one server thread per
+in-flight call, the asyncio gateway only a pooled socket
+
+Usage: python -m benchmarks.gateway_async [--clients 200] [--requests 5] [--delay 0.2] [--threads 32]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+import async_gateway
+import gateway
+
+
+class BoundedWSGIServer(ThreadedWSGIServer):
+    """Threaded werkzeug server capped at a fixed number of request threads,
+    like a gunicorn worker with --threads"""
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'nothing listening on port {port}')
+
+
+def slow_member_service(port, delay):
+    async def members(request):
+        await asyncio.sleep(delay)
+        return JSONResponse([{'id': 1, 'email': 'member@library.com', 'firstName': 'John'}])
+
+    app = Starlette(routes=[Route('/members', members)])
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='error', backlog=4096)
+
+
+def flask_gateway(port, threads):
+    server = BoundedWSGIServer('127.0.0.1', port, gateway.create_app(), threads=threads,
+                               handler=QuietHandler)
+    server.socket.listen(4096)
+    server.serve_forever()
+
+
+def asyncio_gateway(port):
+    uvicorn.run(async_gateway.create_app(), host='127.0.0.1', port=port, log_level='error', backlog=4096)
+
+
+def spawn(target, port, *args):
+    """Each server gets its own process (and GIL) so the load generator and
+    the stand-in upstream don't compete with the gateway under test"""
+    process = multiprocessing.Process(target=target, args=(port, *args), daemon=True)
+    process.start()
+    wait_for_port(port)
+    return process
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def load(url, clients, requests):
+    latencies = []
+    statuses = {}
+    connector = aiohttp.TCPConnector(limit=clients)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as client:
+        async def worker():
+            for _ in range(requests):
+                started = time.perf_counter()
+                try:
+                    async with client.get(url + '/api/members') as response:
+                        await response.read()
+                        status = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    status = 'error'
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'elapsed': elapsed,
+        'statuses': statuses,
+        'rate': statuses.get(200, 0) / elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+    }
+
+
+def report(label, result):
+    codes = ', '.join(f'{count}x{status}' for status, count in sorted(result['statuses'].items(), key=str))
+    print(f"[{label:>12}] {result['rate']:8.1f} req/s ({codes}) in {result['elapsed']:.2f}s   "
+          f"p50 {result['p50']:7.1f} ms  p99 {result['p99']:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=5, help='requests per client')
+    parser.add_argument('--delay', type=float, default=0.2, help='upstream latency in seconds')
+    parser.add_argument('--threads', type=int, default=32, help='Flask gateway request threads')
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    os.environ['MEMBER_SERVICE_URL'] = f'http://127.0.0.1:{upstream_port}'
+    servers = [spawn(slow_member_service, upstream_port, args.delay)]
+    try:
+        for label, target, extra in ((f'flask x{args.threads}', flask_gateway, (args.threads,)),
+                                     ('asyncio', asyncio_gateway, ())):
+            port = free_port()
+            servers.append(spawn(target, port, *extra))
+            report(label, asyncio.run(load(f'http://127.0.0.1:{port}', args.clients, args.requests)))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.join()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Gateway CPU cost per MB proxied
+A stand-in transaction-service (own process) returns a large transaction
+list; the gateway fetches it repeatedly through the byte pass-through proxy
+and through the old parse-and-jsonify path, and we report gateway CPU time per MB for each
+
+Usage: python -m benchmarks.gateway_passthrough [--transactions 20000] [--requests 20]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify
+
+import gateway
+
+
+def transaction_list(count):
+    return json.dumps([{
+        'id': i, 'bookId': i % 800, 'userId': i % 300, 'type': 'issue',
+        'issueDate': '2024-01-15T10:30:00', 'dueDate': '2024-01-29T10:30:00', 'returnDate': None,
+        'status': 'active', 'fine': 0, 'bookTitle': f'Book {i % 800}', 'bookAuthor': f'Author {i % 500}',
+        'userName': f'Member {i % 300}', 'userEmail': f'member{i % 300}@library.com',
+    } for i in range(count)]).encode()
+
+
+def serve_transactions(port, count):
+    body = transaction_list(count)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'nothing listening on port {port}')
+
+
+def measure(client, path, requests):
+    size = 0
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path)
+        assert response.status_code == 200
+        size += len(response.data)
+    return size / 2**20, time.process_time() - cpu, time.perf_counter() - wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--transactions', type=int, default=20000, help='transactions in the proxied list')
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    port = free_port()
+    upstream = multiprocessing.Process(target=serve_transactions, args=(port, args.transactions), daemon=True)
+    upstream.start()
+    wait_for_port(port)
+    os.environ['TRANSACTION_SERVICE_URL'] = f'http://127.0.0.1:{port}'
+
+    try:
+        app = gateway.create_app()
+        transaction_service = app.extensions['upstreams']['transaction-service']
+
+        # The pre-pass-through handler: decode the upstream JSON and re-encode it
+        @app.route('/api/transactions-reparsed')
+        def reparsed():
+            response = transaction_service.get('/transactions')
+            return jsonify(response.json()), response.status_code
+
+        client = app.test_client()
+        client.get('/api/transactions').data  # warm the connection pool
+        for label, path in (('reparse', '/api/transactions-reparsed'), ('pass-through', '/api/transactions')):
+            mb, cpu, wall = measure(client, path, args.requests)
+            print(f"[{label:>12}] {mb:7.1f} MB in {wall:6.2f}s   "
+                  f"{cpu / mb * 1000:7.1f} ms CPU/MB   {mb / wall:7.1f} MB/s")
+    finally:
+        upstream.terminate()
+        upstream.join()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
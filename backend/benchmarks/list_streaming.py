@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Time to first byte and server peak memory of an unbounded list response
+The app runs in a fresh process per mode so its peak RSS (VmHWM) belongs to
+that mode alone: GET /api/books?limit=all streamed off the sqlite cursor,
+against fetching every row and building the whole body before sending it
+
+Usage: python -m benchmarks.list_streaming [--books 300000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+
+import app as app_module
+from benchmarks.gateway_passthrough import free_port, wait_for_port
+from utils import db, pagination
+
+# Memory-mapped database pages count toward RSS but are page cache, not
+# response memory; without the mapping, peak RSS is what each path allocates
+db.CONNECTION_PRAGMAS = tuple(pragma for pragma in db.CONNECTION_PRAGMAS if 'mmap_size' not in pragma)
+
+
+def setup_database(path, books):
+    app_module.DATABASE = path
+    app_module.init_db()
+
+    conn = sqlite3.connect(path)
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl)
+        VALUES (?, ?, ?, 'Fiction', 2001, ?, 3, 3, 'https://via.placeholder.com/150x200')
+    ''', ((f'Title {i}', f'Author {i % 500}', f'978{i:010d}', f'Description of book {i}. ' * 4)
+          for i in range(books)))
+    conn.commit()
+    conn.close()
+
+
+def buffered_respond(page, cursor, db_pool, render=None):
+    """Page.respond without streaming: every row fetched, then one body"""
+    rows, next_cursor = page.split(cursor.fetchall())
+    if render is not None:
+        return page.response([render(row) for row in rows], next_cursor)
+    opening, closing = page._envelope(next_cursor)
+    return app_module.app.response_class(opening + ','.join([row['json'] for row in rows]).encode() + closing,
+                                         mimetype='application/json')
+
+
+def serve(path, port, buffered):
+    import logging
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    if buffered:
+        pagination.Page.respond = buffered_respond
+    app_module.DATABASE = path
+    make_server('127.0.0.1', port, app_module.app, threaded=True).serve_forever()
+
+
+def peak_rss_mb(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def measure(path, buffered, token):
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(path, port, buffered), daemon=True)
+    server.start()
+    try:
+        wait_for_port(port)
+        baseline = peak_rss_mb(server.pid)
+        start = time.perf_counter()
+        response = requests.get(f'http://127.0.0.1:{port}/api/books?limit=all', stream=True,
+                                headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200, response.text
+        size, first_byte = 0, None
+        for chunk in response.iter_content(64 * 1024):
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+        return first_byte, time.perf_counter() - start, size, baseline, peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=300000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        setup_database(path, args.books)
+        with app_module.app.app_context():
+            token = create_access_token(identity='1', additional_claims={
+                'role': 'admin', 'isActive': True, 'authVersion': 0})
+        for label, buffered in (('stream', False), ('buffered', True)):
+            first_byte, wall, size, baseline, peak = measure(path, buffered, token)
+            print(f"[{label:>8}] {args.books:,} books  {size / 2**20:7.1f} MB   TTFB {first_byte * 1000:8.1f} ms   "
+                  f"total {wall:6.2f}s   peak RSS {peak:7.1f} MB (idle {baseline:.1f} MB)")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(path + suffix)
+            except OSError:
+                pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Morning login wave against the raw-sqlite app
+Many clients log in at once while one client keeps reading a book; reports
+login throughput and how long the cheap read waits behind password hashing,
+with hashing inline on the request threads and in the process pool
+
+Usage: python -m benchmarks.login_throughput [--clients 32] [--logins 4] [--workers 4]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+import app as app_module
+from utils import passwords
+
+
+def setup_database(path, clients):
+    app_module.DATABASE = path
+    app_module.init_db()
+
+    password_hash = generate_password_hash('password123', method=passwords.PASSWORD_METHOD)
+    conn = sqlite3.connect(path)
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role, isActive)
+        VALUES (?, ?, 'Load', 'Tester', 'member', 1)
+    ''', [(f'load{i}@test.com', password_hash) for i in range(clients)])
+    conn.execute('''
+        INSERT INTO books (title, author, category, totalCopies, availableCopies)
+        VALUES ('Probe', 'Author', 'Fiction', 1, 1)
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def run(clients, logins, hasher):
+    app_module.password_hasher = hasher
+    app_module.app.config['TESTING'] = True
+    statuses = {}
+    lock = threading.Lock()
+    done = threading.Event()
+    probe_ms = []
+
+    def login_worker(i):
+        client = app_module.app.test_client()
+        for _ in range(logins):
+            status = client.post('/api/login', json={'email': f'load{i}@test.com', 'password': 'password123'}).status_code
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    def probe_worker():
+        client = app_module.app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/api/books/1')
+            probe_ms.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.005)
+
+    probe = threading.Thread(target=probe_worker)
+    threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(clients)]
+    probe.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe.join()
+    hasher.shutdown()
+
+    return {
+        'elapsed': elapsed,
+        'statuses': statuses,
+        'rate': statuses.get(200, 0) / elapsed,
+        'probe_p50': percentile(probe_ms, 0.5),
+        'probe_p95': percentile(probe_ms, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=4, help='logins per client')
+    parser.add_argument('--workers', type=int, default=passwords.HASH_WORKERS, help='hashing processes')
+    parser.add_argument('--max-pending', type=int, default=None, help='in-flight hash limit (default: no shedding)')
+    args = parser.parse_args()
+    max_pending = args.max_pending or args.clients
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        setup_database(path, args.clients)
+        for label, workers in (('inline', 0), (f'pool x{args.workers}', args.workers)):
+            result = run(args.clients, args.logins, passwords.PasswordHasher(workers=workers, max_pending=max_pending))
+            codes = ', '.join(f'{count}x{status}' for status, count in sorted(result['statuses'].items()))
+            print(f"[{label:>8}] {result['rate']:7.1f} logins/s ({codes}) in {result['elapsed']:.2f}s   "
+                  f"book read p50 {result['probe_p50']:6.1f} ms  p95 {result['probe_p95']:6.1f} ms")
+        app_module.db_pool.close_all()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(path + suffix)
+            except OSError:
+                pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
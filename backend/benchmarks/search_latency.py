@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Catalog search latency at scale
+Fills a temporary database with synthetic titles through the normal insert
+path (so the FTS triggers do the indexing) and times ranked search queries
+
+Usage: python -m benchmarks.search_latency [--books 1000000] [--queries 200]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from utils import search
+
+SURNAMES = 'Smith Okafor Tanaka Novak Silva Haddad Larsen Moreau Kowalski Reyes'.split()
+SYLLABLES = 'ka lo mi ra ten vor sel an qui dra mon bel ith or ush gen ta ve'.split()
+
+
+def vocabulary(size, rng):
+    """Pseudo-words with cumulative Zipf weights, so a few are very common like in real titles"""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+    return words, weights
+
+
+def fill(conn, books, words, weights, batch=20000):
+    rng = random.Random(42)
+
+    def text(count):
+        return ' '.join(rng.choices(words, cum_weights=weights, k=count))
+
+    for start in range(0, books, batch):
+        rows = []
+        for i in range(start, min(start + batch, books)):
+            title = text(rng.randint(2, 5)).title()
+            author = f'{rng.choice(SURNAMES)} {i % 9973}'
+            description = text(12)
+            rows.append((title, author, f'978{i:010d}', description))
+        conn.executemany('''
+            INSERT INTO books (title, author, isbn, category, description, totalCopies, availableCopies)
+            VALUES (?, ?, ?, 'Fiction', ?, 1, 1)
+        ''', rows)
+        conn.commit()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app_module.DATABASE = path
+        app_module.init_db()
+        conn = app_module.db_pool.connect()
+
+        words, weights = vocabulary(args.vocabulary, random.Random(1))
+        started = time.perf_counter()
+        fill(conn, args.books, words, weights)
+        print(f'Indexed {args.books} books in {time.perf_counter() - started:.1f}s')
+
+        rng = random.Random(7)
+        queries = {
+            'one term': lambda: rng.choices(words, cum_weights=weights)[0],
+            'two terms': lambda: ' '.join(rng.choices(words, cum_weights=weights, k=2)),
+            'prefix': lambda: rng.choices(words, cum_weights=weights)[0][:4],
+            'author': lambda: f'{rng.choice(SURNAMES)} {rng.randrange(9973)}',
+            'isbn': lambda: f'978{rng.randrange(args.books):010d}',
+        }
+        for label, make in queries.items():
+            timings = []
+            for _ in range(args.queries):
+                match = search.match_query(make())
+                started = time.perf_counter()
+                search.search_books(conn, match, args.limit)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f'{label:>10}: p50 {percentile(timings, 0.5):7.2f} ms   p95 {percentile(timings, 0.95):7.2f} ms')
+
+        conn.close()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(path + suffix)
+            except OSError:
+                pass
+
+
+if __name__ == '__main__':
+    main()
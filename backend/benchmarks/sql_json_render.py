@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+List rendering: SQLite json_object vs a Python dict per row
+Builds the body of GET /api/transactions?limit=all (and of the books list)
+both ways over the same cursor: items rendered by the *_json views and sent
+as they come, against sqlite3.Row -> dict -> JSON encoder in Python
+
+Usage: python -m benchmarks.sql_json_render [--rows 10000 100000 1000000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from utils import pagination
+
+LISTS = {
+    'books': (
+        'SELECT * FROM books ORDER BY createdAt DESC, id DESC',
+        'SELECT createdAt, id, json FROM books_json ORDER BY createdAt DESC, id DESC',
+        lambda row: {
+            'id': str(row['id']), 'title': row['title'], 'author': row['author'], 'isbn': row['isbn'] or '',
+            'category': row['category'], 'publishedYear': row['publishedYear'],
+            'description': row['description'] or '', 'totalCopies': row['totalCopies'],
+            'availableCopies': row['availableCopies'], 'imageUrl': row['imageUrl'],
+            'createdAt': row['createdAt'], 'updatedAt': row['updatedAt'],
+        },
+    ),
+    'transactions': (
+        '''
+        SELECT t.*, u.firstName, u.lastName, u.email, b.title, b.author, b.isbn
+        FROM transactions t JOIN users u ON t.userId = u.id JOIN books b ON t.bookId = b.id
+        ORDER BY t.createdAt DESC, t.id DESC
+        ''',
+        'SELECT createdAt, id, json FROM transactions_json ORDER BY createdAt DESC, id DESC',
+        lambda row: {
+            'id': str(row['id']), 'bookId': str(row['bookId']), 'userId': str(row['userId']),
+            'type': row['type'], 'issueDate': row['issueDate'], 'dueDate': row['dueDate'],
+            'returnDate': row['returnDate'], 'status': row['status'], 'fine': row['fine'] or 0,
+            'createdAt': row['createdAt'], 'updatedAt': row['updatedAt'],
+            'book': {'title': row['title'], 'author': row['author'], 'isbn': row['isbn'] or ''},
+            'user': {'firstName': row['firstName'], 'lastName': row['lastName'], 'email': row['email']},
+        },
+    ),
+}
+
+
+def setup_database(path, rows):
+    app_module.DATABASE = path
+    app_module.init_db()
+
+    conn = sqlite3.connect(path)
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl)
+        VALUES (?, ?, ?, 'Fiction', 2001, ?, 3, 3, 'https://via.placeholder.com/150x200')
+    ''', ((f'Title {i}', f'Author {i % 500}', f'978{i:010d}' if i % 4 else None, f'Book number {i}')
+          for i in range(rows)))
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role)
+        VALUES (?, 'x', 'Member', ?, 'member')
+    ''', [(f'member{i}@library.com', f'No. {i}') for i in range(1000)])
+    conn.executemany('''
+        INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, returnDate, status, fine)
+        VALUES (?, ?, 'issue', '2024-01-15 10:30:00', '2024-01-29 10:30:00', ?, ?, ?)
+    ''', ((i % rows + 1, i * 7 % 1000 + 1, None if i % 3 else '2024-01-27 09:00:00',
+           'active' if i % 3 else 'returned', 0 if i % 5 else 1.5) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def body_size(sql, render):
+    """Build the whole limit=all response body the way the endpoint does"""
+    with app_module.app.test_request_context('/?limit=all'):
+        cursor = app_module.db_pool.get_db().execute(sql)
+        response = pagination.Page(limit=None, explicit=True).respond(cursor, app_module.db_pool, render)
+        return sum(len(chunk) for chunk in response.response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            setup_database(path, rows)
+            for name, (python_sql, sql_sql, render) in LISTS.items():
+                timings, sizes = {}, {}
+                for label, sql, row_render in (('python', python_sql, render), ('sqlite', sql_sql, None)):
+                    start = time.process_time()
+                    sizes[label] = size = body_size(sql, row_render)
+                    timings[label] = time.process_time() - start
+                assert sizes['python'] == sizes['sqlite'], sizes
+                print(f"[{name:>12}] {rows:>9,} rows  {size / 2**20:7.1f} MB   "
+                      f"python {timings['python']:6.2f}s   sqlite {timings['sqlite']:6.2f}s   "
+                      f"{timings['python'] / timings['sqlite']:4.1f}x")
+        finally:
+            app_module.db_pool.close_all()
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.unlink(path + suffix)
+                except OSError:
+                    pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
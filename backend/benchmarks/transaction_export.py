@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Peak memory of a full loan-history export
+Each run happens in a fresh process so ru_maxrss belongs to that run alone:
+the streamed NDJSON/CSV export against the fetchall + list of dicts + jsonify
+path that GET /api/transactions takes
+
+Usage: python -m benchmarks.transaction_export [--transactions 1000000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from utils import db, transaction_export
+from utils.db import ConnectionManager
+
+# Memory-mapped database pages count toward RSS but are page cache, not export
+# memory; without the mapping, peak RSS is what each export path allocates
+db.CONNECTION_PRAGMAS = tuple(pragma for pragma in db.CONNECTION_PRAGMAS if 'mmap_size' not in pragma)
+
+
+def setup_database(path, transactions):
+    app_module.DATABASE = path
+    app_module.init_db()
+
+    conn = sqlite3.connect(path)
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, category, totalCopies, availableCopies)
+        VALUES (?, ?, ?, 'Fiction', 5, 5)
+    ''', [(f'Title {i}', f'Author {i % 500}', f'978{i:010d}') for i in range(1000)])
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role)
+        VALUES (?, 'x', 'Member', ?, 'member')
+    ''', [(f'member{i}@library.com', f'No. {i}') for i in range(1000)])
+    conn.executemany('''
+        INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, returnDate, status, fine)
+        VALUES (?, ?, 'issue', '2024-01-15 10:30:00', '2024-01-29 10:30:00', '2024-01-27 09:00:00', 'returned', 0)
+    ''', ((i % 1000 + 1, i * 7 % 1000 + 1) for i in range(transactions)))
+    conn.commit()
+    conn.close()
+
+
+def streamed(path, fmt):
+    size = 0
+    for chunk in transaction_export.stream(ConnectionManager(path), fmt):
+        size += len(chunk)  # a real response hands each chunk to the socket and drops it
+    return size
+
+
+def buffered(path, fmt):
+    """What GET /api/transactions does, minus pagination"""
+    conn = ConnectionManager(path).connect()
+    rows = conn.execute('''
+        SELECT t.*, u.firstName, u.lastName, u.email, b.title, b.author, b.isbn
+        FROM transactions t JOIN users u ON t.userId = u.id JOIN books b ON t.bookId = b.id
+    ''').fetchall()
+    transactions = [{
+        'id': str(row['id']), 'bookId': str(row['bookId']), 'userId': str(row['userId']),
+        'type': row['type'], 'issueDate': row['issueDate'], 'dueDate': row['dueDate'],
+        'returnDate': row['returnDate'], 'status': row['status'], 'fine': row['fine'] or 0,
+        'createdAt': row['createdAt'], 'updatedAt': row['updatedAt'],
+        'book': {'title': row['title'], 'author': row['author'], 'isbn': row['isbn'] or ''},
+        'user': {'firstName': row['firstName'], 'lastName': row['lastName'], 'email': row['email']},
+    } for row in rows]
+    with app_module.app.app_context():
+        return len(app_module.jsonify(transactions).get_data())
+
+
+def measure(label, fn, path, fmt, results):
+    start = time.perf_counter()
+    size = fn(path, fmt)
+    results.put((label, size, time.perf_counter() - start,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--transactions', type=int, default=1000000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        setup_database(path, args.transactions)
+        results = multiprocessing.Queue()
+        for label, fn, fmt in (('ndjson stream', streamed, 'ndjson'), ('csv stream', streamed, 'csv'),
+                               ('jsonify', buffered, None)):
+            process = multiprocessing.Process(target=measure, args=(label, fn, path, fmt, results))
+            process.start()
+            label, size, wall, peak = results.get()
+            process.join()
+            print(f"[{label:>13}] {args.transactions:,} loans  {size / 2**20:8.1f} MB in {wall:6.2f}s   "
+                  f"peak RSS {peak:8.1f} MB")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(path + suffix)
+            except OSError:
+                pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
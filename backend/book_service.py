@@ -1,9 +1,11 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_identity, jwt_required
-import sqlite3
+from flask_jwt_extended import JWTManager
 import os
 from datetime import datetime
+from utils.db import ConnectionManager
+from utils.catalog_cache import CatalogCache
+from utils import catalog_import, claims, errors, pagination, schema, search
 from functools import wraps
 
 app = Flask(__name__)
@@ -23,26 +25,25 @@ CORS(app,
 
 # Database setup
 DATABASE = os.environ.get('DATABASE_URL', 'library.db')
+db_pool = ConnectionManager(lambda: DATABASE, app, on_connect=schema.upgrade)
+catalog_cache = CatalogCache(db_pool)
+revocations = claims.Revocations(db_pool)
+errors.register(app)
 
 def admin_required(fn):
     """Decorator to require admin role for protected routes"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             
-            # Check if user is admin
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-            user_role = cursor.fetchone()
-            conn.close()
-            
-            if not user_role or user_role[0] != 'admin':
+            # Check if user is admin - from the token, no users lookup
+            if not claims.is_admin(token_claims):
                 return jsonify({'error': 'Admin access required'}), 403
             
             return fn(*args, **kwargs)
+        except errors.ApiError:
+            raise
         except Exception as e:
             return jsonify({'error': 'Authentication required'}), 401
     
@@ -55,19 +56,47 @@ def health_check():
 
 # Book API Routes
 @app.route('/books', methods=['GET'])
+@catalog_cache.cached
 def get_books():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM books ORDER BY createdAt DESC")
-    books_rows = cursor.fetchall()
-    conn.close()
+    page = pagination.from_request(request.args, allow_unbounded=lambda: claims.is_admin_request(revocations))
+
+    if page.after:
+        cursor.execute('''
+            SELECT createdAt, id, json FROM books_json WHERE (createdAt, id) < (?, ?)
+            ORDER BY createdAt DESC, id DESC LIMIT ?
+        ''', (*page.after, page.fetch))
+    else:
+        cursor.execute("SELECT createdAt, id, json FROM books_json ORDER BY createdAt DESC, id DESC LIMIT ?", (page.fetch,))
+
+    return page.respond(cursor, db_pool)
+
+@app.route('/books/summary', methods=['GET'])
+@admin_required
+def get_books_summary():
+    """Catalog totals for the admin dashboard"""
+    row = db_pool.get_db().execute(
+        'SELECT count(*) AS totalBooks, coalesce(sum(availableCopies), 0) AS availableCopies FROM books'
+    ).fetchone()
+    return jsonify(dict(row))
+
+@app.route('/books/search', methods=['GET'])
+def search_books():
+    page = pagination.ranked_from_request(request.args)
+
+    match = search.match_query(request.args.get('q', ''))
+    if match is None:
+        return jsonify({'error': 'Search query is required'}), 400
+
+    conn = db_pool.get_db()
+    books_rows, next_cursor = page.split(search.search_books(conn, match, page.fetch, page.offset))
 
     books = []
     for book_row in books_rows:
         book = {
-            'id': str(book_row['id']),  # Convert to string for Angular
+            'id': str(book_row['id']),
             'title': book_row['title'],
             'author': book_row['author'],
             'isbn': book_row['isbn'] or '',
@@ -82,17 +111,16 @@ def get_books():
         }
         books.append(book)
 
-    return jsonify(books)
+    return page.response(books, next_cursor)
 
 @app.route('/books/<int:book_id>', methods=['GET'])
+@catalog_cache.cached
 def get_book(book_id):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
     book_row = cursor.fetchone()
-    conn.close()
 
     if not book_row:
         return jsonify({'error': 'Book not found'}), 404
@@ -114,6 +142,11 @@ def get_book(book_id):
 
     return jsonify(book)
 
+@app.route('/books/cache-stats', methods=['GET'])
+@admin_required
+def get_catalog_cache_stats():
+    return jsonify(catalog_cache.stats())
+
 @app.route('/books', methods=['POST'])
 @admin_required
 def create_book():
@@ -130,7 +163,7 @@ def create_book():
     if not all([title, author, category, publishedYear, totalCopies]):
         return jsonify({'error': 'Required fields missing'}), 400
 
-    conn = sqlite3.connect(DATABASE)
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -140,7 +173,7 @@ def create_book():
 
     book_id = cursor.lastrowid
     conn.commit()
-    conn.close()
+    catalog_cache.invalidate(book_id)
 
     book = {
         'id': int(book_id),
@@ -159,13 +192,29 @@ def create_book():
 
     return jsonify(book), 201
 
+@app.route('/books/import', methods=['POST'])
+@admin_required
+def import_books():
+    """Bulk-load books from a CSV or JSON Lines body, parsed as it streams in"""
+    fmt = request.args.get('format') or catalog_import.format_for(request.content_type)
+    rejects = catalog_import.RejectSample()
+    result = catalog_import.import_stream(db_pool.get_db(), request.stream, fmt, rejects=rejects)
+
+    catalog_cache.invalidate()
+
+    return jsonify({
+        'imported': result.imported,
+        'rejected': result.rejected,
+        'seconds': round(result.seconds, 3),
+        'rejects': rejects
+    })
+
 @app.route('/books/<int:book_id>', methods=['PUT'])
 @admin_required
 def update_book(book_id):
     data = request.get_json()
 
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     # Get current book
@@ -173,7 +222,6 @@ def update_book(book_id):
     book_row = cursor.fetchone()
 
     if not book_row:
-        conn.close()
         return jsonify({'error': 'Book not found'}), 404
 
     # Update fields
@@ -201,7 +249,7 @@ def update_book(book_id):
     ''', (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl, datetime.now(), book_id))
 
     conn.commit()
-    conn.close()
+    catalog_cache.invalidate(book_id)
 
     book = {
         'id': int(book_id),
@@ -223,7 +271,7 @@ def update_book(book_id):
 @app.route('/books/<int:book_id>', methods=['DELETE'])
 @admin_required
 def delete_book(book_id):
-    conn = sqlite3.connect(DATABASE)
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     # Check if book has active transactions
@@ -231,17 +279,15 @@ def delete_book(book_id):
     active_transactions = cursor.fetchone()[0]
 
     if active_transactions > 0:
-        conn.close()
         return jsonify({'error': 'Cannot delete book with active transactions'}), 400
 
     cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
 
     if cursor.rowcount == 0:
-        conn.close()
         return jsonify({'error': 'Book not found'}), 404
 
     conn.commit()
-    conn.close()
+    catalog_cache.invalidate(book_id)
 
     return jsonify(True)
 
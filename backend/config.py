@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -17,8 +18,14 @@ class Config:
     
     # CORS configuration
     CORS_HEADERS = 'Content-Type'
+    
+    # Seconds between overdue sweeps (models.overdue_sweeper); 0 disables the thread
+    OVERDUE_SWEEP_INTERVAL = 60
+    # Held by the one process per host that runs the sweeper; None runs it in every process
+    OVERDUE_SWEEP_LOCK = os.path.join(tempfile.gettempdir(), 'library-overdue-sweeper.lock')
 
 class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)
+    OVERDUE_SWEEP_INTERVAL = 0
@@ -0,0 +1,181 @@
+"""
+Fixtures shared by the raw-sqlite test modules: a throwaway database file,
+app.py or the gateway pointed at it, and their test clients. Modules that need
+rows seed them by overriding app_db, which still yields the database path.
+FakeBookService and RecordingService stand in for upstream services behind
+the gateway
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import app as app_module
+import gateway
+from utils import identity
+
+ADMIN_CLAIMS = {'role': 'admin', 'isActive': True, 'authVersion': 0}
+
+
+def bearer_headers(flask_app, user_id='1', claims=ADMIN_CLAIMS):
+    """Authorization header with a token flask_app issued for user_id"""
+    with flask_app.app_context():
+        token = create_access_token(identity=user_id, additional_claims=claims)
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def identity_secret(monkeypatch):
+    """Turns the signed identity header on for the test"""
+    monkeypatch.setattr(identity, 'SECRET', 'test-identity-secret')
+    return identity.SECRET
+
+
+@pytest.fixture
+def db_path():
+    """Path of an empty temporary database, removed with its WAL files afterwards"""
+    db_fd, path = tempfile.mkstemp(suffix='.db')
+
+    yield path
+
+    os.close(db_fd)
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.unlink(path + suffix)
+        except OSError:
+            pass
+
+
+@pytest.fixture
+def app_db(db_path):
+    """app.py serving a freshly created database at db_path"""
+    app_module.DATABASE = db_path
+    app_module.init_db()
+    app_module.revocations.expire()
+
+    yield db_path
+
+    app_module.db_pool.close_all()
+
+
+@pytest.fixture
+def client(app_db):
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def admin_headers(app_db):
+    return bearer_headers(app_module.app)
+
+
+@pytest.fixture
+def gateway_client(db_path, monkeypatch):
+    """Returns a function building a gateway over the given service URLs, plus admin headers"""
+    monkeypatch.setattr(gateway, 'DATABASE', db_path)
+    gateway.init_db()
+    gateway.revocations.expire()
+
+    def build(**urls):
+        for name, url in urls.items():
+            monkeypatch.setenv(f'{name.upper()}_SERVICE_URL', url)
+        app = gateway.create_app()
+        return app.test_client(), bearer_headers(app)
+
+    yield build
+
+    gateway.db_pool.close_all()
+
+
+class FakeBookService(BaseHTTPRequestHandler):
+    """Keep-alive HTTP/1.1 stand-in for book-service"""
+    protocol_version = 'HTTP/1.1'
+    delay = 0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        headers = {'Content-Type': 'application/json'}
+        if self.path == '/books/404':
+            status, body = 404, b'<!doctype html><title>404 Not Found</title>'
+            headers['Content-Type'] = 'text/html; charset=utf-8'
+        elif self.path == '/books/7':
+            status, body = 200, gzip.compress(json.dumps({'id': '7', 'title': 'Emma'}).encode())
+            headers.update({'Content-Encoding': 'gzip', 'ETag': '"v7"'})
+        else:
+            status, body = 200, json.dumps([{'id': '1', 'title': 'Dune'}]).encode()
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"message": "Book updated successfully"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        # POST /books/import: report how the upload arrived
+        chunked = self.headers.get('Transfer-Encoding') == 'chunked'
+        received = 0
+        if chunked:
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                received += len(self.rfile.read(size + 2)) - 2
+                if size == 0:
+                    break
+        else:
+            received = len(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        body = json.dumps({'chunked': chunked, 'received': received}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def book_service():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeBookService)
+    server.handle_error = lambda request, address: None  # timed-out clients hang up mid-reply
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    FakeBookService.delay = 0
+    server.shutdown()
+    server.server_close()
+
+
+class RecordingService(FakeBookService):
+    seen = []
+
+    def do_GET(self):
+        RecordingService.seen.append(dict(self.headers))
+        super().do_GET()
+
+
+@pytest.fixture
+def recording_service():
+    RecordingService.seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RecordingService)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
@@ -1,11 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, verify_jwt_in_request, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3
+from flask_jwt_extended import JWTManager, create_access_token
+from werkzeug.security import generate_password_hash
 import os
 import logging
 from datetime import datetime, timedelta
+from utils.db import ConnectionManager
+from utils.catalog_cache import CatalogCache
+from utils import catalog_import, circulation, claims, errors, pagination, passwords, schema, search, transaction_export
 
 app = Flask(__name__)
 
@@ -55,69 +57,21 @@ CORS(app,
 
 # Database setup
 DATABASE = 'library.db'
+db_pool = ConnectionManager(lambda: DATABASE, app, on_connect=schema.upgrade)
+catalog_cache = CatalogCache(db_pool)
+revocations = claims.Revocations(db_pool)
+errors.register(app)
+password_hasher = passwords.PasswordHasher()
 
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            firstName TEXT NOT NULL,
-            lastName TEXT NOT NULL,
-            role TEXT NOT NULL DEFAULT 'member',
-            isActive BOOLEAN DEFAULT 1,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Books table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT,
-            category TEXT NOT NULL,
-            publishedYear INTEGER,
-            description TEXT,
-            totalCopies INTEGER NOT NULL,
-            availableCopies INTEGER NOT NULL,
-            imageUrl TEXT,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Transactions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bookId INTEGER NOT NULL,
-            userId INTEGER NOT NULL,
-            type TEXT NOT NULL,
-            issueDate TIMESTAMP NOT NULL,
-            dueDate TIMESTAMP NOT NULL,
-            returnDate TIMESTAMP,
-            status TEXT NOT NULL,
-            fine REAL DEFAULT 0,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (bookId) REFERENCES books (id),
-            FOREIGN KEY (userId) REFERENCES users (id)
-        )
-    ''')
-
-    conn.commit()
+    conn = db_pool.connect()
+    schema.bootstrap(conn)
     conn.close()
 
 def seed_data():
     """Seed the database with initial data"""
-    conn = sqlite3.connect(DATABASE)
+    conn = db_pool.connect()
     cursor = conn.cursor()
 
     # Check if data already exists
@@ -182,15 +136,17 @@ def auth_login():
         logger.warning(f"Login attempt with missing credentials - Email: {bool(email)}, Password: {bool(password)}")
         return jsonify({'error': 'Email and password are required'}), 400
 
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
     user_row = cursor.fetchone()
-    conn.close()
 
-    if not user_row or not check_password_hash(user_row['password'], password):
+    valid, upgraded_hash = False, None
+    if user_row:
+        valid, upgraded_hash = password_hasher.verify(user_row['password'], password)
+
+    if not valid:
         logger.warning(f"Failed login attempt for email: {email}")
         return jsonify({'error': 'Invalid email or password'}), 401
 
@@ -198,6 +154,11 @@ def auth_login():
         logger.warning(f"Login attempt for inactive account: {email}")
         return jsonify({'error': 'Account is inactive'}), 403
 
+    # Stored hash predates the current cost parameters - upgrade it now
+    if upgraded_hash:
+        cursor.execute("UPDATE users SET password = ? WHERE id = ?", (upgraded_hash, user_row['id']))
+        conn.commit()
+
     # Create user object matching frontend expectations
     user = {
         'id': user_row['id'],  # Keep as integer for Angular
@@ -211,7 +172,7 @@ def auth_login():
     }
 
         # Create JWT token - convert ID to string for JWT compatibility
-    token = create_access_token(identity=str(user_row['id']))
+    token = create_access_token(identity=str(user_row['id']), additional_claims=claims.token_claims(user_row))
     
     logger.info(f"Successful login for user: {email} (ID: {user_row['id']}, Role: {user_row['role']})")
 
@@ -237,18 +198,17 @@ def auth_signup():
         logger.warning(f"Signup attempt with missing fields - Email: {bool(email)}, Password: {bool(password)}, FirstName: {bool(firstName)}, LastName: {bool(lastName)}")
         return jsonify({'error': 'All fields are required'}), 400
 
-    conn = sqlite3.connect(DATABASE)
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     # Check if user already exists
     cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
     if cursor.fetchone():
-        conn.close()
         logger.warning(f"Signup attempt with existing email: {email}")
         return jsonify({'error': 'User with this email already exists'}), 400
 
     # Create new user
-    password_hash = generate_password_hash(password)
+    password_hash = password_hasher.hash(password)
     cursor.execute('''
         INSERT INTO users (email, password, firstName, lastName, role, isActive)
         VALUES (?, ?, ?, ?, ?, 1)
@@ -256,7 +216,6 @@ def auth_signup():
 
     user_id = cursor.lastrowid
     conn.commit()
-    conn.close()
     
     logger.info(f"Successfully created new user: {email} (ID: {user_id}, Role: {role})")
 
@@ -273,7 +232,8 @@ def auth_signup():
     }
 
     # Create JWT token
-    token = create_access_token(identity=user_id)
+    token = create_access_token(identity=str(user_id), additional_claims=claims.token_claims(
+        {'role': role, 'isActive': True, 'authVersion': 0}))
     
     logger.info(f"JWT token generated for new user: {email}")
 
@@ -284,23 +244,42 @@ def auth_signup():
 
 # Book API Routes - Match Angular expectations
 @app.route('/api/books', methods=['GET'])
+@catalog_cache.cached
 def get_books():
     logger.info(f"Get books request from IP: {request.remote_addr}")
     
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM books ORDER BY createdAt DESC")
-    books_rows = cursor.fetchall()
-    conn.close()
-    
-    logger.info(f"Retrieved {len(books_rows)} books from database")
+    page = pagination.from_request(request.args, allow_unbounded=lambda: claims.is_admin_request(revocations))
+
+    if page.after:
+        cursor.execute('''
+            SELECT createdAt, id, json FROM books_json WHERE (createdAt, id) < (?, ?)
+            ORDER BY createdAt DESC, id DESC LIMIT ?
+        ''', (*page.after, page.fetch))
+    else:
+        cursor.execute("SELECT createdAt, id, json FROM books_json ORDER BY createdAt DESC, id DESC LIMIT ?", (page.fetch,))
+    logger.info("Streaming books to client" if page.limit is None
+                else f"Returning up to {page.limit} books to client")
+
+    return page.respond(cursor, db_pool)
+
+@app.route('/api/books/search', methods=['GET'])
+def search_books():
+    page = pagination.ranked_from_request(request.args)
+
+    match = search.match_query(request.args.get('q', ''))
+    if match is None:
+        return jsonify({'error': 'Search query is required'}), 400
+
+    conn = db_pool.get_db()
+    books_rows, next_cursor = page.split(search.search_books(conn, match, page.fetch, page.offset))
 
     books = []
     for book_row in books_rows:
         book = {
-            'id': str(book_row['id']),  # Convert to string for Angular
+            'id': str(book_row['id']),
             'title': book_row['title'],
             'author': book_row['author'],
             'isbn': book_row['isbn'] or '',
@@ -315,18 +294,16 @@ def get_books():
         }
         books.append(book)
 
-    logger.info(f"Successfully returned {len(books)} books to client")
-    return jsonify(books)
+    return page.response(books, next_cursor)
 
 @app.route('/api/books/<int:book_id>', methods=['GET'])
+@catalog_cache.cached
 def get_book(book_id):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
     book_row = cursor.fetchone()
-    conn.close()
 
     if not book_row:
         return jsonify({'error': 'Book not found'}), 404
@@ -348,31 +325,44 @@ def get_book(book_id):
 
     return jsonify(book)
 
+@app.route('/api/books/cache-stats', methods=['GET'])
+def get_catalog_cache_stats():
+    try:
+        current_user_id, token_claims = claims.current_claims(revocations)
+    except errors.ApiError:
+        raise
+    except Exception as jwt_error:
+        logger.error(f"JWT verification failed: {str(jwt_error)}")
+        return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
+
+    if not claims.is_admin(token_claims):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    return jsonify(catalog_cache.stats())
+
 @app.route('/api/books', methods=['POST'])
 def create_book():
     try:
         # Verify JWT token with detailed error logging
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             # Convert string ID to integer for database queries
             current_user_id = int(current_user_id) if current_user_id else None
             logger.info(f"JWT verification successful for user ID: {current_user_id}")
+        except errors.ApiError:
+            raise
         except Exception as jwt_error:
             logger.error(f"JWT verification failed: {str(jwt_error)}")
             logger.error(f"Request headers: {dict(request.headers)}")
             return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
 
-        # Check if user is admin
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()
-
-        if not user_role or user_role[0] != 'admin':
-            conn.close()
+        # Check if user is admin - from the token, no users lookup
+        if not claims.is_admin(token_claims):
             return jsonify({'error': 'Admin access required'}), 403
 
+        conn = db_pool.get_db()
+        cursor = conn.cursor()
+
         data = request.get_json()
         title = data.get('title')
         author = data.get('author')
@@ -384,7 +374,6 @@ def create_book():
         imageUrl = data.get('imageUrl', 'https://via.placeholder.com/150x200')
 
         if not all([title, author, category, publishedYear, totalCopies]):
-            conn.close()
             return jsonify({'error': 'Required fields missing'}), 400
 
         cursor.execute('''
@@ -394,7 +383,7 @@ def create_book():
 
         book_id = cursor.lastrowid
         conn.commit()
-        conn.close()
+        catalog_cache.invalidate(book_id)
 
         book = {
             'id': int(book_id),
@@ -412,46 +401,69 @@ def create_book():
         }
 
         return jsonify(book), 201
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Authentication required'}), 401
 
+@app.route('/api/books/import', methods=['POST'])
+def import_books():
+    """Bulk-load books from a CSV or JSON Lines body, parsed as it streams in"""
+    try:
+        current_user_id, token_claims = claims.current_claims(revocations)
+    except errors.ApiError:
+        raise
+    except Exception as jwt_error:
+        logger.error(f"JWT verification failed: {str(jwt_error)}")
+        return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
+
+    if not claims.is_admin(token_claims):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    fmt = request.args.get('format') or catalog_import.format_for(request.content_type)
+    rejects = catalog_import.RejectSample()
+    result = catalog_import.import_stream(db_pool.get_db(), request.stream, fmt, rejects=rejects)
+
+    logger.info(f"Catalog import: {result.imported} imported, {result.rejected} rejected in {result.seconds:.1f}s")
+    catalog_cache.invalidate()
+
+    return jsonify({
+        'imported': result.imported,
+        'rejected': result.rejected,
+        'seconds': round(result.seconds, 3),
+        'rejects': rejects
+    })
+
 @app.route('/api/books/<int:book_id>', methods=['PUT'])
 def update_book(book_id):
     try:
         # Verify JWT token with detailed error logging
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             # Convert string ID to integer for database queries
             current_user_id = int(current_user_id) if current_user_id else None
             logger.info(f"JWT verification successful for user ID: {current_user_id}")
+        except errors.ApiError:
+            raise
         except Exception as jwt_error:
             logger.error(f"JWT verification failed: {str(jwt_error)}")
             logger.error(f"Request headers: {dict(request.headers)}")
             return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
 
-        # Check if user is admin
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()
-
-        if not user_role or user_role[0] != 'admin':
-            conn.close()
+        # Check if user is admin - from the token, no users lookup
+        if not claims.is_admin(token_claims):
             return jsonify({'error': 'Admin access required'}), 403
 
+        conn = db_pool.get_db()
+        cursor = conn.cursor()
+
         data = request.get_json()
 
-        # Set row_factory BEFORE creating new cursor
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()  # Create new cursor with row_factory
-        
         # Get current book
         cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
         book_row = cursor.fetchone()
 
         if not book_row:
-            conn.close()
             return jsonify({'error': 'Book not found'}), 404
 
         # Update fields
@@ -479,7 +491,7 @@ def update_book(book_id):
         ''', (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl, datetime.now(), book_id))
 
         conn.commit()
-        conn.close()
+        catalog_cache.invalidate(book_id)
 
         book = {
             'id': int(book_id),
@@ -497,6 +509,8 @@ def update_book(book_id):
         }
 
         return jsonify(book)
+    except errors.ApiError:
+        raise
     except Exception as e:
         print(f"Error in update_book: {e}")
         return jsonify({'error': 'Authentication required'}), 401
@@ -506,44 +520,42 @@ def delete_book(book_id):
     try:
         # Verify JWT token with detailed error logging
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             # Convert string ID to integer for database queries
             current_user_id = int(current_user_id) if current_user_id else None
             logger.info(f"JWT verification successful for user ID: {current_user_id}")
+        except errors.ApiError:
+            raise
         except Exception as jwt_error:
             logger.error(f"JWT verification failed: {str(jwt_error)}")
             logger.error(f"Request headers: {dict(request.headers)}")
             return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
 
-        # Check if user is admin
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()
-
-        if not user_role or user_role[0] != 'admin':
-            conn.close()
+        # Check if user is admin - from the token, no users lookup
+        if not claims.is_admin(token_claims):
             return jsonify({'error': 'Admin access required'}), 403
 
+        conn = db_pool.get_db()
+        cursor = conn.cursor()
+
         # Check if book has active transactions
         cursor.execute("SELECT COUNT(*) FROM transactions WHERE bookId = ? AND status = 'active'", (book_id,))
         active_transactions = cursor.fetchone()[0]
 
         if active_transactions > 0:
-            conn.close()
             return jsonify({'error': 'Cannot delete book with active transactions'}), 400
 
         cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
 
         if cursor.rowcount == 0:
-            conn.close()
             return jsonify({'error': 'Book not found'}), 404
 
         conn.commit()
-        conn.close()
+        catalog_cache.invalidate(book_id)
 
         return jsonify(True)
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Authentication required'}), 401
 
@@ -554,11 +566,12 @@ def borrow_book(book_id):
         
         # Verify JWT token with detailed error logging
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             # Convert string ID to integer for database queries
             current_user_id = int(current_user_id) if current_user_id else None
             logger.info(f"JWT verification successful for user ID: {current_user_id}")
+        except errors.ApiError:
+            raise
         except Exception as jwt_error:
             logger.error(f"JWT verification failed: {str(jwt_error)}")
             logger.error(f"Request headers: {dict(request.headers)}")
@@ -586,50 +599,17 @@ def borrow_book(book_id):
                 due_date = datetime.now() + timedelta(days=14)
                 logger.warning(f"Invalid due date format, using default: {e}")
 
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
-        # Check if book exists and is available
-        cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-        book_row = cursor.fetchone()
-
-        if not book_row:
-            conn.close()
-            logger.warning(f"Book not found: ID {book_id}")
-            return jsonify({'error': 'Book not found'}), 404
-
-        logger.info(f"Found book: {book_row[1]} by {book_row[2]} (Available: {book_row[8]}/{book_row[7]})")
-
-        # Check available copies (index 8 is availableCopies)
-        if int(book_row[8]) <= 0:
-            conn.close()
-            logger.warning(f"Book ID {book_id} not available - no copies left")
-            return jsonify({'error': 'Book not available'}), 400
+        conn = db_pool.get_db()
+        try:
+            transaction_id, issue_date = circulation.borrow_book(conn, book_id, current_user_id, due_date)
+        except circulation.CirculationError as e:
+            logger.warning(f"Borrow rejected for user {current_user_id}, book {book_id}: {e.message}")
+            raise
 
-        # Check if user already has this book
-        cursor.execute("SELECT id FROM transactions WHERE bookId = ? AND userId = ? AND status = 'active'", (book_id, current_user_id))
-        if cursor.fetchone():
-            conn.close()
-            logger.warning(f"User {current_user_id} already has book {book_id}")
-            return jsonify({'error': 'User already has this book'}), 400
+        catalog_cache.invalidate(book_id)
 
-        # Create transaction
-        issue_date = datetime.now()
-        cursor.execute('''
-            INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status)
-            VALUES (?, ?, 'issue', ?, ?, 'active')
-        ''', (book_id, current_user_id, issue_date, due_date))
-
-        transaction_id = cursor.lastrowid
         logger.info(f"Created transaction ID {transaction_id} for user {current_user_id} borrowing book {book_id}")
 
-        # Update book availability
-        cursor.execute("UPDATE books SET availableCopies = availableCopies - 1, updatedAt = ? WHERE id = ?", (datetime.now(), book_id))
-        logger.info(f"Updated book {book_id} availability (reduced by 1)")
-
-        conn.commit()
-        conn.close()
-
         transaction = {
             'id': str(transaction_id),
             'bookId': int(book_id),
@@ -646,6 +626,8 @@ def borrow_book(book_id):
 
         logger.info(f"Successfully completed book borrowing - User: {current_user_id}, Book: {book_id}, Transaction: {transaction_id}")
         return jsonify(transaction), 201
+    except errors.ApiError:
+        raise
     except Exception as e:
         # Return proper JSON error response
         error_message = str(e) if str(e) else 'Authentication required'
@@ -653,6 +635,59 @@ def borrow_book(book_id):
         response = jsonify({'error': error_message, 'success': False})
         return response, 401
 
+@app.route('/api/borrow/batch', methods=['POST'])
+def borrow_batch():
+    """Circulation desk checkout: several books for the caller in one transaction"""
+    try:
+        current_user_id, token_claims = claims.current_claims(revocations)
+
+        data = request.get_json(silent=True) or {}
+        book_ids = circulation.check_batch(data.get('bookIds'))
+
+        due_date = data.get('dueDate')
+        if not due_date:
+            due_date = datetime.now() + timedelta(days=14)
+        else:
+            try:
+                if isinstance(due_date, str):
+                    if 'T' in due_date:
+                        due_date = datetime.fromisoformat(due_date.replace('Z', ''))
+                    else:
+                        due_date = datetime.strptime(due_date, '%Y-%m-%d')
+            except:
+                due_date = datetime.now() + timedelta(days=14)
+
+        conn = db_pool.get_db()
+        outcomes, issue_date = circulation.borrow_batch(conn, book_ids, current_user_id, due_date)
+        logger.info(f"Batch borrow by user {current_user_id}: {len(book_ids)} books")
+
+        results = []
+        for book_id, transaction_id, error in outcomes:
+            if error is not None:
+                results.append({'bookId': book_id, 'status': error.status_code, 'error': error.message})
+                continue
+            catalog_cache.invalidate(book_id)
+            results.append({'bookId': book_id, 'status': 201, 'transaction': {
+                'id': str(transaction_id),
+                'bookId': int(book_id),
+                'userId': str(current_user_id),
+                'type': 'issue',
+                'issueDate': issue_date.isoformat(),
+                'dueDate': due_date.isoformat(),
+                'returnDate': None,
+                'status': 'active',
+                'fine': 0,
+                'createdAt': issue_date.isoformat(),
+                'updatedAt': issue_date.isoformat()
+            }})
+
+        succeeded = sum(1 for result in results if result['status'] == 201)
+        return jsonify({'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded})
+    except errors.ApiError:
+        raise
+    except Exception as e:
+        return jsonify({'error': 'Authentication required'}), 401
+
 @app.route('/api/return/<int:transaction_id>', methods=['POST'])
 def return_book(transaction_id):
     try:
@@ -660,9 +695,10 @@ def return_book(transaction_id):
         
         # Verify JWT token with detailed error logging
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             logger.info(f"JWT verification successful for user ID: {current_user_id}")
+        except errors.ApiError:
+            raise
         except Exception as jwt_error:
             logger.error(f"JWT verification failed: {str(jwt_error)}")
             logger.error(f"Request headers: {dict(request.headers)}")
@@ -689,51 +725,15 @@ def return_book(transaction_id):
                 return_date = datetime.now()
                 logger.warning(f"Invalid return date format, using current time: {e}")
 
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # Get transaction
-        cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
-        transaction_row = cursor.fetchone()
-
-        if not transaction_row:
-            conn.close()
-            return jsonify({'error': 'Transaction not found'}), 404
-
-        if transaction_row['status'] != 'active':
-            conn.close()
-            return jsonify({'error': 'Book is not currently issued'}), 400
-
-        # Check if user owns this transaction (unless admin)
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()[0]  # Access tuple index, not dictionary key
-
-        if user_role != 'admin' and transaction_row['userId'] != current_user_id:
-            conn.close()
-            return jsonify({'error': 'You can only return your own books'}), 403
-
-        # Calculate fine if overdue
-        due_date = datetime.fromisoformat(transaction_row['dueDate'])
-        if return_date > due_date:
-            days_overdue = (return_date - due_date).days
-            fine = days_overdue * 10  # $10 per day
-        else:
-            fine = 0
-
-        # Update transaction
-        cursor.execute('''
-            UPDATE transactions
-            SET returnDate = ?, status = 'returned', fine = ?, updatedAt = ?
-            WHERE id = ?
-        ''', (return_date, fine, datetime.now(), transaction_id))
-
-        # Update book availability
-        cursor.execute("UPDATE books SET availableCopies = availableCopies + 1, updatedAt = ? WHERE id = ?",
-                       (datetime.now(), transaction_row['bookId']))
+        conn = db_pool.get_db()
+        try:
+            transaction_row, fine = circulation.return_book(conn, transaction_id, current_user_id, return_date,
+                                                          is_admin=claims.is_admin(token_claims))
+        except circulation.CirculationError as e:
+            logger.warning(f"Return rejected for user {current_user_id}, transaction {transaction_id}: {e.message}")
+            raise
 
-        conn.commit()
-        conn.close()
+        catalog_cache.invalidate(transaction_row['bookId'])
 
         transaction = {
             'id': str(transaction_id),
@@ -750,6 +750,64 @@ def return_book(transaction_id):
         }
 
         return jsonify(transaction)
+    except errors.ApiError:
+        raise
+    except Exception as e:
+        return jsonify({'error': 'Authentication required'}), 401
+
+@app.route('/api/return/batch', methods=['POST'])
+def return_batch():
+    """Circulation desk check-in: several loans in one transaction"""
+    try:
+        current_user_id, token_claims = claims.current_claims(revocations)
+
+        data = request.get_json(silent=True) or {}
+        transaction_ids = circulation.check_batch(data.get('transactionIds'))
+
+        return_date = data.get('returnDate')
+        if not return_date:
+            return_date = datetime.now()
+        else:
+            try:
+                if isinstance(return_date, str):
+                    if 'T' in return_date:
+                        return_date = datetime.fromisoformat(return_date.replace('Z', ''))
+                    else:
+                        return_date = datetime.strptime(return_date, '%Y-%m-%d')
+            except:
+                return_date = datetime.now()
+
+        conn = db_pool.get_db()
+        outcomes = circulation.return_batch(conn, transaction_ids, current_user_id, return_date,
+                                            is_admin=claims.is_admin(token_claims))
+        logger.info(f"Batch return by user {current_user_id}: {len(transaction_ids)} loans")
+
+        now = datetime.now().isoformat()
+        results = []
+        for transaction_id, returned, error in outcomes:
+            if error is not None:
+                results.append({'transactionId': transaction_id, 'status': error.status_code, 'error': error.message})
+                continue
+            transaction_row, fine = returned
+            catalog_cache.invalidate(transaction_row['bookId'])
+            results.append({'transactionId': transaction_id, 'status': 200, 'transaction': {
+                'id': str(transaction_id),
+                'bookId': str(transaction_row['bookId']),
+                'userId': str(transaction_row['userId']),
+                'type': 'return',
+                'issueDate': transaction_row['issueDate'],
+                'dueDate': transaction_row['dueDate'],
+                'returnDate': return_date.isoformat(),
+                'status': 'returned',
+                'fine': fine,
+                'createdAt': transaction_row['createdAt'],
+                'updatedAt': now
+            }})
+
+        succeeded = sum(1 for result in results if result['status'] == 200)
+        return jsonify({'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded})
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Authentication required'}), 401
 
@@ -758,120 +816,114 @@ def get_transactions():
     try:
         # Verify JWT token with detailed error logging
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             logger.info(f"JWT verification successful for user ID: {current_user_id}")
+        except errors.ApiError:
+            raise
         except Exception as jwt_error:
             logger.error(f"JWT verification failed: {str(jwt_error)}")
             logger.error(f"Request headers: {dict(request.headers)}")
             return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
 
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
+        page = pagination.from_request(request.args, allow_unbounded=claims.is_admin(token_claims))
+
+        conn = db_pool.get_db()
         cursor = conn.cursor()
 
-        # Get current user to check if admin
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()[0]  # Access tuple index, not dictionary key
+        # Role comes from the token claims
+        user_role = token_claims['role']
 
         # Build query based on user role
-        if user_role == 'admin':
+        if user_role == 'admin' and page.after:
+            cursor.execute('''
+                SELECT createdAt, id, json
+                FROM transactions_json
+                WHERE (createdAt, id) < (?, ?)
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (*page.after, page.fetch))
+        elif user_role == 'admin':
             cursor.execute('''
-                SELECT t.*, u.firstName, u.lastName, u.email, b.title, b.author, b.isbn
-                FROM transactions t
-                JOIN users u ON t.userId = u.id
-                JOIN books b ON t.bookId = b.id
-                ORDER BY t.createdAt DESC
-            ''')
+                SELECT createdAt, id, json
+                FROM transactions_json
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (page.fetch,))
+        elif page.after:
+            cursor.execute('''
+                SELECT createdAt, id, json
+                FROM transactions_json
+                WHERE userId = ? AND (createdAt, id) < (?, ?)
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (current_user_id, *page.after, page.fetch))
         else:
             cursor.execute('''
-                SELECT t.*, u.firstName, u.lastName, u.email, b.title, b.author, b.isbn
-                FROM transactions t
-                JOIN users u ON t.userId = u.id
-                JOIN books b ON t.bookId = b.id
-                WHERE t.userId = ?
-                ORDER BY t.createdAt DESC
-            ''', (current_user_id,))
-
-        transactions_rows = cursor.fetchall()
-        conn.close()
-
-        transactions = []
-        for t_row in transactions_rows:
-            transaction = {
-                'id': str(t_row['id']),
-                'bookId': str(t_row['bookId']),
-                'userId': str(t_row['userId']),
-                'type': t_row['type'],
-                'issueDate': t_row['issueDate'],
-                'dueDate': t_row['dueDate'],
-                'returnDate': t_row['returnDate'],
-                'status': t_row['status'],
-                'fine': t_row['fine'] or 0,
-                'createdAt': t_row['createdAt'],
-                'updatedAt': t_row['updatedAt'],
-                'book': {
-                    'title': t_row['title'],
-                    'author': t_row['author'],
-                    'isbn': t_row['isbn'] or ''
-                },
-                'user': {
-                    'firstName': t_row['firstName'],
-                    'lastName': t_row['lastName'],
-                    'email': t_row['email']
-                }
-            }
-            transactions.append(transaction)
-
-        return jsonify(transactions)
+                SELECT createdAt, id, json
+                FROM transactions_json
+                WHERE userId = ?
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (current_user_id, page.fetch))
+
+        return page.respond(cursor, db_pool)
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Authentication required'}), 401
 
+@app.route('/api/transactions/export', methods=['GET'])
+def export_transactions():
+    """Full loan history as NDJSON or CSV, streamed from one read snapshot"""
+    try:
+        current_user_id, token_claims = claims.current_claims(revocations)
+    except errors.ApiError:
+        raise
+    except Exception as jwt_error:
+        logger.error(f"JWT verification failed: {str(jwt_error)}")
+        return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
+
+    if not claims.is_admin(token_claims):
+        return jsonify({'error': 'Admin access required'}), 403
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in transaction_export.FORMATS:
+        return jsonify({'error': "format must be 'ndjson' or 'csv'"}), 400
+
+    return Response(transaction_export.stream(db_pool, fmt), content_type=transaction_export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="transactions.{fmt}"'})
+
 @app.route('/api/members', methods=['GET'])
 def get_members():
     try:
         # Verify JWT token with detailed error logging
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             logger.info(f"JWT verification successful for user ID: {current_user_id}")
+        except errors.ApiError:
+            raise
         except Exception as jwt_error:
             logger.error(f"JWT verification failed: {str(jwt_error)}")
             logger.error(f"Request headers: {dict(request.headers)}")
             return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
 
-        # Check if user is admin
-        conn = sqlite3.connect(DATABASE)
+        # Check if user is admin - from the token, no users lookup
+        if not claims.is_admin(token_claims):
+            return jsonify({'error': 'Admin access required'}), 403
+
+        conn = db_pool.get_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()
 
-        if not user_role or user_role[0] != 'admin':
-            conn.close()
-            return jsonify({'error': 'Admin access required'}), 403
+        page = pagination.from_request(request.args, allow_unbounded=True)
 
-        # Set row_factory BEFORE creating new cursor
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()  # Create new cursor with row_factory
-        cursor.execute("SELECT * FROM users WHERE role = 'member' ORDER BY createdAt DESC")
-        members_rows = cursor.fetchall()
-        conn.close()
+        if page.after:
+            cursor.execute('''
+                SELECT createdAt, id, json FROM members_json WHERE role = 'member' AND (createdAt, id) < (?, ?)
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (*page.after, page.fetch))
+        else:
+            cursor.execute("SELECT createdAt, id, json FROM members_json WHERE role = 'member' ORDER BY createdAt DESC, id DESC LIMIT ?",
+                           (page.fetch,))
 
-        members = []
-        for member_row in members_rows:
-            member = {
-                'id': member_row['id'],  # Keep as integer for Angular
-                'email': member_row['email'],
-                'password': '',  # Don't return password
-                'firstName': member_row['firstName'],
-                'lastName': member_row['lastName'],
-                'role': member_row['role'],
-                'createdAt': member_row['createdAt'],
-                'isActive': bool(member_row['isActive'])
-            }
-            members.append(member)
-
-        return jsonify(members)
+        return page.respond(cursor, db_pool)
+    except errors.ApiError:
+        raise
     except Exception as e:
         print(f"Error in get_members: {e}")
         return jsonify({'error': 'Authentication required'}), 401
@@ -881,44 +933,37 @@ def update_member(user_id):
     try:
         # Verify JWT token with detailed error logging
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             logger.info(f"JWT verification successful for user ID: {current_user_id}")
+        except errors.ApiError:
+            raise
         except Exception as jwt_error:
             logger.error(f"JWT verification failed: {str(jwt_error)}")
             logger.error(f"Request headers: {dict(request.headers)}")
             return jsonify({'error': f'JWT verification failed: {str(jwt_error)}'}), 401
 
-        # Check if user is admin
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()
-
-        if not user_role or user_role[0] != 'admin':
-            conn.close()
+        # Check if user is admin - from the token, no users lookup
+        if not claims.is_admin(token_claims):
             return jsonify({'error': 'Admin access required'}), 403
 
+        conn = db_pool.get_db()
+        cursor = conn.cursor()
+
         data = request.get_json()
         is_active = data.get('isActive')
 
         if is_active is None:
-            conn.close()
             return jsonify({'error': 'isActive field is required'}), 400
 
-        # Set row_factory BEFORE creating new cursor
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()  # Create new cursor with row_factory
         cursor.execute("SELECT * FROM users WHERE id = ? AND role = 'member'", (user_id,))
         member_row = cursor.fetchone()
 
         if not member_row:
-            conn.close()
             return jsonify({'error': 'Member not found'}), 404
 
         cursor.execute("UPDATE users SET isActive = ? WHERE id = ?", (is_active, user_id))
         conn.commit()
-        conn.close()
+        revocations.expire()
 
         member = {
             'id': user_id,  # Keep as integer for Angular
@@ -932,6 +977,8 @@ def update_member(user_id):
         }
 
         return jsonify(member)
+    except errors.ApiError:
+        raise
     except Exception as e:
         print(f"Error in update_member: {e}")
         return jsonify({'error': 'Authentication required'}), 401
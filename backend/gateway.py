@@ -3,81 +3,44 @@ API Gateway for Library Management System
 This file serves as the main entry point and application factory
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, verify_jwt_in_request, get_jwt_identity, jwt_required
-from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3
+from werkzeug.security import generate_password_hash
 import os
+import json
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from utils.db import ConnectionManager
+from utils import claims, errors, identity, pagination, passwords, schema
+from utils.proxy_routes import (PROXY_ROUTES, DASHBOARD_SECTIONS, CACHE_TTLS, PURGES, STREAMED_UPLOADS,
+                                FORWARD_REQUEST_HEADERS, FORWARD_RESPONSE_HEADERS, CHUNK_SIZE, UNAVAILABLE,
+                                needs_error_envelope, error_envelope)
+from utils.breaker import OPEN, UpstreamUnavailable
+from utils.response_cache import ResponseCache
+from utils.singleflight import SingleFlight
+from utils.upstream import Upstream
 from functools import wraps
 
 # Database setup
 DATABASE = os.environ.get('DATABASE_URL', 'library.db')
+db_pool = ConnectionManager(lambda: DATABASE, on_connect=schema.upgrade)
+password_hasher = passwords.PasswordHasher()
+revocations = claims.Revocations(db_pool)
+
+# Per-call budget for each /api/dashboard section
+DASHBOARD_DEADLINE = float(os.environ.get('DASHBOARD_DEADLINE', 3.0))
 
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            firstName TEXT NOT NULL,
-            lastName TEXT NOT NULL,
-            role TEXT NOT NULL DEFAULT 'member',
-            isActive BOOLEAN DEFAULT 1,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Books table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT,
-            category TEXT NOT NULL,
-            publishedYear INTEGER,
-            description TEXT,
-            totalCopies INTEGER NOT NULL,
-            availableCopies INTEGER NOT NULL,
-            imageUrl TEXT,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Transactions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bookId INTEGER NOT NULL,
-            userId INTEGER NOT NULL,
-            type TEXT NOT NULL,
-            issueDate TIMESTAMP NOT NULL,
-            dueDate TIMESTAMP NOT NULL,
-            returnDate TIMESTAMP,
-            status TEXT NOT NULL,
-            fine REAL DEFAULT 0,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (bookId) REFERENCES books (id),
-            FOREIGN KEY (userId) REFERENCES users (id)
-        )
-    ''')
-
-    conn.commit()
+    conn = db_pool.connect()
+    schema.bootstrap(conn)
     conn.close()
 
 def seed_data():
     """Seed the database with initial data"""
-    conn = sqlite3.connect(DATABASE)
+    conn = db_pool.connect()
     cursor = conn.cursor()
 
     # Check if data already exists
@@ -127,6 +90,125 @@ def seed_data():
     conn.commit()
     conn.close()
 
+def identity_header(authorization):
+    """Verify the caller's JWT once, here, and hand the service a signed identity
+    so it doesn't decode the token again; a bad token is left for the service to
+    refuse. Needs an app context; the asyncio gateway calls this too"""
+    if not authorization or not identity.enabled():
+        return {}
+    try:
+        user_id, token_claims = claims.bearer_claims(authorization, revocations)
+    except Exception:
+        return {}
+    return identity.headers(user_id, token_claims)
+
+def _unavailable(route, error):
+    """503 for a failed upstream call; calls the breaker or bulkhead refused say when to retry"""
+    headers = {'Retry-After': str(error.retry_after)} if isinstance(error, UpstreamUnavailable) else {}
+    return jsonify({'error': f'{UNAVAILABLE[route.upstream]}: {str(error)}'}), 503, headers
+
+def _fetch_section(upstream, path, headers, deadline):
+    response = upstream.get(path, headers=headers, timeout=(upstream.timeout[0], deadline))
+    return response.status_code, response.headers.get('Content-Type', ''), response.content
+
+def _section_error(service, future, deadline):
+    """Error marker for a dashboard section that didn't come back as JSON 200"""
+    # The section's own read timeout is the same deadline and may fire first
+    if not future.done() or isinstance(future.exception(), requests.exceptions.ReadTimeout):
+        return f'{UNAVAILABLE[service]}: no response within {deadline}s'
+    if future.exception() is not None:
+        return f'{UNAVAILABLE[service]}: {str(future.exception())}'
+    status, _, body = future.result()
+    try:
+        return json.loads(body)['error']
+    except (ValueError, KeyError, TypeError):
+        return error_envelope(status)['error']
+
+def _cached_read(upstream, route, cache, flights, path, book_id, headers):
+    """Serve a public GET from the gateway cache, refreshing stale entries in
+    the background and fetching synchronously only on a miss. Identical
+    fetches in flight at the same time share one upstream call"""
+    ttl, stale_ttl = CACHE_TTLS[route.endpoint]
+    # Conditional requests are answered from the cached ETag instead
+    headers.pop('If-None-Match', None)
+    params = request.args.copy()
+    key = (route.endpoint, book_id, request.query_string, headers['Accept-Encoding'])
+
+    def fetch():
+        response = upstream.get(path, params=params, headers=headers, stream=True)
+        with response:
+            return (response.status_code,
+                    [(name, response.headers[name]) for name in FORWARD_RESPONSE_HEADERS if name in response.headers],
+                    response.raw.read(decode_content=False))
+
+    def fetch_shared():
+        return flights.do(key, fetch)
+
+    entry, state = cache.lookup(key)
+    if state == 'STALE' and cache.claim_refresh(key):
+        cache.refresh_in_background(key, fetch_shared, ttl, stale_ttl)
+
+    if entry is None:
+        epoch = cache.epoch
+        try:
+            status, response_headers, body = fetch_shared()
+        except requests.exceptions.RequestException as e:
+            return _unavailable(route, e)
+        if needs_error_envelope(status, dict(response_headers).get('Content-Type')):
+            return jsonify(error_envelope(status)), status
+        if status != 200:
+            return Response(body, status=status, headers=response_headers)
+        cache.store(key, epoch, response_headers, body, ttl, stale_ttl)
+    else:
+        response_headers, body = entry.headers, entry.body
+
+    response = Response(body, headers=response_headers)
+    response.headers['X-Gateway-Cache'] = state
+    return response.make_conditional(request)
+
+def _proxy_view(upstream, route, cache, flights):
+    """View forwarding one route-table entry to its service. The upstream body
+    is streamed to the client as raw bytes, never decoded or re-serialized;
+    only non-JSON error responses are rewritten into the usual error envelope"""
+    def view(**path_params):
+        headers = {name: request.headers[name] for name in FORWARD_REQUEST_HEADERS if name in request.headers}
+        # requests would otherwise advertise gzip on the client's behalf
+        headers.setdefault('Accept-Encoding', 'identity')
+        path = route.target.format(**path_params)
+        # Unbounded listings are streamed through, never cached
+        if route.endpoint in CACHE_TTLS and request.args.get('limit') != pagination.UNBOUNDED:
+            return _cached_read(upstream, route, cache, flights, path, path_params.get('book_id'), headers)
+        headers.update(identity_header(request.headers.get('Authorization')))
+
+        if route.endpoint in STREAMED_UPLOADS:
+            body = {'data': request.stream, 'timeout': (upstream.timeout[0], STREAMED_UPLOADS[route.endpoint])}
+        else:
+            body = {'data': request.get_data()}
+
+        try:
+            response = upstream.request(route.method, path, params=request.args, headers=headers,
+                                        stream=True, **body)
+        except requests.exceptions.RequestException as e:
+            return _unavailable(route, e)
+
+        if route.endpoint in PURGES and response.status_code < 400:
+            param = PURGES[route.endpoint]
+            cache.purge(book_id=path_params.get(param), all_books=param == '*')
+
+        if needs_error_envelope(response.status_code, response.headers.get('Content-Type')):
+            response.close()
+            return jsonify(error_envelope(response.status_code)), response.status_code
+
+        proxied = Response(response.raw.stream(CHUNK_SIZE, decode_content=False), status=response.status_code,
+                           headers={name: response.headers[name] for name in FORWARD_RESPONSE_HEADERS
+                                    if name in response.headers})
+        # Hands the connection back to the pool once the body has been sent
+        proxied.call_on_close(response.close)
+        return proxied
+
+    view.__name__ = route.endpoint
+    return view
+
 def create_app(config_class=None):
     """Application factory function"""
     app = Flask(__name__)
@@ -139,9 +221,20 @@ def create_app(config_class=None):
     BOOK_SERVICE_URL = os.environ.get('BOOK_SERVICE_URL', 'http://book-service:5001')
     MEMBER_SERVICE_URL = os.environ.get('MEMBER_SERVICE_URL', 'http://member-service:5002')
     TRANSACTION_SERVICE_URL = os.environ.get('TRANSACTION_SERVICE_URL', 'http://transaction-service:5003')
+
+    # One keep-alive session per service instead of a new connection per call
+    book_service = Upstream('book-service', BOOK_SERVICE_URL)
+    member_service = Upstream('member-service', MEMBER_SERVICE_URL)
+    transaction_service = Upstream('transaction-service', TRANSACTION_SERVICE_URL)
+    upstreams = {u.name: u for u in (book_service, member_service, transaction_service)}
+    app.extensions['upstreams'] = dict(upstreams)
+    app.extensions['response_cache'] = ResponseCache()
+    app.extensions['single_flight'] = SingleFlight()
     
     # Initialize extensions
     jwt = JWTManager(app)
+    db_pool.init_app(app)
+    errors.register(app)
     
     # Configure CORS
     CORS(app, 
@@ -173,20 +266,27 @@ def create_app(config_class=None):
         if not email or not password:
             return jsonify({'error': 'Email and password are required'}), 400
 
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
+        conn = db_pool.get_db()
         cursor = conn.cursor()
 
         cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
         user_row = cursor.fetchone()
-        conn.close()
 
-        if not user_row or not check_password_hash(user_row['password'], password):
+        valid, upgraded_hash = False, None
+        if user_row:
+            valid, upgraded_hash = password_hasher.verify(user_row['password'], password)
+
+        if not valid:
             return jsonify({'error': 'Invalid email or password'}), 401
 
         if not user_row['isActive']:
             return jsonify({'error': 'Account is inactive'}), 403
 
+        # Stored hash predates the current cost parameters - upgrade it now
+        if upgraded_hash:
+            cursor.execute("UPDATE users SET password = ? WHERE id = ?", (upgraded_hash, user_row['id']))
+            conn.commit()
+
         # Create user object matching frontend expectations
         user = {
             'id': user_row['id'],  # Keep as integer for Angular
@@ -200,7 +300,7 @@ def create_app(config_class=None):
         }
 
         # Create JWT token
-        token = create_access_token(identity=user_row['id'])
+        token = create_access_token(identity=str(user_row['id']), additional_claims=claims.token_claims(user_row))
 
         return jsonify({
             'user': user,
@@ -219,17 +319,16 @@ def create_app(config_class=None):
         if not all([email, password, firstName, lastName]):
             return jsonify({'error': 'All fields are required'}), 400
 
-        conn = sqlite3.connect(DATABASE)
+        conn = db_pool.get_db()
         cursor = conn.cursor()
 
         # Check if user already exists
         cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
         if cursor.fetchone():
-            conn.close()
             return jsonify({'error': 'User with this email already exists'}), 400
 
         # Create new user
-        password_hash = generate_password_hash(password)
+        password_hash = password_hasher.hash(password)
         cursor.execute('''
             INSERT INTO users (email, password, firstName, lastName, role, isActive)
             VALUES (?, ?, ?, ?, ?, 1)
@@ -237,7 +336,6 @@ def create_app(config_class=None):
 
         user_id = cursor.lastrowid
         conn.commit()
-        conn.close()
 
         # Create user object matching frontend expectations
         user = {
@@ -252,117 +350,68 @@ def create_app(config_class=None):
         }
 
         # Create JWT token
-        token = create_access_token(identity=user_id)
+        token = create_access_token(identity=str(user_id), additional_claims=claims.token_claims(
+            {'role': role, 'isActive': True, 'authVersion': 0}))
 
         return jsonify({
             'user': user,
             'token': token
         })
 
-    # Book API Routes - Route to book service
-    @app.route('/api/books', methods=['GET'])
-    def get_books():
-        try:
-            response = requests.get(f"{BOOK_SERVICE_URL}/books")
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Book service unavailable: {str(e)}'}), 503
-
-    @app.route('/api/books/<int:book_id>', methods=['GET'])
-    def get_book(book_id):
-        try:
-            response = requests.get(f"{BOOK_SERVICE_URL}/books/{book_id}")
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Book service unavailable: {str(e)}'}), 503
-
-    @app.route('/api/books', methods=['POST'])
-    def create_book():
-        try:
-            # Forward the request with headers
-            headers = {'Authorization': request.headers.get('Authorization')}
-            response = requests.post(f"{BOOK_SERVICE_URL}/books", 
-                                  json=request.get_json(), 
-                                  headers=headers)
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Book service unavailable: {str(e)}'}), 503
-
-    @app.route('/api/books/<int:book_id>', methods=['PUT'])
-    def update_book(book_id):
-        try:
-            headers = {'Authorization': request.headers.get('Authorization')}
-            response = requests.put(f"{BOOK_SERVICE_URL}/books/{book_id}", 
-                                 json=request.get_json(), 
-                                 headers=headers)
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Book service unavailable: {str(e)}'}), 503
-
-    @app.route('/api/books/<int:book_id>', methods=['DELETE'])
-    def delete_book(book_id):
-        try:
-            headers = {'Authorization': request.headers.get('Authorization')}
-            response = requests.delete(f"{BOOK_SERVICE_URL}/books/{book_id}", 
-                                    headers=headers)
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Book service unavailable: {str(e)}'}), 503
-
-    # Transaction API Routes - Route to transaction service
-    @app.route('/api/borrow/<int:book_id>', methods=['POST'])
-    def borrow_book(book_id):
-        try:
-            headers = {'Authorization': request.headers.get('Authorization')}
-            response = requests.post(f"{TRANSACTION_SERVICE_URL}/borrow/{book_id}", 
-                                  json=request.get_json(), 
-                                  headers=headers)
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Transaction service unavailable: {str(e)}'}), 503
-
-    @app.route('/api/return/<int:transaction_id>', methods=['POST'])
-    def return_book(transaction_id):
-        try:
-            headers = {'Authorization': request.headers.get('Authorization')}
-            response = requests.post(f"{TRANSACTION_SERVICE_URL}/return/{transaction_id}", 
-                                  json=request.get_json(), 
-                                  headers=headers)
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Transaction service unavailable: {str(e)}'}), 503
-
-    @app.route('/api/transactions', methods=['GET'])
-    def get_transactions():
-        try:
-            headers = {'Authorization': request.headers.get('Authorization')}
-            response = requests.get(f"{TRANSACTION_SERVICE_URL}/transactions", 
-                                 headers=headers)
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Transaction service unavailable: {str(e)}'}), 503
-
-    # Member API Routes - Route to member service
-    @app.route('/api/members', methods=['GET'])
-    def get_members():
-        try:
-            headers = {'Authorization': request.headers.get('Authorization')}
-            response = requests.get(f"{MEMBER_SERVICE_URL}/members", 
-                                 headers=headers)
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Member service unavailable: {str(e)}'}), 503
-
-    @app.route('/api/members/<int:user_id>', methods=['PUT'])
-    def update_member(user_id):
-        try:
-            headers = {'Authorization': request.headers.get('Authorization')}
-            response = requests.put(f"{MEMBER_SERVICE_URL}/members/{user_id}", 
-                                 json=request.get_json(), 
-                                 headers=headers)
-            return jsonify(response.json()), response.status_code
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Member service unavailable: {str(e)}'}), 503
+    # Book, transaction and member API routes - stream through to the owning service
+    for route in PROXY_ROUTES:
+        app.add_url_rule(route.rule, endpoint=route.endpoint, methods=[route.method],
+                         view_func=_proxy_view(app.extensions['upstreams'][route.upstream], route,
+                                               app.extensions['response_cache'], app.extensions['single_flight']))
+
+    # Admin dashboard - every section requested at once, each with its own deadline
+    fanout = ThreadPoolExecutor(max_workers=3 * len(DASHBOARD_SECTIONS), thread_name_prefix='gateway-fanout')
+
+    @app.route('/api/dashboard', methods=['GET'])
+    def dashboard():
+        user_id, token_claims = claims.current_claims(revocations)
+        if not claims.is_admin(token_claims):
+            return jsonify({'error': 'Admin access required'}), 403
+
+        headers = {'Authorization': request.headers.get('Authorization'), 'Accept-Encoding': 'identity',
+                   **identity.headers(user_id, token_claims)}
+        futures = [(name, service, fanout.submit(_fetch_section, upstreams[service], path, headers, DASHBOARD_DEADLINE))
+                   for name, service, path in DASHBOARD_SECTIONS]
+        wait([future for _, _, future in futures], timeout=DASHBOARD_DEADLINE)
+
+        # Upstream JSON is spliced in as-is; failed sections become {"error": ...}
+        parts, failed = [], 0
+        for name, service, future in futures:
+            result = future.result() if future.done() and future.exception() is None else None
+            if result and result[0] == 200 and result[1].startswith('application/json'):
+                body = result[2]
+            else:
+                failed += 1
+                body = json.dumps({'error': _section_error(service, future, DASHBOARD_DEADLINE)}).encode()
+            parts.append(json.dumps(name).encode() + b':' + body)
+        parts.append(b'"partial":' + (b'true' if failed else b'false'))
+
+        status = 503 if failed == len(futures) else 200
+        return Response(b'{' + b','.join(parts) + b'}', status=status, mimetype='application/json')
+
+    # Gateway health - circuit breaker state per upstream, for monitoring
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        breakers = {name: upstream.breaker.stats()['state'] for name, upstream in app.extensions['upstreams'].items()}
+        status = 'degraded' if OPEN in breakers.values() else 'healthy'
+        return jsonify({'status': status, 'service': 'gateway', 'upstreams': breakers})
+
+    # Gateway metrics - upstream connection pools, breakers and bulkheads
+    @app.route('/api/gateway/stats', methods=['GET'])
+    def gateway_stats():
+        _, token_claims = claims.current_claims(revocations)
+        if not claims.is_admin(token_claims):
+            return jsonify({'error': 'Admin access required'}), 403
+
+        stats = {name: upstream.stats() for name, upstream in app.extensions['upstreams'].items()}
+        stats['response-cache'] = app.extensions['response_cache'].stats()
+        stats['single-flight'] = app.extensions['single_flight'].stats()
+        return jsonify(stats)
 
     # Handle preflight OPTIONS requests for CORS
     @app.before_request
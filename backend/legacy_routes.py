@@ -6,77 +6,31 @@ These routes maintain the same API structure as the original app.py
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3
 from datetime import datetime, timedelta
+from utils.db import ConnectionManager
+from utils import circulation, errors, pagination, schema
 import os
 
 legacy_bp = Blueprint('legacy', __name__)
+errors.register(legacy_bp)
 
 # Database setup
 DATABASE = 'library.db'
+db_pool = ConnectionManager(lambda: DATABASE, on_connect=schema.upgrade)
+
+@legacy_bp.record_once
+def _init_db_pool(state):
+    db_pool.init_app(state.app)
 
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            firstName TEXT NOT NULL,
-            lastName TEXT NOT NULL,
-            role TEXT NOT NULL DEFAULT 'member',
-            isActive BOOLEAN DEFAULT 1,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Books table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT,
-            category TEXT NOT NULL,
-            publishedYear INTEGER,
-            description TEXT,
-            totalCopies INTEGER NOT NULL,
-            availableCopies INTEGER NOT NULL,
-            imageUrl TEXT,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Transactions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bookId INTEGER NOT NULL,
-            userId INTEGER NOT NULL,
-            type TEXT NOT NULL,
-            issueDate TIMESTAMP NOT NULL,
-            dueDate TIMESTAMP NOT NULL,
-            returnDate TIMESTAMP,
-            status TEXT NOT NULL,
-            fine REAL DEFAULT 0,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (bookId) REFERENCES books (id),
-            FOREIGN KEY (userId) REFERENCES users (id)
-        )
-    ''')
-
-    conn.commit()
+    conn = db_pool.connect()
+    schema.bootstrap(conn)
     conn.close()
 
 def seed_data():
     """Seed the database with initial data"""
-    conn = sqlite3.connect(DATABASE)
+    conn = db_pool.connect()
     cursor = conn.cursor()
 
     # Check if data already exists
@@ -136,13 +90,11 @@ def auth_login():
     if not email or not password:
         return jsonify({'error': 'Email and password are required'}), 400
 
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
     user_row = cursor.fetchone()
-    conn.close()
 
     if not user_row or not check_password_hash(user_row['password'], password):
         return jsonify({'error': 'Invalid email or password'}), 401
@@ -183,13 +135,12 @@ def auth_signup():
     if not all([email, password, firstName, lastName]):
         return jsonify({'error': 'All fields are required'}), 400
 
-    conn = sqlite3.connect(DATABASE)
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     # Check if user already exists
     cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
     if cursor.fetchone():
-        conn.close()
         return jsonify({'error': 'User with this email already exists'}), 400
 
     # Create new user
@@ -201,7 +152,6 @@ def auth_signup():
 
     user_id = cursor.lastrowid
     conn.commit()
-    conn.close()
 
     # Create user object matching frontend expectations
     user = {
@@ -227,13 +177,19 @@ def auth_signup():
 # Legacy Book Routes
 @legacy_bp.route('/books', methods=['GET'])
 def get_books():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM books ORDER BY createdAt DESC")
-    books_rows = cursor.fetchall()
-    conn.close()
+    page = pagination.from_request(request.args)
+
+    if page.after:
+        cursor.execute('''
+            SELECT * FROM books WHERE (createdAt, id) < (?, ?)
+            ORDER BY createdAt DESC, id DESC LIMIT ?
+        ''', (*page.after, page.fetch))
+    else:
+        cursor.execute("SELECT * FROM books ORDER BY createdAt DESC, id DESC LIMIT ?", (page.fetch,))
+    books_rows, next_cursor = page.split(cursor.fetchall())
 
     books = []
     for book_row in books_rows:
@@ -253,17 +209,15 @@ def get_books():
         }
         books.append(book)
 
-    return jsonify(books)
+    return page.response(books, next_cursor)
 
 @legacy_bp.route('/books/<int:book_id>', methods=['GET'])
 def get_book(book_id):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = db_pool.get_db()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
     book_row = cursor.fetchone()
-    conn.close()
 
     if not book_row:
         return jsonify({'error': 'Book not found'}), 404
@@ -307,36 +261,8 @@ def borrow_book(book_id):
             except:
                 due_date = datetime.now() + timedelta(days=14)
 
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-        book_row = cursor.fetchone()
-
-        if not book_row:
-            conn.close()
-            return jsonify({'error': 'Book not found'}), 404
-
-        if book_row[8] <= 0:
-            conn.close()
-            return jsonify({'error': 'Book not available'}), 400
-
-        cursor.execute("SELECT id FROM transactions WHERE bookId = ? AND userId = ? AND status = 'active'", (book_id, current_user_id))
-        if cursor.fetchone():
-            conn.close()
-            return jsonify({'error': 'User already has this book'}), 400
-
-        issue_date = datetime.now()
-        cursor.execute('''
-            INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status)
-            VALUES (?, ?, 'issue', ?, ?, 'active')
-        ''', (book_id, current_user_id, issue_date, due_date))
-
-        transaction_id = cursor.lastrowid
-        cursor.execute("UPDATE books SET availableCopies = availableCopies - 1, updatedAt = ? WHERE id = ?", (datetime.now(), book_id))
-
-        conn.commit()
-        conn.close()
+        conn = db_pool.get_db()
+        transaction_id, issue_date = circulation.borrow_book(conn, book_id, current_user_id, due_date)
 
         transaction = {
             'id': str(transaction_id),
@@ -353,6 +279,8 @@ def borrow_book(book_id):
         }
 
         return jsonify(transaction), 201
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Authentication required'}), 401
 
@@ -377,46 +305,8 @@ def return_book(transaction_id):
             except:
                 return_date = datetime.now()
 
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
-        transaction_row = cursor.fetchone()
-
-        if not transaction_row:
-            conn.close()
-            return jsonify({'error': 'Transaction not found'}), 404
-
-        if transaction_row['status'] != 'active':
-            conn.close()
-            return jsonify({'error': 'Book is not currently issued'}), 400
-
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()['role']
-
-        if user_role != 'admin' and transaction_row['userId'] != current_user_id:
-            conn.close()
-            return jsonify({'error': 'You can only return your own books'}), 403
-
-        due_date = datetime.fromisoformat(transaction_row['dueDate'])
-        if return_date > due_date:
-            days_overdue = (return_date - due_date).days
-            fine = days_overdue * 10
-        else:
-            fine = 0
-
-        cursor.execute('''
-            UPDATE transactions
-            SET returnDate = ?, status = 'returned', fine = ?, updatedAt = ?
-            WHERE id = ?
-        ''', (return_date, fine, datetime.now(), transaction_id))
-
-        cursor.execute("UPDATE books SET availableCopies = availableCopies + 1, updatedAt = ? WHERE id = ?",
-                       (datetime.now(), transaction_row['bookId']))
-
-        conn.commit()
-        conn.close()
+        conn = db_pool.get_db()
+        transaction_row, fine = circulation.return_book(conn, transaction_id, current_user_id, return_date)
 
         transaction = {
             'id': str(transaction_id),
@@ -433,6 +323,8 @@ def return_book(transaction_id):
         }
 
         return jsonify(transaction)
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Authentication required'}), 401
 
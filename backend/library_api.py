@@ -0,0 +1,36 @@
+"""
+SQLAlchemy-backed library API: the models/ and routes/ blueprints on one app
+Run: flask --app library_api:create_app run
+"""
+
+from flask import Flask
+from flask_cors import CORS
+from config import Config
+from extensions import db, jwt, migrate
+from models import overdue_sweeper
+from routes.auth import auth_bp
+from routes.books import books_bp
+from routes.members import members_bp
+from routes.transactions import transactions_bp
+
+
+def create_app(config_class=Config):
+    """Application factory function"""
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    # Initialize extensions
+    db.init_app(app)
+    migrate.init_app(app, db)
+    jwt.init_app(app)
+    CORS(app)
+
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(books_bp, url_prefix='/books')
+    app.register_blueprint(members_bp, url_prefix='/members')
+    app.register_blueprint(transactions_bp, url_prefix='/transactions')
+
+    # Only the first process on the host to get here sweeps; see OVERDUE_SWEEP_LOCK
+    overdue_sweeper.OverdueSweeper(app).start()
+
+    return app
@@ -1,9 +1,9 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_identity, jwt_required
-import sqlite3
+from flask_jwt_extended import JWTManager
 import os
-from datetime import datetime
+from utils.db import ConnectionManager
+from utils import claims, errors, pagination, schema
 from functools import wraps
 
 app = Flask(__name__)
@@ -23,26 +23,24 @@ CORS(app,
 
 # Database setup
 DATABASE = os.environ.get('DATABASE_URL', 'library.db')
+db_pool = ConnectionManager(lambda: DATABASE, app, on_connect=schema.upgrade)
+revocations = claims.Revocations(db_pool)
+errors.register(app)
 
 def admin_required(fn):
     """Decorator to require admin role for protected routes"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             
-            # Check if user is admin
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-            user_role = cursor.fetchone()
-            conn.close()
-            
-            if not user_role or user_role[0] != 'admin':
+            # Check if user is admin - from the token, no users lookup
+            if not claims.is_admin(token_claims):
                 return jsonify({'error': 'Admin access required'}), 403
             
             return fn(*args, **kwargs)
+        except errors.ApiError:
+            raise
         except Exception as e:
             return jsonify({'error': 'Authentication required'}), 401
     
@@ -58,31 +56,34 @@ def health_check():
 @admin_required
 def get_members():
     try:
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
+        conn = db_pool.get_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE role = 'member' ORDER BY createdAt DESC")
-        members_rows = cursor.fetchall()
-        conn.close()
-
-        members = []
-        for member_row in members_rows:
-            member = {
-                'id': member_row['id'],  # Keep as integer for Angular
-                'email': member_row['email'],
-                'password': '',  # Don't return password
-                'firstName': member_row['firstName'],
-                'lastName': member_row['lastName'],
-                'role': member_row['role'],
-                'createdAt': member_row['createdAt'],
-                'isActive': bool(member_row['isActive'])
-            }
-            members.append(member)
-
-        return jsonify(members)
+        page = pagination.from_request(request.args, allow_unbounded=True)
+
+        if page.after:
+            cursor.execute('''
+                SELECT createdAt, id, json FROM members_json WHERE role = 'member' AND (createdAt, id) < (?, ?)
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (*page.after, page.fetch))
+        else:
+            cursor.execute("SELECT createdAt, id, json FROM members_json WHERE role = 'member' ORDER BY createdAt DESC, id DESC LIMIT ?",
+                           (page.fetch,))
+
+        return page.respond(cursor, db_pool)
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to fetch members'}), 500
 
+@app.route('/members/summary', methods=['GET'])
+@admin_required
+def get_members_summary():
+    """Member totals for the admin dashboard"""
+    row = db_pool.get_db().execute(
+        "SELECT count(*) AS totalMembers, coalesce(sum(isActive), 0) AS activeMembers FROM users WHERE role = 'member'"
+    ).fetchone()
+    return jsonify(dict(row))
+
 @app.route('/members/<int:user_id>', methods=['PUT'])
 @admin_required
 def update_member(user_id):
@@ -93,19 +94,17 @@ def update_member(user_id):
         if is_active is None:
             return jsonify({'error': 'isActive field is required'}), 400
 
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
+        conn = db_pool.get_db()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM users WHERE id = ? AND role = 'member'", (user_id,))
         member_row = cursor.fetchone()
 
         if not member_row:
-            conn.close()
             return jsonify({'error': 'Member not found'}), 404
 
         cursor.execute("UPDATE users SET isActive = ? WHERE id = ?", (is_active, user_id))
         conn.commit()
-        conn.close()
+        revocations.expire()
 
         member = {
             'id': user_id,  # Keep as integer for Angular
@@ -119,6 +118,8 @@ def update_member(user_id):
         }
 
         return jsonify(member)
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to update member'}), 500
 
@@ -0,0 +1,117 @@
+"""
+Dashboard statistics kept in a small counters table
+Each statistic is one stats_counters row. SQLite triggers on users and
+transactions add or subtract the changed row's contribution inside the same
+database transaction as the write (borrow, return, block, unblock, ...), so
+the stats endpoints read a handful of rows instead of counting tables. The
+same per-row predicates drive rebuild(), which recomputes every counter with
+one conditional-aggregation pass per table
+"""
+
+from sqlalchemy import DDL, event, text
+from extensions import db
+from models.user import User
+from models.transaction import Transaction
+
+# counter name -> whether a row ({r}) counts towards it; enums are stored by name
+TRANSACTION_COUNTERS = {
+    'total_transactions': '1',
+    'active_transactions': "{r}.status IN ('ISSUED', 'OVERDUE')",
+    'returned_transactions': "{r}.status = 'RETURNED'",
+    'overdue_transactions': "{r}.status = 'OVERDUE'",
+}
+
+MEMBER_COUNTERS = {
+    'total_members': "{r}.role = 'MEMBER'",
+    'active_members': "{r}.role = 'MEMBER' AND {r}.status = 'ACTIVE'",
+    'blocked_members': "{r}.role = 'MEMBER' AND {r}.status = 'BLOCKED'",
+    # active_loans is itself kept by the loan counter triggers (models.loan_counters)
+    'members_with_active_books': "{r}.role = 'MEMBER' AND {r}.active_loans > 0",
+}
+
+
+class StatsCounter(db.Model):
+    __tablename__ = 'stats_counters'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<StatsCounter {self.name}={self.value}>'
+
+
+def _contribution(counters, row):
+    """CASE expression giving a row's 0/1 contribution to each counter"""
+    branches = ' '.join(f"WHEN '{name}' THEN ({predicate.format(r=row)})"
+                        for name, predicate in counters.items())
+    return f'(CASE name {branches} ELSE 0 END)'
+
+
+def _triggers(table, counters, watched_columns):
+    names = ', '.join(f"'{name}'" for name in counters)
+    prefix = f'{table}_stats_counters'
+    return (
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} BEGIN
+            UPDATE stats_counters SET value = value + {_contribution(counters, 'new')} WHERE name IN ({names});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE OF {watched_columns} ON {table} BEGIN
+            UPDATE stats_counters
+            SET value = value + {_contribution(counters, 'new')} - {_contribution(counters, 'old')}
+            WHERE name IN ({names});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN
+            UPDATE stats_counters SET value = value - {_contribution(counters, 'old')} WHERE name IN ({names});
+        END
+        ''',
+    )
+
+
+TRIGGERS = {
+    Transaction.__table__: _triggers('transactions', TRANSACTION_COUNTERS, 'status'),
+    User.__table__: _triggers('users', MEMBER_COUNTERS, 'role, status, active_loans'),
+}
+
+for _table, _statements in TRIGGERS.items():
+    for _trigger in _statements:
+        event.listen(_table, 'after_create', DDL(_trigger).execute_if(dialect='sqlite'))
+
+# A fresh database starts with every counter at zero
+event.listen(StatsCounter.__table__, 'after_create', DDL(
+    'INSERT INTO stats_counters (name, value) VALUES '
+    + ', '.join(f"('{name}', 0)" for name in {**TRANSACTION_COUNTERS, **MEMBER_COUNTERS})
+))
+
+
+def read(counters):
+    """{name: value} for the given counters"""
+    rows = StatsCounter.query.filter(StatsCounter.name.in_(list(counters))).all()
+    values = dict.fromkeys(counters, 0)
+    values.update((row.name, row.value) for row in rows)
+    return values
+
+
+def _aggregate(table, counters):
+    columns = ', '.join(f'coalesce(sum(CASE WHEN {predicate.format(r=table)} THEN 1 ELSE 0 END), 0) AS {name}'
+                        for name, predicate in counters.items())
+    return db.session.execute(text(f'SELECT {columns} FROM {table}')).one()._asdict()
+
+
+def rebuild():
+    """Recompute every counter from scratch, one pass over each table, and
+    (re)install the triggers; returns the rebuilt {name: value}"""
+    for statements in TRIGGERS.values():
+        for trigger in statements:
+            db.session.execute(text(trigger))
+
+    values = {**_aggregate('transactions', TRANSACTION_COUNTERS), **_aggregate('users', MEMBER_COUNTERS)}
+    db.session.execute(text('''
+        INSERT INTO stats_counters (name, value) VALUES (:name, :value)
+        ON CONFLICT (name) DO UPDATE SET value = excluded.value
+    '''), [{'name': name, 'value': value} for name, value in values.items()])
+    db.session.commit()
+    return values
@@ -0,0 +1,67 @@
+"""
+Per-member loan counters kept on the users row
+SQLite triggers on transactions keep users.total_loans, active_loans and
+overdue_loans current inside the same database transaction as the write,
+whatever code makes it, so the borrow limit and member listings read one row
+instead of counting loans. Statuses are compared by their stored enum names
+"""
+
+from sqlalchemy import DDL, event, func, or_, select, text, update
+from extensions import db
+from models.user import User
+from models.transaction import ACTIVE_STATUSES, Transaction, TransactionStatus
+
+# Counter deltas a loan row contributes, given its row alias (new or old)
+_CONTRIBUTION = '''
+    total_loans = total_loans {sign} 1,
+    active_loans = active_loans {sign} ({row}.status IN ('ISSUED', 'OVERDUE')),
+    overdue_loans = overdue_loans {sign} ({row}.status = 'OVERDUE')
+'''
+
+TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS transactions_loan_counters_insert AFTER INSERT ON transactions BEGIN
+        UPDATE users SET {_CONTRIBUTION.format(sign='+', row='new')} WHERE id = new.user_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS transactions_loan_counters_update
+    AFTER UPDATE OF status, user_id ON transactions
+    WHEN old.status IS NOT new.status OR old.user_id IS NOT new.user_id BEGIN
+        UPDATE users SET {_CONTRIBUTION.format(sign='-', row='old')} WHERE id = old.user_id;
+        UPDATE users SET {_CONTRIBUTION.format(sign='+', row='new')} WHERE id = new.user_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS transactions_loan_counters_delete AFTER DELETE ON transactions BEGIN
+        UPDATE users SET {_CONTRIBUTION.format(sign='-', row='old')} WHERE id = old.user_id;
+    END
+    ''',
+)
+
+for _trigger in TRIGGERS:
+    event.listen(Transaction.__table__, 'after_create', DDL(_trigger).execute_if(dialect='sqlite'))
+
+
+def _loan_count(*criteria):
+    return select(func.count(Transaction.id)) \
+        .where(Transaction.user_id == User.id, *criteria) \
+        .scalar_subquery()
+
+
+def reconcile():
+    """Recompute every member's counters from the transactions table and
+    (re)install the triggers; returns the number of members corrected"""
+    for trigger in TRIGGERS:
+        db.session.execute(text(trigger))
+
+    total = _loan_count()
+    active = _loan_count(Transaction.status.in_(ACTIVE_STATUSES))
+    overdue = _loan_count(Transaction.status == TransactionStatus.OVERDUE)
+    result = db.session.execute(
+        update(User)
+        .where(or_(User.total_loans != total, User.active_loans != active, User.overdue_loans != overdue))
+        .values(total_loans=total, active_loans=active, overdue_loans=overdue)
+    )
+    db.session.commit()
+    return result.rowcount
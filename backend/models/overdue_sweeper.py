@@ -0,0 +1,197 @@
+"""
+Background sweeper that materializes overdue loans and their accrued fines
+Each sweep flips ISSUED loans past their due date to OVERDUE in small batches
+read through the (status, due_date) index, then walks the OVERDUE loans in
+(due_date, id) order bringing their fines up to date. The fine pass records
+its position in sweep_checkpoints in the same commit as each batch, so an
+interrupted pass resumes where it stopped. Overdue listings, the loan counters
+and the dashboard statistics read the stored status, adding only the loans
+fallen due since the last sweep (Transaction.past_due). The app factory
+starts the sweeper; a file lock keeps it to one process per host however
+many workers load the app, and sweeps are idempotent besides
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, Integer, cast, func, literal, select, tuple_, update
+from extensions import db
+from models.transaction import Transaction, TransactionStatus
+from utils.circulation import FINE_PER_DAY
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process guard
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+SWEEP_INTERVAL = 60  # seconds between sweeps
+FINE_REFRESH = timedelta(hours=1)  # fines grow once a day, so an hourly pass keeps them current
+
+SweepResult = namedtuple('SweepResult', 'flipped fined')
+
+
+class SweepCheckpoint(db.Model):
+    __tablename__ = 'sweep_checkpoints'
+
+    name = db.Column(db.String(50), primary_key=True)
+    as_of = db.Column(db.DateTime)  # time the pass computes fines for
+    after_due = db.Column(db.DateTime)  # last (due_date, id) processed
+    after_id = db.Column(db.Integer)
+    completed_at = db.Column(db.DateTime)  # null while the pass is in progress
+
+    def __repr__(self):
+        return f'<SweepCheckpoint {self.name} after {self.after_id}>'
+
+
+def accrued_fine(as_of):
+    """SQL counterpart of Transaction.accrued_fine"""
+    days = cast(func.julianday(literal(as_of, DateTime)) - func.julianday(Transaction.due_date), Integer)
+    return FINE_PER_DAY * func.max(days, 0)
+
+
+def flip_overdue(now, batch_size=BATCH_SIZE):
+    """Mark ISSUED loans due before `now` as OVERDUE, one committed batch at
+    a time; returns the number of loans flipped"""
+    flipped = 0
+    while True:
+        batch = select(Transaction.id) \
+            .where(Transaction.past_due(now)) \
+            .order_by(Transaction.due_date) \
+            .limit(batch_size) \
+            .scalar_subquery()
+        result = db.session.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(batch))
+            .values(status=TransactionStatus.OVERDUE, fine=accrued_fine(now))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        flipped += result.rowcount
+        if result.rowcount < batch_size:
+            return flipped
+
+
+def refresh_fines(now, batch_size=BATCH_SIZE):
+    """Bring OVERDUE loans' fines up to date, resuming an interrupted pass or
+    starting a new one once the last is FINE_REFRESH old; returns the number
+    of fines changed"""
+    checkpoint = db.session.get(SweepCheckpoint, 'fines')
+    if checkpoint is None:
+        checkpoint = SweepCheckpoint(name='fines')
+        db.session.add(checkpoint)
+    if checkpoint.as_of is None or checkpoint.completed_at is not None:
+        if checkpoint.completed_at is not None and now - checkpoint.as_of < FINE_REFRESH:
+            return 0
+        checkpoint.as_of, checkpoint.after_due, checkpoint.after_id = now, None, None
+        checkpoint.completed_at = None
+        db.session.commit()
+
+    fined = 0
+    while True:
+        query = select(Transaction.id, Transaction.due_date) \
+            .where(Transaction.status == TransactionStatus.OVERDUE)
+        if checkpoint.after_id is not None:
+            query = query.where(tuple_(Transaction.due_date, Transaction.id)
+                                > tuple_(checkpoint.after_due, checkpoint.after_id))
+        rows = db.session.execute(
+            query.order_by(Transaction.due_date, Transaction.id).limit(batch_size)).all()
+        if not rows:
+            checkpoint.completed_at = now
+            db.session.commit()
+            return fined
+
+        fine = accrued_fine(checkpoint.as_of)
+        result = db.session.execute(
+            update(Transaction)
+            .where(Transaction.id.in_([row.id for row in rows]), Transaction.fine.is_distinct_from(fine))
+            .values(fine=fine)
+            .execution_options(synchronize_session=False)
+        )
+        checkpoint.after_due, checkpoint.after_id = rows[-1].due_date, rows[-1].id
+        db.session.commit()
+        fined += result.rowcount
+
+
+def sweep(now=None, batch_size=BATCH_SIZE):
+    """Run one sweep: flip newly overdue loans, then refresh fines"""
+    now = now or datetime.utcnow()
+    return SweepResult(flip_overdue(now, batch_size), refresh_fines(now, batch_size))
+
+
+class OverdueSweeper:
+    """Runs sweep() every OVERDUE_SWEEP_INTERVAL seconds on a daemon thread
+    once start() is called; an interval of 0 leaves it stopped (run
+    `flask transactions sweep-overdue` from cron instead). While running it
+    holds an exclusive lock on OVERDUE_SWEEP_LOCK, so other processes'
+    sweepers stay stopped"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = SWEEP_INTERVAL
+        self.lock_path = None
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('OVERDUE_SWEEP_INTERVAL', SWEEP_INTERVAL)
+        self.lock_path = app.config.get('OVERDUE_SWEEP_LOCK')
+        app.extensions['overdue_sweeper'] = self
+
+    def start(self):
+        """Start sweeping unless disabled or another process already is;
+        returns whether this sweeper is running"""
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        if not self.interval or not self._claim():
+            return False
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='overdue-sweeper', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def _claim(self):
+        """Non-blocking exclusive lock on lock_path, held until stop() or exit"""
+        if self.lock_path is None or fcntl is None:
+            return True
+        handle = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            logger.info("Overdue sweeper not started: %s is held by another process", self.lock_path)
+            return False
+        self._lock = handle
+        return True
+
+    def run_once(self):
+        """Sweep inside an app context; errors are logged, not raised, so the
+        thread keeps going"""
+        with self.app.app_context():
+            try:
+                return sweep()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Overdue sweep failed")
+
+    def _run(self):
+        while True:
+            self.run_once()
+            if self._stopped.wait(self.interval):
+                return
@@ -1,22 +1,31 @@
 from extensions import db
 from datetime import datetime, timedelta
 from enum import Enum
+from utils.circulation import FINE_PER_DAY
 
 class TransactionStatus(Enum):
     ISSUED = "issued"
     RETURNED = "returned"
     OVERDUE = "overdue"
 
+# Loans not yet returned; OVERDUE is written by the overdue sweeper (models.overdue_sweeper)
+ACTIVE_STATUSES = (TransactionStatus.ISSUED, TransactionStatus.OVERDUE)
+
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Overdue sweeps and listings read ISSUED and OVERDUE loans in due date order
+        db.Index('ix_transactions_status_due_date', 'status', 'due_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
     issue_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     due_date = db.Column(db.DateTime, nullable=False)
     return_date = db.Column(db.DateTime, nullable=True)
     status = db.Column(db.Enum(TransactionStatus), nullable=False, default=TransactionStatus.ISSUED)
+    fine = db.Column(db.Float, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __init__(self, user_id, book_id, days_to_return=14):
@@ -26,13 +35,32 @@ class Transaction(db.Model):
         self.due_date = self.issue_date + timedelta(days=days_to_return)
         self.status = TransactionStatus.ISSUED
     
+    @classmethod
+    def past_due(cls, now=None):
+        """ISSUED loans past their due date that the sweeper hasn't marked yet;
+        an index range on (status, due_date), empty right after a sweep"""
+        return db.and_(cls.status == TransactionStatus.ISSUED, cls.due_date < (now or datetime.utcnow()))
+    
+    @classmethod
+    def overdue(cls, now=None):
+        """Overdue loans, whether or not the sweeper has marked them yet"""
+        return db.or_(cls.status == TransactionStatus.OVERDUE, cls.past_due(now))
+    
     def is_overdue(self):
-        """Check if transaction is overdue"""
+        """Check if transaction is overdue, whether or not the sweeper has marked it yet"""
+        if self.status == TransactionStatus.OVERDUE:
+            return True
         return datetime.utcnow() > self.due_date and self.status == TransactionStatus.ISSUED
     
+    def accrued_fine(self, as_of=None):
+        """Fine owed as of `as_of` (default now): whole days past due times the daily rate"""
+        as_of = as_of or datetime.utcnow()
+        return max((as_of - self.due_date).days, 0) * FINE_PER_DAY
+    
     def return_book(self):
-        """Mark book as returned"""
+        """Mark book as returned and settle the fine"""
         self.return_date = datetime.utcnow()
+        self.fine = self.accrued_fine(self.return_date)
         self.status = TransactionStatus.RETURNED
     
     def days_overdue(self):
@@ -49,7 +77,9 @@ class Transaction(db.Model):
             'bookId': self.book_id,
             'issueDate': self.issue_date.isoformat(),
             'returnDate': self.return_date.isoformat() if self.return_date else None,
-            'status': self.status.value
+            'status': self.status.value,
+            # Open loans report the fine as of now; the stored one may be a sweep old
+            'fine': self.accrued_fine() if self.status in ACTIVE_STATUSES else self.fine or 0
         }
     
     def __repr__(self):
@@ -22,6 +22,11 @@ class User(db.Model):
     status = db.Column(db.Enum(UserStatus), nullable=False, default=UserStatus.ACTIVE)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Loan counters, maintained by triggers on transactions (see models.loan_counters)
+    total_loans = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    active_loans = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    overdue_loans = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     transactions = db.relationship('Transaction', backref='user', lazy=True, cascade='all, delete-orphan')
     
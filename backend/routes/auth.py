@@ -40,7 +40,7 @@ def signup():
         db.session.commit()
         
         # Create access token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=str(user.id))
         
         return {
             'success': True,
@@ -71,7 +71,7 @@ def login():
         return error_response("Account is blocked", 403)
     
     # Create access token
-    access_token = create_access_token(identity=user.id)
+    access_token = create_access_token(identity=str(user.id))
     
     return {
         'success': True,
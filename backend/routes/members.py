@@ -4,12 +4,16 @@ from marshmallow import ValidationError
 from extensions import db
 from models.user import User, UserRole, UserStatus
 from models.transaction import Transaction
+from models import library_stats
 from schemas.user_schema import UserResponseSchema, UserUpdateSchema
 from utils.decorators import admin_required, active_user_required
 from utils.helpers import success_response, error_response
 
 members_bp = Blueprint('members', __name__)
 
+DEFAULT_PER_PAGE = 100
+MAX_PER_PAGE = 500
+
 # Initialize schemas
 user_response_schema = UserResponseSchema()
 user_update_schema = UserUpdateSchema()
@@ -45,33 +49,34 @@ def get_all_members():
             (User.email.ilike(f"%{search}%"))
         )
     
-    users = query.order_by(User.created_at.desc()).all()
-    
-    # Add transaction statistics for each user
+    total = query.order_by(None).count()
+
+    # Pagination
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', DEFAULT_PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    page_users = query.order_by(User.created_at.desc(), User.id.desc()) \
+        .limit(per_page).offset((page - 1) * per_page).subquery()
+    member = db.aliased(User, page_users)
+
+    # Loan statistics come from the counters on each member row, plus loans
+    # fallen due since the last overdue sweep, one grouped query for the page
+    rows = db.session.query(member, db.func.count(Transaction.id)) \
+        .outerjoin(Transaction, db.and_(Transaction.user_id == member.id, Transaction.past_due())) \
+        .group_by(member.id) \
+        .order_by(member.created_at.desc(), member.id.desc()) \
+        .all()
+
     users_data = []
-    for user in users:
+    for user, unswept_overdue in rows:
         user_dict = user_response_schema.dump(user)
-        
-        # Get transaction statistics
-        total_transactions = Transaction.query.filter_by(user_id=user.id).count()
-        active_transactions = Transaction.query.filter_by(
-            user_id=user.id, 
-            status='issued'
-        ).count()
-        overdue_transactions = Transaction.query.filter_by(user_id=user.id).filter(
-            Transaction.due_date < db.func.current_timestamp(),
-            Transaction.status == 'issued'
-        ).count()
-        
         user_dict.update({
-            'total_transactions': total_transactions,
-            'active_transactions': active_transactions,
-            'overdue_transactions': overdue_transactions
+            'total_transactions': user.total_loans,
+            'active_transactions': user.active_loans,
+            'overdue_transactions': user.overdue_loans + unswept_overdue
         })
-        
         users_data.append(user_dict)
-    
-    return users_data
+
+    return users_data, 200, {'X-Total-Count': str(total)}
 
 @members_bp.route('/<int:user_id>', methods=['GET'])
 @admin_required
@@ -179,27 +184,8 @@ def unblock_member(user_id):
 @admin_required
 def get_member_stats():
     """Get member statistics (admin only)"""
-    total_members = User.query.filter(User.role == UserRole.MEMBER).count()
-    active_members = User.query.filter(
-        User.role == UserRole.MEMBER,
-        User.status == UserStatus.ACTIVE
-    ).count()
-    blocked_members = User.query.filter(
-        User.role == UserRole.MEMBER,
-        User.status == UserStatus.BLOCKED
-    ).count()
-    
-    # Members with active transactions
-    members_with_books = db.session.query(User.id).join(Transaction).filter(
-        User.role == UserRole.MEMBER,
-        Transaction.status == 'issued'
-    ).distinct().count()
-    
-    stats = {
-        'total_members': total_members,
-        'active_members': active_members,
-        'blocked_members': blocked_members,
-        'members_with_active_books': members_with_books
-    }
+    if request.args.get('rebuild', '').lower() in ('1', 'true'):
+        library_stats.rebuild()
+    stats = library_stats.read(library_stats.MEMBER_COUNTERS)
     
     return stats
@@ -1,11 +1,12 @@
+import click
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity
 from marshmallow import ValidationError
-from datetime import datetime
 from extensions import db
 from models.book import Book
 from models.user import User
-from models.transaction import Transaction, TransactionStatus
+from models.transaction import ACTIVE_STATUSES, Transaction, TransactionStatus
+from models import library_stats, loan_counters, overdue_sweeper
 from schemas.transaction_schema import (
     TransactionCreateSchema, TransactionReturnSchema, 
     TransactionResponseSchema, TransactionSearchSchema
@@ -15,6 +16,8 @@ from utils.helpers import success_response, error_response
 
 transactions_bp = Blueprint('transactions', __name__)
 
+MAX_ACTIVE_LOANS = 5
+
 # Initialize schemas
 transaction_create_schema = TransactionCreateSchema()
 transaction_return_schema = TransactionReturnSchema()
@@ -49,14 +52,11 @@ def get_transactions():
     
     # Filter by status
     if search_params.get('status'):
-        query = query.filter(Transaction.status == search_params['status'])
+        query = query.filter(Transaction.status == TransactionStatus(search_params['status']))
     
     # Filter overdue only
     if search_params.get('overdue_only'):
-        query = query.filter(
-            Transaction.due_date < datetime.utcnow(),
-            Transaction.status == TransactionStatus.ISSUED
-        )
+        query = query.filter(Transaction.overdue())
     
     transactions = query.order_by(Transaction.created_at.desc()).all()
     
@@ -84,23 +84,18 @@ def borrow_book():
         return error_response("Book is not available", 400)
     
     # Check if user already has this book
-    existing_transaction = Transaction.query.filter_by(
-        user_id=current_user.id,
-        book_id=book.id,
-        status=TransactionStatus.ISSUED
+    existing_transaction = Transaction.query.filter(
+        Transaction.user_id == current_user.id,
+        Transaction.book_id == book.id,
+        Transaction.status.in_(ACTIVE_STATUSES)
     ).first()
     
     if existing_transaction:
         return error_response("You have already borrowed this book", 400)
     
-    # Check borrowing limit (e.g., max 5 books per user)
-    active_transactions = Transaction.query.filter_by(
-        user_id=current_user.id,
-        status=TransactionStatus.ISSUED
-    ).count()
-    
-    if active_transactions >= 5:
-        return error_response("You have reached the maximum borrowing limit (5 books)", 400)
+    # Check borrowing limit from the member's loan counter
+    if current_user.active_loans >= MAX_ACTIVE_LOANS:
+        return error_response(f"You have reached the maximum borrowing limit ({MAX_ACTIVE_LOANS} books)", 400)
     
     # Create transaction
     transaction = Transaction(
@@ -114,6 +109,15 @@ def borrow_book():
     
     try:
         db.session.add(transaction)
+        db.session.flush()
+        
+        # The insert trigger has counted this loan inside our write transaction,
+        # so a concurrent borrow that also passed the check above is caught here
+        active_loans = db.session.query(User.active_loans).filter_by(id=current_user.id).scalar()
+        if active_loans > MAX_ACTIVE_LOANS:
+            db.session.rollback()
+            return error_response(f"You have reached the maximum borrowing limit ({MAX_ACTIVE_LOANS} books)", 400)
+        
         db.session.commit()
         
         return transaction.to_dict(), 201
@@ -168,9 +172,9 @@ def get_my_books():
     """Get current user's active transactions"""
     current_user = get_current_user()
     
-    active_transactions = Transaction.query.filter_by(
-        user_id=current_user.id,
-        status=TransactionStatus.ISSUED
+    active_transactions = Transaction.query.filter(
+        Transaction.user_id == current_user.id,
+        Transaction.status.in_(ACTIVE_STATUSES)
     ).join(Book).order_by(Transaction.created_at.desc()).all()
     
     return [transaction.to_dict() for transaction in active_transactions]
@@ -192,8 +196,7 @@ def get_transaction_history():
 def get_overdue_transactions():
     """Get all overdue transactions (admin only)"""
     overdue_transactions = Transaction.query.filter(
-        Transaction.due_date < datetime.utcnow(),
-        Transaction.status == TransactionStatus.ISSUED
+        Transaction.overdue()
     ).join(User).join(Book).order_by(Transaction.due_date).all()
     
     return [transaction.to_dict() for transaction in overdue_transactions]
@@ -202,20 +205,24 @@ def get_overdue_transactions():
 @admin_required
 def get_transaction_stats():
     """Get transaction statistics (admin only)"""
-    total_transactions = Transaction.query.count()
-    active_transactions = Transaction.query.filter_by(status=TransactionStatus.ISSUED).count()
-    returned_transactions = Transaction.query.filter_by(status=TransactionStatus.RETURNED).count()
-    
-    overdue_transactions = Transaction.query.filter(
-        Transaction.due_date < datetime.utcnow(),
-        Transaction.status == TransactionStatus.ISSUED
-    ).count()
+    if request.args.get('rebuild', '').lower() in ('1', 'true'):
+        library_stats.rebuild()
+    stats = library_stats.read(library_stats.TRANSACTION_COUNTERS)
     
-    stats = {
-        'total_transactions': total_transactions,
-        'active_transactions': active_transactions,
-        'returned_transactions': returned_transactions,
-        'overdue_transactions': overdue_transactions
-    }
+    # The counter covers loans the sweeper has marked; add any that fell due since
+    stats['overdue_transactions'] += Transaction.query.filter(Transaction.past_due()).count()
     
     return stats
+
+@transactions_bp.cli.command('reconcile-loans')
+def reconcile_loans_command():
+    """Recompute every member's loan counters from the transactions table"""
+    corrected = loan_counters.reconcile()
+    click.echo(f"Loan counters reconciled, {corrected} member(s) corrected")
+
+@transactions_bp.cli.command('sweep-overdue')
+@click.option('--batch-size', default=overdue_sweeper.BATCH_SIZE, show_default=True)
+def sweep_overdue_command(batch_size):
+    """Mark newly overdue loans and bring accrued fines up to date"""
+    result = overdue_sweeper.sweep(batch_size=batch_size)
+    click.echo(f"{result.flipped} loan(s) marked overdue, {result.fined} fine(s) updated")
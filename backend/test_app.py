@@ -314,5 +314,49 @@ class TestBorrowBookEndpoint:
         assert 'Authentication' in data['error'] or 'Authorization' in data['error']
 
 
+class TestBatchEndpoints:
+    """Test cases for /api/borrow/batch and /api/return/batch"""
+
+    def test_borrow_then_return_batch(self, client, auth_token, test_book_id):
+        """Per-item results in request order; one bad id doesn't fail the batch"""
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        conn = sqlite3.connect(app.config['DATABASE'])
+        conn.execute("UPDATE books SET availableCopies = 2 WHERE id IN (1, ?)", (test_book_id,))
+        conn.commit()
+        conn.close()
+
+        response = client.post('/api/borrow/batch', headers=headers,
+                               json={'bookIds': [1, test_book_id, 99999]})
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert (data['succeeded'], data['failed']) == (2, 1)
+        assert [result['status'] for result in data['results']] == [201, 201, 404]
+        assert data['results'][2]['error'] == 'Book not found'
+        transaction_ids = [int(result['transaction']['id']) for result in data['results'][:2]]
+
+        response = client.post('/api/return/batch', headers=headers,
+                               json={'transactionIds': transaction_ids + transaction_ids[:1]})
+
+        data = response.get_json()
+        assert [result['status'] for result in data['results']] == [200, 200, 400]
+        assert data['results'][0]['transaction']['status'] == 'returned'
+
+        conn = sqlite3.connect(app.config['DATABASE'])
+        copies = conn.execute("SELECT availableCopies FROM books WHERE id IN (1, ?) ORDER BY id",
+                              (test_book_id,)).fetchall()
+        conn.close()
+        assert copies == [(2,), (2,)]
+
+    def test_batch_rejects_bad_body(self, client, auth_token):
+        response = client.post('/api/borrow/batch', headers={'Authorization': f'Bearer {auth_token}'},
+                               json={'bookIds': 'all'})
+        assert response.status_code == 400
+
+    def test_batch_unauthorized(self, client):
+        response = client.post('/api/return/batch', json={'transactionIds': [1]})
+        assert response.status_code == 401
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,90 @@
+import asyncio
+from starlette.testclient import TestClient
+import async_gateway
+import gateway
+from conftest import RecordingService
+from utils import identity
+
+
+def test_async_gateway_proxies_route_table(book_service, monkeypatch):
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+
+    with TestClient(async_gateway.create_app()) as client:
+        for state in ('MISS', 'HIT', 'HIT'):
+            response = client.get('/api/books/1', headers={'Origin': 'http://localhost:4200'})
+            assert response.status_code == 200
+            assert response.json()[0]['title'] == 'Dune'
+            assert response.headers['Access-Control-Allow-Origin'] == 'http://localhost:4200'
+            assert response.headers['X-Gateway-Cache'] == state
+
+        stats = client.app.state.upstreams['book-service'].stats()
+        assert stats['requests'] == 1
+        assert stats['openConnections'] == 1
+
+
+def test_async_gateway_not_modified_keeps_cors_headers(book_service, monkeypatch):
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    headers = {'Origin': 'http://localhost:4200', 'Accept-Encoding': 'gzip'}
+
+    with TestClient(async_gateway.create_app()) as client:
+        client.get('/api/books/7', headers=headers)
+        response = client.get('/api/books/7', headers={**headers, 'If-None-Match': '"v7"'})
+
+    assert response.status_code == 304
+    assert response.headers['Access-Control-Allow-Origin'] == 'http://localhost:4200'
+
+def test_async_gateway_reports_unavailable_upstream(monkeypatch):
+    monkeypatch.setenv('MEMBER_SERVICE_URL', 'http://127.0.0.1:9')
+
+    with TestClient(async_gateway.create_app()) as client:
+        response = client.get('/api/members')
+
+    assert response.status_code == 503
+    assert response.json()['error'].startswith('Member service unavailable')
+
+
+def test_async_gateway_falls_back_to_flask_routes():
+    with TestClient(async_gateway.create_app()) as client:
+        response = client.post('/api/login', json={})
+
+    assert response.status_code == 400
+
+
+def test_async_gateway_relays_exports_without_buffering(book_service, monkeypatch):
+    monkeypatch.setenv('TRANSACTION_SERVICE_URL', book_service)
+
+    with TestClient(async_gateway.create_app()) as client:
+        with client.stream('GET', '/api/transactions/export?format=ndjson') as response:
+            assert response.status_code == 200
+            assert b''.join(response.iter_bytes()) == b'[{"id": "1", "title": "Dune"}]'
+
+        stats = client.app.state.upstreams['transaction-service'].stats()
+        assert stats['requests'] == 1
+        assert stats['idleConnections'] == 1  # released back to the pool once relayed
+
+
+def test_async_gateway_forwards_signed_identity(gateway_client, recording_service, identity_secret,
+                                                monkeypatch):
+    _, headers = gateway_client(member=recording_service)
+    on_event_loop = []
+
+    def identity_header(authorization):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return signed(authorization)
+    signed = gateway.identity_header
+    monkeypatch.setattr(gateway, 'identity_header', identity_header)
+
+    with TestClient(async_gateway.create_app()) as client:
+        assert client.get('/api/members', headers=headers).status_code == 200
+        assert client.get('/api/members', headers={'Authorization': 'Bearer not-a-token'}).status_code == 200
+
+    user_id, forwarded = identity.verify(RecordingService.seen[0][identity.IDENTITY_HEADER])
+    assert (user_id, forwarded['role']) == ('1', 'admin')
+    # A bad token is forwarded as-is for the service to refuse
+    assert identity.IDENTITY_HEADER not in RecordingService.seen[1]
+    # Revocation checks may hit SQLite, so they never run on the event loop
+    assert on_event_loop == [False, False]
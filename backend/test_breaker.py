@@ -0,0 +1,108 @@
+import pytest
+import gateway
+from utils.breaker import CLOSED, HALF_OPEN, OPEN, Bulkhead, CircuitBreaker, UpstreamUnavailable
+from utils.upstream import Upstream
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_on_failure_rate_and_recovers_through_probe():
+    clock = Clock()
+    breaker = CircuitBreaker(window=4, min_calls=4, failure_rate=0.5, open_seconds=10, clock=clock)
+    for failed in (False, True, False, True):
+        assert breaker.allow()
+        breaker.record(failed, 0.01)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 10
+
+    clock.now = 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+    breaker.record(False, 0.01)
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_trip_the_breaker_and_failed_probe_reopens():
+    clock = Clock()
+    breaker = CircuitBreaker(window=3, min_calls=3, slow_call_seconds=1.0, slow_call_rate=1.0,
+                             open_seconds=5, clock=clock)
+    for _ in range(3):
+        breaker.allow()
+        breaker.record(False, 1.5)
+    assert breaker.state == OPEN
+
+    clock.now = 5
+    assert breaker.allow()
+    breaker.record(True, 0.01)
+    assert breaker.state == OPEN
+    assert breaker.stats()['trips'] == 2
+
+
+def test_bulkhead_rejects_beyond_capacity():
+    bulkhead = Bulkhead(max_concurrent=2)
+
+    assert bulkhead.acquire() and bulkhead.acquire()
+    assert not bulkhead.acquire()
+    bulkhead.release()
+    assert bulkhead.acquire()
+    assert bulkhead.stats() == {'inFlight': 2, 'maxConcurrent': 2, 'rejected': 1}
+
+
+def test_open_breaker_fails_fast_without_affecting_other_services(book_service, monkeypatch):
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    monkeypatch.setenv('TRANSACTION_SERVICE_URL', 'http://127.0.0.1:9')
+    app = gateway.create_app()
+    transactions = app.extensions['upstreams']['transaction-service']
+    transactions.breaker = CircuitBreaker(window=2, min_calls=2, open_seconds=30)
+    client = app.test_client()
+
+    for _ in range(2):
+        assert client.get('/api/transactions').status_code == 503
+    response = client.get('/api/transactions')
+
+    assert response.status_code == 503
+    assert 'circuit open' in response.json['error']
+    assert response.headers['Retry-After'] == '30'
+    assert transactions.stats()['requests'] == 2
+    assert client.get('/api/books').status_code == 200
+    assert client.get('/health').json['upstreams'] == {
+        'book-service': CLOSED, 'member-service': CLOSED, 'transaction-service': OPEN}
+
+
+def test_full_bulkhead_rejects_with_503(book_service, monkeypatch):
+    monkeypatch.setenv('MEMBER_SERVICE_URL', book_service)
+    app = gateway.create_app()
+    members = app.extensions['upstreams']['member-service']
+    members.bulkhead = Bulkhead(max_concurrent=0)
+
+    response = app.test_client().get('/api/members')
+
+    assert response.status_code == 503
+    assert 'too many requests in flight' in response.json['error']
+    assert members.stats()['bulkhead']['rejected'] == 1
+
+
+def test_streamed_response_holds_its_slot_until_closed(book_service, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('utils.upstream.time.monotonic', clock)
+    upstream = Upstream('book-service', book_service, bulkhead=Bulkhead(max_concurrent=1),
+                        breaker=CircuitBreaker(window=1, min_calls=1, slow_call_seconds=1.0, slow_call_rate=1.0))
+
+    response = upstream.get('/books', stream=True)
+    with pytest.raises(UpstreamUnavailable):
+        upstream.get('/books')
+
+    clock.now = 5  # the body takes its time reaching the client
+    response.close()
+    response.close()
+
+    assert upstream.bulkhead.stats()['inFlight'] == 0
+    assert upstream.breaker.state == OPEN
@@ -0,0 +1,79 @@
+import sqlite3
+import pytest
+import app as app_module
+
+
+@pytest.fixture
+def app_db(app_db):
+    """A two-book catalog"""
+    conn = sqlite3.connect(app_db)
+    conn.executemany('''
+        INSERT INTO books (title, author, category, totalCopies, availableCopies)
+        VALUES (?, ?, 'Fiction', 2, 2)
+    ''', [('Dune', 'Frank Herbert'), ('Emma', 'Jane Austen')])
+    conn.commit()
+    conn.close()
+    return app_db
+
+
+@pytest.fixture
+def cache(app_db):
+    """The app's catalog cache, emptied and with zeroed counters"""
+    cache = app_module.catalog_cache
+    cache.invalidate()
+    cache.hits = cache.misses = cache.invalidations = 0
+    return cache
+
+
+def test_repeat_reads_are_served_from_cache(client, cache):
+
+    first = client.get('/api/books')
+    second = client.get('/api/books')
+
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_data() == first.get_data()
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_pages_and_books_are_cached_separately(client, cache):
+
+    page = client.get('/api/books?limit=1')
+    assert client.get('/api/books?limit=1').headers['X-Next-Cursor'] == page.json['next']
+    assert client.get('/api/books').headers['X-Cache'] == 'MISS'
+
+    book_id = page.json['items'][0]['id']
+    assert client.get(f'/api/books/{book_id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/books/{book_id}').headers['X-Cache'] == 'HIT'
+    assert client.get('/api/books/999999').status_code == 404
+    assert client.get('/api/books/999999').status_code == 404
+    assert cache.stats()['entries'] == 3
+
+
+def test_writes_from_another_connection_make_entries_stale(client, cache):
+    client.get('/api/books')
+
+    # Stands in for the transaction service taking a copy
+    conn = sqlite3.connect(app_module.DATABASE)
+    conn.execute("UPDATE books SET availableCopies = availableCopies - 1 WHERE title = 'Dune'")
+    conn.commit()
+    conn.close()
+
+    response = client.get('/api/books')
+    dune = next(book for book in response.json if book['title'] == 'Dune')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert dune['availableCopies'] == 1
+
+
+def test_invalidate_drops_lists_and_that_book_only(client, cache):
+    books = client.get('/api/books').json
+    first, second = books[0]['id'], books[1]['id']
+    client.get(f'/api/books/{first}')
+    client.get(f'/api/books/{second}')
+
+    cache.invalidate(first)
+
+    assert client.get(f'/api/books/{second}').headers['X-Cache'] == 'HIT'
+    assert client.get(f'/api/books/{first}').headers['X-Cache'] == 'MISS'
+    assert client.get('/api/books').headers['X-Cache'] == 'MISS'
+    assert cache.stats()['invalidations'] == 1
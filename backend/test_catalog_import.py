@@ -0,0 +1,85 @@
+import io
+import json
+import sqlite3
+import pytest
+from utils import catalog_import
+from utils.db import ConnectionManager
+
+HEADER = 'title,author,category,publishedYear,totalCopies,isbn\n'
+
+
+def titles(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT title, totalCopies, availableCopies FROM books ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_csv_import_spans_batches_and_transactions(app_db):
+    conn = ConnectionManager(app_db).connect()
+    body = HEADER + ''.join(f'Title {i},Author,Fiction,2001,{i % 3 + 1},\n' for i in range(25))
+    progress = []
+
+    result = catalog_import.import_books(conn, catalog_import.parse_csv(io.StringIO(body)),
+                                         progress=lambda *counts: progress.append(counts),
+                                         batch_size=4, transaction_rows=10)
+
+    assert (result.imported, result.rejected) == (25, 0)
+    assert progress[-1] == (25, 0)
+    rows = titles(app_db)
+    assert len(rows) == 25 and rows[4] == ('Title 4', 2, 2)
+    # Searchable straight away, and the per-row trigger is back for later writes
+    assert conn.execute("SELECT count(*) FROM books_fts WHERE books_fts MATCH 'title'").fetchone()[0] == 25
+    assert conn.execute(catalog_import.FTS_TRIGGER).fetchone() is not None
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL again
+    conn.close()
+
+
+def test_bad_rows_are_rejected_with_line_numbers(app_db):
+    conn = ConnectionManager(app_db).connect()
+    body = '\n'.join([
+        json.dumps({'title': 'Dune', 'author': 'Herbert', 'category': 'Fiction', 'publishedYear': 1965, 'totalCopies': 2}),
+        '{not json',
+        json.dumps({'title': 'Emma', 'author': 'Austen', 'category': 'Fiction', 'publishedYear': 1815}),
+        '',
+        json.dumps({'title': 'Ulysses', 'author': 'Joyce', 'category': 'Fiction', 'publishedYear': 'soon', 'totalCopies': 1}),
+        json.dumps(['not', 'an', 'object']),
+        json.dumps({'title': 'Beloved', 'author': 'Morrison', 'category': 'Fiction', 'publishedYear': '1987', 'totalCopies': '3'}),
+    ])
+    rejects = []
+
+    result = catalog_import.import_books(conn, catalog_import.parse_jsonl(io.StringIO(body)),
+                                         rejects=lambda *reject: rejects.append(reject))
+
+    assert (result.imported, result.rejected) == (2, 4)
+    assert [(line, error.split(':')[0]) for line, error, _ in rejects] == [
+        (2, 'Invalid JSON'), (3, 'Required fields missing'), (5, 'publishedYear must be a whole number'),
+        (6, 'Expected an object')]
+    assert rejects[1][2]['title'] == 'Emma'
+    assert titles(app_db) == [('Dune', 2, 2), ('Beloved', 3, 3)]
+    conn.close()
+
+
+def test_csv_without_required_columns_is_refused(app_db):
+    conn = ConnectionManager(app_db).connect()
+
+    with pytest.raises(catalog_import.CatalogImportError):
+        catalog_import.import_books(conn, catalog_import.parse_csv(io.StringIO('title,author\nDune,Herbert\n')))
+    conn.close()
+
+
+def test_import_endpoint_streams_request_body(client, admin_headers):
+    body = HEADER + 'Dune,Herbert,Fiction,1965,2,9780441013593\n' + 'Emma,Austen,,1815,1,\n'
+
+    response = client.post('/api/books/import', data=body, content_type='text/csv', headers=admin_headers)
+
+    assert response.status_code == 200
+    assert (response.json['imported'], response.json['rejected']) == (1, 1)
+    assert response.json['rejects'][0]['line'] == 3
+    assert [book['title'] for book in client.get('/api/books').json] == ['Dune']
+
+
+def test_import_endpoint_needs_a_known_format_and_admin(client, admin_headers):
+
+    assert client.post('/api/books/import', data='x', content_type='text/plain', headers=admin_headers).status_code == 400
+    assert client.post('/api/books/import?format=csv', data=HEADER).status_code == 401
@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+import pytest
+from datetime import datetime, timedelta
+from utils import circulation
+from utils.db import ConnectionManager
+
+
+@pytest.fixture
+def app_db(app_db):
+    """The app schema with one book of two copies"""
+    conn = sqlite3.connect(app_db)
+    conn.execute('''
+        INSERT INTO books (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl)
+        VALUES ('Test Book', 'Test Author', '', 'Fiction', 2023, '', 2, 2, '')
+    ''')
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role, isActive)
+        VALUES (?, 'x', 'Test', 'User', ?, 1)
+    ''', [(f'user{i}@test.com', 'admin' if i == 0 else 'member') for i in range(20)])
+    conn.commit()
+    conn.close()
+    return app_db
+
+
+def due():
+    return datetime.now() + timedelta(days=14)
+
+
+def test_concurrent_borrow_never_oversells(app_db):
+    """Twenty workers racing for two copies issue exactly two loans"""
+    db_pool = ConnectionManager(app_db)
+    barrier = threading.Barrier(19)
+    issued = []
+
+    def worker(user_id):
+        conn = db_pool.connect()
+        barrier.wait()
+        try:
+            issued.append(circulation.borrow_book(conn, 1, user_id, due())[0])
+        except circulation.CirculationError as e:
+            assert e.message == 'Book not available'
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in range(2, 21)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = db_pool.connect()
+    assert len(issued) == 2
+    assert conn.execute("SELECT availableCopies FROM books WHERE id = 1").fetchone()[0] == 0
+    conn.close()
+
+
+def test_duplicate_active_loan_rejected(app_db):
+    """A second borrow by the same user leaves the copy count untouched"""
+    conn = ConnectionManager(app_db).connect()
+    circulation.borrow_book(conn, 1, 2, due())
+
+    with pytest.raises(circulation.CirculationError) as exc:
+        circulation.borrow_book(conn, 1, 2, due())
+
+    assert exc.value.message == 'User already has this book'
+    assert conn.execute("SELECT availableCopies FROM books WHERE id = 1").fetchone()[0] == 1
+
+    # The partial unique index backs the check up at the storage level
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute('''
+            INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status)
+            VALUES (1, 2, 'issue', ?, ?, 'active')
+        ''', (datetime.now(), due()))
+    conn.close()
+
+
+def test_return_restores_copy_and_charges_fine(app_db):
+    """Returning late frees the copy and charges per day overdue"""
+    conn = ConnectionManager(app_db).connect()
+    transaction_id, issue_date = circulation.borrow_book(conn, 1, 2, datetime.now() - timedelta(days=3))
+
+    transaction_row, fine = circulation.return_book(conn, transaction_id, 2, datetime.now())
+
+    assert fine == 3 * circulation.FINE_PER_DAY
+    assert conn.execute("SELECT availableCopies FROM books WHERE id = 1").fetchone()[0] == 2
+    with pytest.raises(circulation.CirculationError) as exc:
+        circulation.return_book(conn, transaction_id, 2, datetime.now())
+    assert exc.value.status_code == 400
+    conn.close()
+
+
+def test_return_of_other_users_loan_requires_admin(app_db):
+    """Members get 403 on someone else's loan; admins may return it"""
+    conn = ConnectionManager(app_db).connect()
+    transaction_id, _ = circulation.borrow_book(conn, 1, 2, due())
+
+    with pytest.raises(circulation.CirculationError) as exc:
+        circulation.return_book(conn, transaction_id, 3, datetime.now())
+    assert exc.value.status_code == 403
+
+    circulation.return_book(conn, transaction_id, 1, datetime.now())
+    conn.close()
+
+
+def test_batch_borrow_keeps_good_items_when_one_fails(app_db):
+    """A rejected item rolls back to its savepoint; the rest of the batch commits"""
+    conn = ConnectionManager(app_db).connect()
+    conn.execute('''
+        INSERT INTO books (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl)
+        VALUES ('Second Book', 'Test Author', '', 'Fiction', 2023, '', 1, 1, '')
+    ''')
+    conn.commit()
+    circulation.borrow_book(conn, 1, 2, due())
+
+    # Book 1: the copy is taken before the duplicate loan is found, and must be given back
+    results, _ = circulation.borrow_batch(conn, [1, 2, 999, 2], 2, due())
+
+    assert [(item, error.status_code if error else None) for item, _, error in results] == \
+        [(1, 400), (2, None), (999, 404), (2, 400)]
+    copies = dict(conn.execute("SELECT id, availableCopies FROM books").fetchall())
+    assert copies == {1: 1, 2: 0}
+    assert not conn.in_transaction
+    conn.close()
+
+
+def test_batch_return_checks_each_loan(app_db):
+    """Own loans are returned; someone else's loan is refused without undoing them"""
+    conn = ConnectionManager(app_db).connect()
+    own, _ = circulation.borrow_book(conn, 1, 2, due())
+    other, _ = circulation.borrow_book(conn, 1, 3, due())
+
+    results = circulation.return_batch(conn, [own, other], 2, datetime.now(), is_admin=False)
+
+    assert results[0][1][1] == 0 and results[0][2] is None
+    assert results[1][2].status_code == 403
+    statuses = dict(conn.execute("SELECT id, status FROM transactions").fetchall())
+    assert statuses == {own: 'returned', other: 'active'}
+    conn.close()
+
+
+@pytest.mark.parametrize('ids', [None, [], 'x', [1, 'a'], [True], list(range(circulation.MAX_BATCH + 1))])
+def test_check_batch_rejects_bad_id_lists(ids):
+    with pytest.raises(circulation.CirculationError) as exc:
+        circulation.check_batch(ids)
+    assert exc.value.status_code == 400
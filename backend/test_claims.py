@@ -0,0 +1,91 @@
+import sqlite3
+import pytest
+from flask_jwt_extended import create_access_token, decode_token
+import app as app_module
+
+
+@pytest.fixture
+def app_db(app_db):
+    """The seeded database"""
+    app_module.seed_data()
+    return app_db
+
+
+def login(client, email, password):
+    return client.post('/api/login', json={'email': email, 'password': password}).json['token']
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_login_token_carries_role_and_status(client):
+    token = login(client, 'admin@library.com', 'admin123')
+
+    with app_module.app.app_context():
+        claims = decode_token(token)
+
+    assert claims['sub'] == '1'
+    assert (claims['role'], claims['isActive'], claims['authVersion']) == ('admin', True, 0)
+
+
+def test_admin_routes_authorize_from_claims(client):
+    admin = login(client, 'admin@library.com', 'admin123')
+    member = login(client, 'member@library.com', 'member123')
+
+    assert client.get('/api/members', headers=bearer(admin)).status_code == 200
+    assert client.get('/api/members', headers=bearer(member)).status_code == 403
+
+
+def test_blocking_a_member_revokes_their_token(client):
+    admin = login(client, 'admin@library.com', 'admin123')
+    member = login(client, 'member@library.com', 'member123')
+    assert client.get('/api/transactions', headers=bearer(member)).status_code == 200
+
+    client.put('/api/members/2', headers=bearer(admin), json={'isActive': False})
+    client.put('/api/members/2', headers=bearer(admin), json={'isActive': True})
+
+    # Reactivation does not bring the old token back; a fresh login works
+    assert client.get('/api/transactions', headers=bearer(member)).status_code == 401
+    fresh = login(client, 'member@library.com', 'member123')
+    assert client.get('/api/transactions', headers=bearer(fresh)).status_code == 200
+
+
+def test_demotion_elsewhere_applies_after_refresh(client):
+    admin = login(client, 'admin@library.com', 'admin123')
+    assert client.get('/api/members', headers=bearer(admin)).status_code == 200
+
+    conn = sqlite3.connect(app_module.DATABASE)
+    conn.execute("UPDATE users SET role = 'member' WHERE id = 1")
+    conn.commit()
+    conn.close()
+
+    # Within the TTL the snapshot still admits the token, after it the token is dead
+    assert client.get('/api/members', headers=bearer(admin)).status_code == 200
+    app_module.revocations.expire()
+    response = client.get('/api/members', headers=bearer(admin))
+    assert response.status_code == 401
+    assert response.json['error'] == 'Token has been revoked, please log in again'
+
+
+def test_tokens_without_claims_are_rejected(client):
+    with app_module.app.app_context():
+        legacy = create_access_token(identity='1')
+
+    assert client.get('/api/members', headers=bearer(legacy)).status_code == 401
+
+
+def test_write_routes_report_why_a_token_was_refused(client):
+    book = {'title': 'Dune', 'author': 'Frank Herbert', 'category': 'Fiction', 'totalCopies': 1}
+    with app_module.app.app_context():
+        stale = create_access_token(identity='1', additional_claims={'role': 'admin', 'isActive': True, 'authVersion': 5})
+        inactive = create_access_token(identity='1', additional_claims={'role': 'admin', 'isActive': False, 'authVersion': 0})
+
+    response = client.post('/api/books', headers=bearer(stale), json=book)
+    assert response.status_code == 401
+    assert response.json['error'] == 'Token has been revoked, please log in again'
+
+    response = client.post('/api/books', headers=bearer(inactive), json=book)
+    assert response.status_code == 403
+    assert response.json['error'] == 'Account is inactive'
+    assert client.delete('/api/books/1', headers=bearer(inactive)).status_code == 403
@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+from werkzeug.serving import make_server
+import book_service as book_module
+import gateway
+import member_service as member_module
+import transaction_service as transaction_module
+from conftest import FakeBookService
+
+
+class SlowService(FakeBookService):
+    delay = 1.0
+
+
+@pytest.fixture
+def slow_service():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowService)
+    server.handle_error = lambda request, address: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def services(gateway_client, db_path):
+    """The real book, member and transaction services over one database with
+    more rows in every table than a default list page holds"""
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO books (title, author, category, totalCopies, availableCopies) VALUES (?, 'Author', 'Fiction', 3, ?)
+    ''', [(f'Book {i}', i % 3) for i in range(150)])
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role, isActive) VALUES (?, '', 'First', 'Last', 'member', ?)
+    ''', [(f'member{i}@test.com', i % 4 != 0) for i in range(120)])
+    conn.executemany('''
+        INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status)
+        VALUES (?, ?, 'issue', '2024-01-01', '2024-01-15', ?)
+    ''', [(1 + i, 1 + i, 'active' if i % 2 else 'returned') for i in range(130)])
+    conn.commit()
+    conn.close()
+
+    servers, urls = [], {}
+    for name, module in (('book', book_module), ('member', member_module), ('transaction', transaction_module)):
+        module.DATABASE = db_path
+        module.revocations.expire()
+        server = make_server('127.0.0.1', 0, module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append((module, server))
+        urls[name] = f'http://127.0.0.1:{server.server_port}'
+
+    yield gateway_client(**urls)
+
+    for module, server in servers:
+        server.shutdown()
+        module.db_pool.close_all()
+
+
+def test_dashboard_totals_cover_every_row(services):
+    """Totals count every row, not just the first page of each list"""
+    client, headers = services
+
+    response = client.get('/api/dashboard', headers=headers)
+
+    assert response.status_code == 200
+    assert response.json == {
+        'books': {'totalBooks': 150, 'availableCopies': 150},
+        'members': {'totalMembers': 120, 'activeMembers': 90},
+        'transactions': {'totalTransactions': 130, 'activeTransactions': 65},
+        'partial': False,
+    }
+
+
+def test_dashboard_merges_every_section(gateway_client, book_service):
+    client, headers = gateway_client(book=book_service, member=book_service, transaction=book_service)
+
+    response = client.get('/api/dashboard', headers=headers)
+
+    assert response.status_code == 200
+    assert response.json['partial'] is False
+    for section in ('books', 'members', 'transactions'):
+        assert response.json[section] == [{'id': '1', 'title': 'Dune'}]
+
+
+def test_slow_and_failed_sections_are_marked(gateway_client, book_service, slow_service, monkeypatch):
+    monkeypatch.setattr(gateway, 'DASHBOARD_DEADLINE', 0.5)
+    client, headers = gateway_client(book=book_service, member=slow_service, transaction='http://127.0.0.1:9')
+
+    response = client.get('/api/dashboard', headers=headers)
+
+    assert response.status_code == 200
+    assert response.json['partial'] is True
+    assert response.json['books'] == [{'id': '1', 'title': 'Dune'}]
+    assert response.json['members'] == {'error': 'Member service unavailable: no response within 0.5s'}
+    assert response.json['transactions']['error'].startswith('Transaction service unavailable')
+
+
+def test_dashboard_requires_admin(gateway_client, book_service):
+    client, _ = gateway_client(book=book_service)
+
+    assert client.get('/api/dashboard').status_code == 401
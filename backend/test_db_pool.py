@@ -0,0 +1,69 @@
+import pytest
+from flask import Flask
+from utils.db import ConnectionManager
+
+
+@pytest.fixture
+def pooled_app(db_path):
+    """Flask app wired to a connection manager over a temporary database"""
+    app = Flask(__name__)
+    db_pool = ConnectionManager(db_path, app, pool_size=2)
+
+    yield app, db_pool, db_path
+
+    db_pool.close_all()
+
+
+def test_connection_reused_across_app_contexts(pooled_app):
+    """A connection released on teardown is handed to the next app context"""
+    app, db_pool, _ = pooled_app
+
+    with app.app_context():
+        first = db_pool.get_db()
+        assert db_pool.get_db() is first
+
+    with app.app_context():
+        assert db_pool.get_db() is first
+
+
+def test_pragmas_applied_on_connect(pooled_app):
+    """Pooled connections come up in WAL mode with a busy timeout"""
+    app, db_pool, _ = pooled_app
+
+    with app.app_context():
+        conn = db_pool.get_db()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+
+def test_open_transaction_rolled_back_on_teardown(pooled_app):
+    """Uncommitted writes do not leak into the next request"""
+    app, db_pool, _ = pooled_app
+
+    with app.app_context():
+        conn = db_pool.get_db()
+        conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY)')
+        conn.commit()
+        conn.execute('INSERT INTO items (id) VALUES (1)')
+
+    with app.app_context():
+        conn = db_pool.get_db()
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+
+
+def test_database_path_resolved_per_checkout(pooled_app, tmp_path):
+    """Callable paths let modules repoint DATABASE at runtime"""
+    app, _, db_path = pooled_app
+    current = {'path': db_path}
+    db_pool = ConnectionManager(lambda: current['path'], app)
+
+    other_path = str(tmp_path / 'other.db')
+    try:
+        with app.app_context():
+            first = db_pool.get_db()
+        current['path'] = other_path
+        with app.app_context():
+            assert db_pool.get_db() is not first
+    finally:
+        db_pool.close_all()
@@ -0,0 +1,71 @@
+import pytest
+import transaction_service
+from conftest import RecordingService
+from utils import claims, identity, schema
+
+MEMBER = {'role': 'member', 'isActive': True, 'authVersion': 0}
+
+
+@pytest.fixture
+def service(db_path):
+    transaction_service.DATABASE = db_path
+    conn = transaction_service.db_pool.connect()
+    schema.bootstrap(conn)
+    conn.close()
+    transaction_service.revocations.expire()
+    transaction_service.app.config['TESTING'] = True
+    yield transaction_service.app.test_client()
+
+    transaction_service.db_pool.close_all()
+
+
+def test_signed_identity_round_trips_and_rejects_tampering(identity_secret):
+    header = identity.sign('7', {**MEMBER, 'exp': 2000}, ttl=60, now=1000)
+
+    assert identity.verify(header, now=1000) == ('7', {**MEMBER, 'exp': 1060})
+    assert identity.verify(header.replace(':member:', ':admin:'), now=1000) is None
+    assert identity.verify(header, now=1060) is None
+    assert identity.verify(header, secret='other', now=1000) is None
+
+
+def test_identity_never_outlives_the_token(identity_secret):
+    header = identity.sign('7', {**MEMBER, 'exp': 1010}, ttl=60, now=1000)
+
+    assert identity.verify(header, now=1000)[1]['exp'] == 1010
+
+
+def test_service_trusts_header_without_decoding_the_jwt(service, identity_secret, monkeypatch):
+    def no_jwt():
+        raise AssertionError('JWT decoded despite a valid identity header')
+    monkeypatch.setattr(claims, 'verify_jwt_in_request', no_jwt)
+
+    response = service.get('/transactions', headers={identity.IDENTITY_HEADER: identity.sign('7', MEMBER)})
+
+    assert response.status_code == 200
+    assert response.json == []
+
+
+def test_service_ignores_header_from_outside_the_trusted_network(service, identity_secret):
+    response = service.get('/transactions', headers={identity.IDENTITY_HEADER: identity.sign('7', MEMBER)},
+                           environ_base={'REMOTE_ADDR': '203.0.113.9'})
+
+    assert response.status_code == 401
+
+
+def test_header_is_refused_until_a_secret_is_configured(service):
+    forged = identity.sign('1', {'role': 'admin', 'isActive': True, 'authVersion': 0},
+                           secret='internal-identity-secret-change-in-production')
+
+    response = service.get('/transactions', headers={identity.IDENTITY_HEADER: forged})
+
+    assert response.status_code == 401
+    assert identity.headers('1', MEMBER) == {}
+
+
+def test_gateway_forwards_signed_identity(gateway_client, recording_service, identity_secret):
+    client, headers = gateway_client(member=recording_service)
+
+    assert client.get('/api/members', headers=headers).status_code == 200
+
+    user_id, forwarded = identity.verify(RecordingService.seen[0][identity.IDENTITY_HEADER])
+    assert (user_id, forwarded['role']) == ('1', 'admin')
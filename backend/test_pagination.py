@@ -0,0 +1,168 @@
+import json
+import sqlite3
+import pytest
+from werkzeug.test import EnvironBuilder
+import app as app_module
+from utils import pagination
+
+
+@pytest.fixture
+def app_db(app_db):
+    """A catalog of 250 books, many sharing a createdAt"""
+    conn = sqlite3.connect(app_db)
+    conn.executemany('''
+        INSERT INTO books (title, author, category, totalCopies, availableCopies, createdAt)
+        VALUES (?, 'Author', 'Fiction', 1, 1, ?)
+    ''', [(f'Book {i}', f'2024-01-{1 + i // 10:02d} 10:00:00') for i in range(250)])
+    conn.commit()
+    conn.close()
+    return app_db
+
+
+def test_default_page_is_bounded_array(client):
+    """Clients without a cursor still get a plain array, capped at the default page"""
+    response = client.get('/api/books')
+
+    assert response.status_code == 200
+    assert isinstance(response.json, list)
+    assert len(response.json) == pagination.DEFAULT_LIMIT
+    assert response.headers['X-Next-Cursor']
+
+
+def test_cursor_walk_covers_every_book_once(client):
+    """Following `next` visits every row in (createdAt, id) descending order"""
+    seen = []
+    url = '/api/books?limit=40'
+    while True:
+        body = client.get(url).json
+        assert len(body['items']) <= 40
+        seen.extend(body['items'])
+        if body['next'] is None:
+            break
+        url = f"/api/books?limit=40&cursor={body['next']}"
+
+    keys = [(book['createdAt'], int(book['id'])) for book in seen]
+    assert len(keys) == 250
+    assert len(set(keys)) == 250
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_limit_is_capped(client):
+    response = client.get('/api/books?limit=100000')
+
+    assert response.status_code == 200
+    assert len(response.json['items']) == min(250, pagination.MAX_LIMIT)
+
+
+@pytest.mark.parametrize('query', ['cursor=not-a-cursor', 'limit=abc', 'limit=0'])
+def test_bad_page_parameters(client, query):
+    response = client.get(f'/api/books?{query}')
+
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
+def test_unbounded_listing_streams_every_book(client, admin_headers):
+    """limit=all streams the same items the cursor walk returns, then hands
+    the request's connection back to the pool"""
+    response = client.get('/api/books?limit=all', headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert 'X-Cache' not in response.headers
+    body = response.json
+    assert body['next'] is None
+    assert len(body['items']) == 250
+    assert body['items'][:40] == client.get('/api/books?limit=40').json['items']
+    assert app_module.db_pool._pool(app_module.db_pool.database).qsize() >= 1
+
+
+def test_unread_unbounded_listing_returns_its_connection(client, admin_headers):
+    """A client that goes away before the first chunk still frees the connection"""
+    pool = app_module.db_pool._pool(app_module.db_pool.database)
+    client.get('/api/books?limit=40')
+    idle = pool.qsize()
+
+    # Straight through WSGI: the test client would start the body to find the status
+    environ = EnvironBuilder('/api/books?limit=all', headers=admin_headers).get_environ()
+    body = app_module.app(environ, lambda status, headers: None)
+    assert pool.qsize() < idle
+    body.close()
+
+    assert pool.qsize() == idle
+
+
+def test_unbounded_listing_is_admin_only(client, admin_headers):
+    assert client.get('/api/books?limit=all').status_code == 403
+
+    members = client.get('/api/members?limit=all', headers=admin_headers)
+    assert members.status_code == 200
+    assert members.json == {'items': [], 'next': None}
+
+
+def test_stream_array_chunks():
+    chunks = list(pagination.stream_array(iter([{'a': 1}, {'b': [2]}, {'c': 'x'}]), json.dumps, chunk_bytes=10))
+
+    assert len(chunks) > 1
+    assert json.loads(b''.join(chunks)) == [{'a': 1}, {'b': [2]}, {'c': 'x'}]
+    assert b''.join(pagination.stream_array(iter([]), json.dumps)) == b'[]\n'
+
+
+def python_rendered(path):
+    """The list items as the handlers used to build them row by row"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    books = [{
+        'id': str(row['id']), 'title': row['title'], 'author': row['author'], 'isbn': row['isbn'] or '',
+        'category': row['category'], 'publishedYear': row['publishedYear'],
+        'description': row['description'] or '', 'totalCopies': row['totalCopies'],
+        'availableCopies': row['availableCopies'], 'imageUrl': row['imageUrl'],
+        'createdAt': row['createdAt'], 'updatedAt': row['updatedAt'],
+    } for row in conn.execute('SELECT * FROM books ORDER BY createdAt DESC, id DESC LIMIT 3')]
+    members = [{
+        'id': row['id'], 'email': row['email'], 'password': '', 'firstName': row['firstName'],
+        'lastName': row['lastName'], 'role': row['role'], 'createdAt': row['createdAt'],
+        'isActive': bool(row['isActive']),
+    } for row in conn.execute("SELECT * FROM users WHERE role = 'member' ORDER BY createdAt DESC, id DESC")]
+    transactions = [{
+        'id': str(row['id']), 'bookId': str(row['bookId']), 'userId': str(row['userId']), 'type': row['type'],
+        'issueDate': row['issueDate'], 'dueDate': row['dueDate'], 'returnDate': row['returnDate'],
+        'status': row['status'], 'fine': row['fine'] or 0, 'createdAt': row['createdAt'],
+        'updatedAt': row['updatedAt'],
+        'book': {'title': row['title'], 'author': row['author'], 'isbn': row['isbn'] or ''},
+        'user': {'firstName': row['firstName'], 'lastName': row['lastName'], 'email': row['email']},
+    } for row in conn.execute('''
+        SELECT t.*, u.firstName, u.lastName, u.email, b.title, b.author, b.isbn
+        FROM transactions t JOIN users u ON t.userId = u.id JOIN books b ON t.bookId = b.id
+        ORDER BY t.createdAt DESC, t.id DESC
+    ''')]
+    conn.close()
+    return books, members, transactions
+
+
+def test_sql_rendered_lists_match_jsonify_byte_for_byte(client, admin_headers):
+    path = app_module.db_pool.database
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE books SET isbn = '978-0', description = 'Quoted \"text\"', publishedYear = 1999 WHERE id = 250")
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role, isActive) VALUES (?, 'x', ?, 'Reader', 'member', ?)
+    ''', [('a@test.com', 'Ann', 1), ('b@test.com', 'Bob', 0)])
+    conn.executemany('''
+        INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, returnDate, status, fine)
+        VALUES (?, ?, 'issue', '2024-02-01 10:00:00', '2024-02-15 10:00:00', ?, ?, ?)
+    ''', [(250, 1, None, 'active', 0), (249, 2, '2024-02-20 09:00:00', 'returned', 2.5), (1, 1, None, 'active', None)])
+    conn.commit()
+    conn.close()
+    books, members, transactions = python_rendered(path)
+
+    page = client.get('/api/books?limit=3')
+    with app_module.app.app_context():
+        expected = {
+            '/api/books?limit=3': app_module.jsonify({'items': books, 'next': page.json['next']}).get_data(),
+            '/api/members': app_module.jsonify(members).get_data(),
+            '/api/transactions': app_module.jsonify(transactions).get_data(),
+        }
+    assert page.json['items'][0]['isbn'] == '978-0' and page.json['items'][1]['isbn'] == ''
+    for url, body in expected.items():
+        assert client.get(url, headers=admin_headers).get_data() == body
+    assert client.get('/api/members?limit=all', headers=admin_headers).json['items'] == members
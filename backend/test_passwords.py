@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+import time
+import pytest
+from werkzeug.security import generate_password_hash
+import app as app_module
+from utils import passwords
+
+CHEAP = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def app_db(app_db):
+    """One member whose hash uses older, cheaper parameters"""
+    conn = sqlite3.connect(app_db)
+    conn.execute('''
+        INSERT INTO users (email, password, firstName, lastName, role, isActive)
+        VALUES ('old@test.com', ?, 'Old', 'Hash', 'member', 1)
+    ''', (generate_password_hash('secret', method=CHEAP),))
+    conn.commit()
+    conn.close()
+    return app_db
+
+
+def stored_hash(email):
+    conn = sqlite3.connect(app_module.DATABASE)
+    row = conn.execute("SELECT password FROM users WHERE email = ?", (email,)).fetchone()
+    conn.close()
+    return row[0]
+
+
+def test_login_upgrades_outdated_hash(client):
+    response = client.post('/api/login', json={'email': 'old@test.com', 'password': 'secret'})
+
+    assert response.status_code == 200
+    assert stored_hash('old@test.com').startswith(passwords.PASSWORD_METHOD + '$')
+    assert client.post('/api/login', json={'email': 'old@test.com', 'password': 'secret'}).status_code == 200
+
+
+def test_wrong_password_leaves_hash_alone(client):
+    response = client.post('/api/login', json={'email': 'old@test.com', 'password': 'nope'})
+
+    assert response.status_code == 401
+    assert stored_hash('old@test.com').startswith(CHEAP + '$')
+
+
+def test_overloaded_hasher_fails_fast(client, monkeypatch):
+    hasher = passwords.PasswordHasher(workers=0, max_pending=1)
+    hasher._slots.acquire()  # the one slot is taken by another login
+    monkeypatch.setattr(app_module, 'password_hasher', hasher)
+
+    response = client.post('/api/login', json={'email': 'old@test.com', 'password': 'secret'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_pool_hashes_and_verifies():
+    hasher = passwords.PasswordHasher(workers=2, max_pending=4, method=CHEAP)
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(hasher.hash('pw'))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 4
+        assert all(hasher.verify(h, 'pw') == (True, None) for h in results)
+        assert hasher.verify(results[0], 'wrong') == (False, None)
+    finally:
+        hasher.shutdown()
+
+
+def test_zero_max_pending_is_unbounded(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'password_hasher', passwords.PasswordHasher(workers=0, max_pending=0))
+
+    assert client.post('/api/login', json={'email': 'old@test.com', 'password': 'secret'}).status_code == 200
+
+
+def test_timed_out_hash_keeps_its_slot_until_the_worker_finishes():
+    hasher = passwords.PasswordHasher(workers=1, max_pending=1, method=CHEAP, timeout=0.05)
+    try:
+        with pytest.raises(passwords.HashingBusy):
+            hasher._run(time.sleep, 0.5)
+        # The worker is still sleeping, so the pool is still full
+        with pytest.raises(passwords.HashingBusy):
+            hasher.hash('pw')
+
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                assert hasher.hash('pw').startswith(CHEAP + '$')
+                break
+            except passwords.HashingBusy:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+    finally:
+        hasher.shutdown()
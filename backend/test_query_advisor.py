@@ -0,0 +1,32 @@
+import sqlite3
+from utils import query_advisor, schema
+
+
+def test_app_queries_use_indexes():
+    """Every SQL string the raw-sqlite modules issue plans without scans or sorts"""
+    report = query_advisor.advise()
+
+    assert report == [], '\n'.join(f'{location}: {issues}' for location, _, issues in report)
+
+
+def test_advisor_flags_unindexed_schema():
+    """Without the versioned index set the listing queries are caught"""
+    conn = sqlite3.connect(':memory:')
+    for statement in schema.TABLES:
+        conn.execute(statement)
+
+    flagged = {sql: issues for _, sql, issues in query_advisor.advise(conn=conn)}
+
+    assert flagged['SELECT * FROM books ORDER BY createdAt DESC, id DESC LIMIT ?'] == ['SCAN books', 'USE TEMP B-TREE FOR ORDER BY']
+
+
+def test_upgrade_is_versioned_and_idempotent():
+    """Bootstrap records the schema version and re-running is a no-op"""
+    conn = sqlite3.connect(':memory:')
+    schema.bootstrap(conn)
+    schema.bootstrap(conn)
+
+    assert schema.get_version(conn) == schema.SCHEMA_VERSION
+    index_names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_books_created' in index_names
+    assert 'ux_transactions_active_loan' in index_names
@@ -0,0 +1,69 @@
+import gateway
+from utils.response_cache import ResponseCache
+
+LIST = ('get_books', None, b'', 'identity')
+BOOK = ('get_book', 7, b'', 'identity')
+
+
+def test_entries_go_stale_then_expire():
+    cache = ResponseCache()
+    cache.store(LIST, cache.epoch, [], b'[]', ttl=10, stale_ttl=60, now=0)
+
+    assert cache.lookup(LIST, now=5)[1] == 'HIT'
+    assert cache.lookup(LIST, now=30)[1] == 'STALE'
+    assert cache.claim_refresh(LIST) is True
+    assert cache.claim_refresh(LIST) is False
+    assert cache.lookup(LIST, now=71) == (None, 'MISS')
+
+
+def test_purge_keeps_unrelated_books_and_drops_in_flight_fetches():
+    cache = ResponseCache()
+    other = ('get_book', 8, b'', 'identity')
+    for key in (LIST, BOOK, other):
+        cache.store(key, cache.epoch, [], b'{}', ttl=10, stale_ttl=60, now=0)
+
+    epoch = cache.epoch
+    cache.purge(book_id=7)
+    cache.store(BOOK, epoch, [], b'{"old": true}', ttl=10, stale_ttl=60, now=0)
+
+    assert cache.lookup(LIST, now=1)[1] == 'MISS'
+    assert cache.lookup(BOOK, now=1)[1] == 'MISS'
+    assert cache.lookup(other, now=1)[1] == 'HIT'
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=10)
+    cache.store(LIST, cache.epoch, [], b'123456', ttl=10, stale_ttl=0, now=0)
+    cache.store(BOOK, cache.epoch, [], b'123456', ttl=10, stale_ttl=0, now=0)
+
+    assert cache.lookup(LIST, now=1)[1] == 'MISS'
+    assert cache.stats()['bytes'] == 6
+    assert cache.stats()['evictions'] == 1
+
+
+def test_gateway_serves_books_from_cache_until_mutated(book_service, monkeypatch):
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    app = gateway.create_app()
+    client = app.test_client()
+    upstream = app.extensions['upstreams']['book-service']
+
+    assert client.get('/api/books').headers['X-Gateway-Cache'] == 'MISS'
+    assert client.get('/api/books').headers['X-Gateway-Cache'] == 'HIT'
+    assert client.get('/api/books/7').headers['X-Gateway-Cache'] == 'MISS'
+    assert upstream.stats()['requests'] == 2
+
+    assert client.put('/api/books/7', json={'title': 'Emma'}).status_code == 200
+    assert client.get('/api/books').headers['X-Gateway-Cache'] == 'MISS'
+    assert client.get('/api/books/7').headers['X-Gateway-Cache'] == 'MISS'
+    assert app.extensions['response_cache'].stats()['purges'] == 1
+
+
+def test_gateway_answers_conditional_reads_from_cache(book_service, monkeypatch):
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    client = gateway.create_app().test_client()
+
+    client.get('/api/books/7', headers={'Accept-Encoding': 'gzip'})
+    response = client.get('/api/books/7', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"v7"'})
+
+    assert response.status_code == 304
+    assert response.headers['X-Gateway-Cache'] == 'HIT'
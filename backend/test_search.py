@@ -0,0 +1,72 @@
+import sqlite3
+import pytest
+import app as app_module
+from utils import search
+
+
+@pytest.fixture
+def app_db(app_db):
+    """A small catalog indexed by the books_fts triggers"""
+    conn = sqlite3.connect(app_db)
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, category, description, totalCopies, availableCopies)
+        VALUES (?, ?, ?, 'Fiction', ?, 1, 1)
+    ''', [
+        ('Dune', 'Frank Herbert', '978-0441013593', 'Desert planet epic'),
+        ('Children of Dune', 'Frank Herbert', '978-0593098240', 'Sequel'),
+        ('Foundation', 'Isaac Asimov', '978-0553293357', 'Galactic empire falls, unlike Dune'),
+        ('Emma', 'Jane Austen', '978-0141439587', 'Matchmaking in Highbury'),
+    ])
+    conn.commit()
+    conn.close()
+    return app_db
+
+
+def titles(response):
+    return [book['title'] for book in response.json['items']]
+
+
+def test_title_matches_rank_above_description(client):
+    response = client.get('/api/books/search?q=dune')
+
+    assert response.status_code == 200
+    assert titles(response)[-1] == 'Foundation'
+    assert set(titles(response)) == {'Dune', 'Children of Dune', 'Foundation'}
+
+
+def test_prefix_author_and_isbn_search(client):
+    assert titles(client.get('/api/books/search?q=asim')) == ['Foundation']
+    assert titles(client.get('/api/books/search?q=978-0141439587')) == ['Emma']
+
+
+def test_index_follows_updates_and_deletes(client):
+    conn = sqlite3.connect(app_module.DATABASE)
+    conn.execute("UPDATE books SET title = 'Persuasion' WHERE title = 'Emma'")
+    conn.execute("DELETE FROM books WHERE title = 'Foundation'")
+    conn.commit()
+    conn.close()
+
+    assert titles(client.get('/api/books/search?q=emma')) == []
+    assert titles(client.get('/api/books/search?q=persuasion')) == ['Persuasion']
+    assert titles(client.get('/api/books/search?q=asimov')) == []
+
+
+def test_search_pages_with_cursor(client):
+    first = client.get('/api/books/search?q=dune&limit=2').json
+    second = client.get(f"/api/books/search?q=dune&limit=2&cursor={first['next']}").json
+
+    assert len(first['items']) == 2
+    assert len(second['items']) == 1
+    assert second['next'] is None
+    ids = {book['id'] for book in first['items'] + second['items']}
+    assert len(ids) == 3
+
+
+def test_search_requires_terms(client):
+    assert client.get('/api/books/search').status_code == 400
+    assert client.get('/api/books/search?q=%22*%22').status_code == 400
+
+
+def test_match_query_quotes_operators():
+    assert search.match_query('dune OR "x') == '"dune" "OR" "x"*'
+    assert search.match_query('  ') is None
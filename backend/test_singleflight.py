@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+import pytest
+import gateway
+from conftest import FakeBookService
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def run_together(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'catalog'
+
+    run_together(8, lambda: results.append(flights.do('books', compute)))
+
+    assert calls == [1]
+    assert results == ['catalog'] * 8
+    stats = flights.stats()
+    assert (stats['leaders'], stats['followers'], stats['maxAbsorbed'], stats['inFlight']) == (1, 7, 7, 0)
+
+
+def test_followers_see_the_leaders_error():
+    flights = SingleFlight()
+    errors = []
+
+    def compute():
+        time.sleep(0.2)
+        raise ValueError('database locked')
+
+    def call():
+        try:
+            flights.do('books', compute)
+        except ValueError as e:
+            errors.append(str(e))
+
+    run_together(4, call)
+
+    assert errors == ['database locked'] * 4
+    assert flights.do('books', lambda: 'retried') == 'retried'
+
+
+def test_async_callers_share_one_computation():
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'catalog'
+
+    async def main():
+        return await asyncio.gather(*(flights.do('books', compute) for _ in range(10)))
+
+    assert asyncio.run(main()) == ['catalog'] * 10
+    assert calls == [1]
+    assert flights.stats()['meanAbsorbed'] == 9.0
+
+
+@pytest.mark.parametrize('path', ['/api/books', '/api/books/7'])
+def test_gateway_coalesces_cold_cache_misses(book_service, monkeypatch, path):
+    FakeBookService.delay = 0.3
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    app = gateway.create_app()
+    statuses = []
+
+    run_together(6, lambda: statuses.append(app.test_client().get(path).status_code))
+
+    assert statuses == [200] * 6
+    assert app.extensions['upstreams']['book-service'].stats()['requests'] == 1
+    assert app.extensions['single_flight'].stats()['followers'] == 5
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import sqlite3
+import pytest
+import app as app_module
+from conftest import bearer_headers
+from utils import transaction_export
+from utils.db import ConnectionManager
+
+
+@pytest.fixture
+def app_db(app_db):
+    """Two books, two members and seven loans, one of a since-deleted book"""
+    conn = sqlite3.connect(app_db)
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, category, totalCopies, availableCopies)
+        VALUES (?, ?, ?, 'Fiction', 9, 9)
+    ''', [('Dune', 'Frank Herbert', '9780441013593'), ('Emma', 'Jane Austen', None)])
+    conn.executemany('''
+        INSERT INTO users (email, password, firstName, lastName, role)
+        VALUES (?, 'x', ?, 'Reader', 'member')
+    ''', [('ann@test.com', 'Ann'), ('bob@test.com', 'Bob')])
+    conn.executemany('''
+        INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status, fine)
+        VALUES (?, ?, 'issue', '2024-01-01 10:00:00', '2024-01-15 10:00:00', 'returned', ?)
+    ''', [(1 + i % 2, 1 + i % 2, None if i % 3 else 10) for i in range(6)] + [(99, 1, 0)])
+    conn.commit()
+    conn.close()
+    return app_db
+
+
+def test_export_reads_one_snapshot_in_chunks(app_db):
+    db_pool = ConnectionManager(app_db)
+    chunks = transaction_export.chunks(db_pool, chunk_rows=3)
+
+    first = next(chunks)
+    # A loan written mid-export isn't part of it
+    writer = db_pool.connect()
+    writer.execute('''
+        INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status)
+        VALUES (1, 2, 'issue', '2024-02-01', '2024-02-15', 'active')
+    ''')
+    writer.commit()
+    writer.close()
+    rest = list(chunks)
+
+    assert [len(chunk) for chunk in [first] + rest] == [3, 3, 1]
+    ids = [row[0] for chunk in [first] + rest for row in chunk]
+    assert ids == list(range(1, 8))
+    db_pool.close_all()
+
+
+def test_ndjson_lines_are_flat_loan_records(app_db):
+    lines = b''.join(transaction_export.stream(ConnectionManager(app_db), 'ndjson', chunk_rows=4)).splitlines()
+
+    records = [json.loads(line) for line in lines]
+    assert len(records) == 7
+    assert set(records[0]) == set(transaction_export.COLUMNS)
+    assert (records[0]['bookTitle'], records[0]['userFirstName'], records[0]['fine']) == ('Dune', 'Ann', 10)
+    assert (records[1]['bookIsbn'], records[1]['fine']) == ('', 0)
+    # The deleted book's loan is still exported
+    assert (records[6]['bookId'], records[6]['bookTitle']) == (99, None)
+
+
+def test_csv_has_one_header_row(app_db):
+    body = b''.join(transaction_export.stream(ConnectionManager(app_db), 'csv', chunk_rows=2)).decode()
+
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows[0] == list(transaction_export.COLUMNS)
+    assert len(rows) == 8 and rows[1][11] == 'Dune'
+
+    sqlite3.connect(app_db).execute('DELETE FROM transactions').connection.commit()
+    assert b''.join(transaction_export.stream(ConnectionManager(app_db), 'csv')).decode().count('\n') == 1
+
+
+def test_export_endpoint_is_admin_only(client, admin_headers):
+    member = bearer_headers(app_module.app, claims={'role': 'member', 'isActive': True, 'authVersion': 0})
+
+    response = client.get('/api/transactions/export?format=csv', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/csv; charset=utf-8'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="transactions.csv"'
+    assert response.get_data().count(b'\n') == 8
+
+    assert client.get('/api/transactions/export?format=xml', headers=admin_headers).status_code == 400
+    assert client.get('/api/transactions/export', headers=member).status_code == 403
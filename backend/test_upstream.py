@@ -0,0 +1,77 @@
+import gzip
+import json
+import gateway
+from conftest import FakeBookService
+from utils.upstream import Upstream
+
+
+def test_gateway_reuses_one_connection(book_service, monkeypatch):
+    # /api/members isn't cached by the gateway, so every call goes upstream
+    monkeypatch.setenv('MEMBER_SERVICE_URL', book_service)
+    app = gateway.create_app()
+    client = app.test_client()
+
+    for _ in range(20):
+        with client.get('/api/members') as response:
+            assert response.status_code == 200
+            assert response.json[0]['title'] == 'Dune'
+
+    stats = app.extensions['upstreams']['member-service'].stats()
+    assert stats['requests'] == 20
+    assert stats['connectionsOpened'] == 1
+    assert stats['idleConnections'] == 1
+
+
+def test_slow_upstream_times_out(book_service, monkeypatch):
+    FakeBookService.delay = 0.5
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    app = gateway.create_app()
+    upstream = app.extensions['upstreams']['book-service']
+    upstream.timeout = (2.0, 0.1)
+
+    response = app.test_client().get('/api/books/1')
+
+    assert response.status_code == 503
+    assert upstream.stats()['errors'] == 1
+
+
+def test_gateway_passes_upstream_bytes_through(book_service, monkeypatch):
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    client = gateway.create_app().test_client()
+
+    response = client.get('/api/books/7', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == '"v7"'
+    assert json.loads(gzip.decompress(response.data)) == {'id': '7', 'title': 'Emma'}
+
+
+def test_gateway_rewrites_non_json_errors(book_service, monkeypatch):
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    client = gateway.create_app().test_client()
+
+    response = client.get('/api/books/404')
+
+    assert response.status_code == 404
+    assert response.json == {'error': 'Not Found'}
+
+
+def test_upstream_applies_default_timeouts(book_service):
+    upstream = Upstream('book-service', book_service + '/', connect_timeout=1.0, read_timeout=3.0)
+
+    assert upstream.get('/books').status_code == 200
+    assert upstream.stats()['timeout'] == {'connect': 1.0, 'read': 3.0}
+    upstream.close()
+
+
+def test_gateway_streams_catalog_import_uploads(book_service, monkeypatch):
+    """The import body is forwarded chunk by chunk, not buffered first"""
+    monkeypatch.setenv('BOOK_SERVICE_URL', book_service)
+    client = gateway.create_app().test_client()
+    upload = b'title,author,category,publishedYear,totalCopies\n' + b'Dune,Herbert,Fiction,1965,2\n' * 5000
+
+    response = client.post('/api/books/import', data=upload, content_type='text/csv')
+
+    assert response.status_code == 200
+    assert response.json == {'chunked': True, 'received': len(upload)}
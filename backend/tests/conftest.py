@@ -1,5 +1,5 @@
 import pytest
-from app import create_app
+from library_api import create_app
 from extensions import db
 from config import TestConfig
 from models.user import User, UserRole, UserStatus
@@ -87,7 +87,7 @@ def admin_headers(client, admin_user):
     
     assert response.status_code == 200
     data = response.get_json()
-    token = data['data']['access_token']
+    token = data['token']
     
     return {'Authorization': f'Bearer {token}'}
 
@@ -101,6 +101,6 @@ def member_headers(client, member_user):
     
     assert response.status_code == 200
     data = response.get_json()
-    token = data['data']['access_token']
+    token = data['token']
     
     return {'Authorization': f'Bearer {token}'}
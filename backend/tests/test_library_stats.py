@@ -0,0 +1,61 @@
+from sqlalchemy import text
+from extensions import db
+from models import library_stats
+from models.book import Book
+from models.user import User, UserRole, UserStatus
+from models.transaction import Transaction
+
+class TestLibraryStats:
+    """Test the incrementally maintained dashboard statistics"""
+
+    def test_counters_follow_circulation(self, client, admin_headers, member_headers, member_user, sample_book):
+        """Test that borrow, return, block and unblock keep every counter equal to a rebuild"""
+        borrowed = client.post('/transactions/borrow', json={'book_id': sample_book.id}, headers=member_headers)
+        second = Book(title='Second Book', author='Author', category='Fiction', total_copies=1, available_copies=1)
+        db.session.add(second)
+        db.session.commit()
+        client.post('/transactions/borrow', json={'book_id': second.id}, headers=member_headers)
+        client.post('/transactions/return', json={'transaction_id': borrowed.get_json()['id']}, headers=member_headers)
+        client.post(f'/members/{member_user.id}/block', headers=admin_headers)
+
+        transactions = client.get('/transactions/stats', headers=admin_headers).get_json()
+        members = client.get('/members/stats', headers=admin_headers).get_json()
+
+        assert transactions == {'total_transactions': 2, 'active_transactions': 1,
+                                'returned_transactions': 1, 'overdue_transactions': 0}
+        assert members == {'total_members': 1, 'active_members': 0, 'blocked_members': 1,
+                           'members_with_active_books': 1}
+        assert library_stats.read({**library_stats.TRANSACTION_COUNTERS, **library_stats.MEMBER_COUNTERS}) \
+            == library_stats.rebuild()
+
+        client.post(f'/members/{member_user.id}/unblock', headers=admin_headers)
+        assert client.get('/members/stats', headers=admin_headers).get_json()['active_members'] == 1
+
+    def test_rebuild_mode_repairs_drift(self, client, admin_headers, member_user, sample_book):
+        """Test the optional full rebuild"""
+        db.session.add(Transaction(member_user.id, sample_book.id))
+        db.session.commit()
+        db.session.execute(text("UPDATE stats_counters SET value = 42"))
+        db.session.commit()
+
+        response = client.get('/members/stats?rebuild=true', headers=admin_headers)
+
+        assert response.get_json()['total_members'] == 1
+        assert response.get_json()['members_with_active_books'] == 1
+        transactions = client.get('/transactions/stats', headers=admin_headers).get_json()
+        assert transactions['total_transactions'] == 1
+
+    def test_deleting_rows_updates_counters(self, app, sample_book):
+        """Test that deletes take their contribution back out"""
+        user = User(name='Leaving Member', email='leaving@test.com', role=UserRole.MEMBER, status=UserStatus.ACTIVE)
+        user.set_password('testpassword')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Transaction(user.id, sample_book.id))
+        db.session.commit()
+
+        db.session.delete(user)
+        db.session.commit()
+
+        assert library_stats.read(['total_members', 'total_transactions', 'members_with_active_books']) == {
+            'total_members': 0, 'total_transactions': 0, 'members_with_active_books': 0}
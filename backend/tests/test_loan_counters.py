@@ -0,0 +1,65 @@
+from sqlalchemy import text
+from extensions import db
+from models import loan_counters
+from models.book import Book
+from models.user import User
+from models.transaction import Transaction, TransactionStatus
+
+def counters(user_id):
+    user = db.session.get(User, user_id)
+    db.session.refresh(user)
+    return user.total_loans, user.active_loans, user.overdue_loans
+
+class TestLoanCounters:
+    """Test the per-member loan counters"""
+
+    def test_triggers_follow_loan_writes(self, app, member_user, sample_book):
+        """Test that inserts, status changes and deletes keep the counters exact"""
+        loan = Transaction(member_user.id, sample_book.id)
+        db.session.add_all([loan, Transaction(member_user.id, sample_book.id)])
+        db.session.commit()
+        assert counters(member_user.id) == (2, 2, 0)
+
+        loan.status = TransactionStatus.OVERDUE
+        db.session.commit()
+        assert counters(member_user.id) == (2, 2, 1)
+
+        loan.return_book()
+        db.session.commit()
+        assert counters(member_user.id) == (2, 1, 0)
+
+        db.session.delete(loan)
+        db.session.commit()
+        assert counters(member_user.id) == (1, 1, 0)
+
+    def test_borrow_limit_reads_the_counter(self, client, member_headers, member_user):
+        """Test the borrowing limit against the active loan counter"""
+        books = [Book(title=f'Book {i}', author='Author', category='Fiction', total_copies=1, available_copies=1)
+                 for i in range(6)]
+        db.session.add_all(books)
+        db.session.commit()
+
+        statuses = [client.post('/transactions/borrow', json={'book_id': book.id}, headers=member_headers).status_code
+                    for book in books]
+
+        assert statuses == [201] * 5 + [400]
+        assert counters(member_user.id) == (5, 5, 0)
+
+    def test_reconcile_repairs_drift(self, app, member_user, sample_book):
+        """Test that reconciliation recomputes the counters from scratch"""
+        db.session.add_all([Transaction(member_user.id, sample_book.id) for _ in range(3)])
+        db.session.commit()
+        db.session.execute(text('UPDATE users SET total_loans = 0, active_loans = 9 WHERE id = :id'),
+                           {'id': member_user.id})
+        db.session.commit()
+
+        assert loan_counters.reconcile() == 1
+        assert counters(member_user.id) == (3, 3, 0)
+        assert loan_counters.reconcile() == 0
+
+    def test_reconcile_command(self, app, runner):
+        """Test the reconcile-loans CLI command"""
+        result = runner.invoke(args=['transactions', 'reconcile-loans'])
+
+        assert result.exit_code == 0
+        assert '0 member(s) corrected' in result.output
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import event
+from extensions import db
+from models import overdue_sweeper
+from models.user import User, UserRole
+from models.transaction import Transaction
+
+class TestMemberListing:
+    """Test the members listing and its transaction statistics"""
+
+    def add_members(self, count, book_id):
+        """Members with one active, one overdue and one returned loan each"""
+        start = User.query.count()
+        for i in range(start, start + count):
+            user = User(name=f'Member {i}', email=f'member{i}@listing.com', role=UserRole.MEMBER)
+            user.password_hash = 'not-used'
+            db.session.add(user)
+            db.session.flush()
+
+            returned = Transaction(user.id, book_id)
+            returned.return_book()
+            db.session.add_all([
+                Transaction(user.id, book_id),
+                Transaction(user.id, book_id, days_to_return=-3),
+                returned,
+            ])
+        db.session.commit()
+        overdue_sweeper.sweep()
+
+    def count_queries(self, client, url, headers):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.get(url, headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return response, len(statements)
+
+    def test_member_statistics(self, client, admin_headers, sample_book):
+        """Test the per-member loan counts"""
+        self.add_members(2, sample_book.id)
+
+        response = client.get('/members?role=member', headers=admin_headers)
+
+        assert response.status_code == 200
+        assert response.headers['X-Total-Count'] == '2'
+        for member in response.get_json():
+            assert member['total_transactions'] == 3
+            assert member['active_transactions'] == 2
+            assert member['overdue_transactions'] == 1
+
+    def test_query_count_is_constant(self, client, admin_headers, sample_book):
+        """Test that listing more members issues no more queries"""
+        self.add_members(3, sample_book.id)
+        _, few = self.count_queries(client, '/members', admin_headers)
+
+        self.add_members(40, sample_book.id)
+        response, many = self.count_queries(client, '/members', admin_headers)
+
+        assert len(response.get_json()) == 44  # members plus the admin
+        assert many == few
+
+    @pytest.mark.parametrize('query, expected', [('per_page=10', 10), ('per_page=10&page=3', 5), ('page=9', 0)])
+    def test_pagination(self, client, admin_headers, sample_book, query, expected):
+        """Test paging through the members listing"""
+        self.add_members(25, sample_book.id)
+
+        response = client.get(f'/members?role=member&{query}', headers=admin_headers)
+
+        assert response.status_code == 200
+        assert len(response.get_json()) == expected
+        assert response.headers['X-Total-Count'] == '25'
@@ -0,0 +1,152 @@
+import time
+from datetime import datetime, timedelta
+from extensions import db
+from models import library_stats, overdue_sweeper
+from models.overdue_sweeper import SweepCheckpoint
+from models.transaction import Transaction, TransactionStatus
+from models.user import User
+from utils.circulation import FINE_PER_DAY
+
+def add_loans(user_id, book_id, days_to_return, count=1):
+    loans = [Transaction(user_id, book_id, days_to_return=days_to_return) for _ in range(count)]
+    db.session.add_all(loans)
+    db.session.commit()
+    return loans
+
+def fines(loans):
+    for loan in loans:
+        db.session.refresh(loan)
+    return [loan.fine for loan in loans]
+
+class TestOverdueSweeper:
+    """Test the background overdue sweeper"""
+
+    def test_flips_overdue_loans_in_batches(self, app, member_user, sample_book):
+        """Test that only loans past due are flipped, and the counters follow"""
+        overdue = add_loans(member_user.id, sample_book.id, -3, count=5)
+        current = add_loans(member_user.id, sample_book.id, 14)
+
+        result = overdue_sweeper.sweep(batch_size=2)
+
+        assert result.flipped == 5
+        assert {loan.status for loan in overdue} == {TransactionStatus.OVERDUE}
+        assert current[0].status == TransactionStatus.ISSUED
+        assert fines(overdue) == [3 * FINE_PER_DAY] * 5
+        member = db.session.get(User, member_user.id)
+        db.session.refresh(member)
+        assert (member.active_loans, member.overdue_loans) == (6, 5)
+        assert library_stats.read(['overdue_transactions']) == {'overdue_transactions': 5}
+        assert overdue_sweeper.sweep().flipped == 0
+
+    def test_fines_accrue_between_passes(self, app, member_user, sample_book):
+        """Test that a new fine pass starts only once the last one is FINE_REFRESH old"""
+        loans = add_loans(member_user.id, sample_book.id, -1, count=3)
+        now = datetime.utcnow()
+        overdue_sweeper.sweep(now)
+
+        assert overdue_sweeper.refresh_fines(now + timedelta(minutes=30)) == 0
+        assert overdue_sweeper.refresh_fines(now + timedelta(days=2), batch_size=2) == 3
+        assert fines(loans) == [3 * FINE_PER_DAY] * 3
+
+    def test_interrupted_pass_resumes_from_checkpoint(self, app, member_user, sample_book):
+        """Test that a pass picks up after the last loan it checkpointed"""
+        loans = add_loans(member_user.id, sample_book.id, -1, count=3)
+        now = datetime.utcnow()
+        overdue_sweeper.flip_overdue(now)
+        db.session.merge(SweepCheckpoint(name='fines', as_of=now + timedelta(days=1),
+                                         after_due=loans[0].due_date, after_id=loans[0].id))
+        db.session.commit()
+
+        assert overdue_sweeper.refresh_fines(now) == 2
+        assert fines(loans) == [FINE_PER_DAY, 2 * FINE_PER_DAY, 2 * FINE_PER_DAY]
+        assert db.session.get(SweepCheckpoint, 'fines').completed_at == now
+
+    def test_return_settles_fine(self, app, member_user, sample_book):
+        """Test that returning a late loan records its fine"""
+        loan = add_loans(member_user.id, sample_book.id, -2)[0]
+        overdue_sweeper.sweep()
+
+        loan.return_book()
+        db.session.commit()
+
+        assert loan.fine == 2 * FINE_PER_DAY
+        assert loan.to_dict()['status'] == 'returned'
+        member = db.session.get(User, member_user.id)
+        db.session.refresh(member)
+        assert member.overdue_loans == 0
+
+    def test_overdue_listing_and_stats(self, client, admin_headers, member_user, sample_book):
+        """Test that the overdue endpoints read the stored status"""
+        add_loans(member_user.id, sample_book.id, -5)
+        add_loans(member_user.id, sample_book.id, -1)
+        add_loans(member_user.id, sample_book.id, 7)
+        overdue_sweeper.sweep()
+
+        overdue = client.get('/transactions/overdue', headers=admin_headers).get_json()
+        stats = client.get('/transactions/stats', headers=admin_headers).get_json()
+        only = client.get('/transactions?overdue_only=true', headers=admin_headers).get_json()
+
+        assert [loan['fine'] for loan in overdue] == [5 * FINE_PER_DAY, FINE_PER_DAY]
+        assert {loan['status'] for loan in overdue} == {'overdue'}
+        assert stats['overdue_transactions'] == 2
+        assert stats['active_transactions'] == 3
+        assert len(only) == 2
+
+    def test_sweep_command(self, app, runner, member_user, sample_book):
+        """Test the sweep-overdue CLI command"""
+        add_loans(member_user.id, sample_book.id, -1, count=2)
+
+        result = runner.invoke(args=['transactions', 'sweep-overdue', '--batch-size', '1'])
+
+        assert result.exit_code == 0
+        assert '2 loan(s) marked overdue' in result.output
+
+    def test_sweeper_runs_in_app_context(self, app, member_user, sample_book):
+        """Test the thread entry point without starting the thread"""
+        add_loans(member_user.id, sample_book.id, -1)
+        sweeper = overdue_sweeper.OverdueSweeper(app)
+
+        assert sweeper.interval == 0
+        assert sweeper.run_once().flipped == 1
+        assert app.extensions['overdue_sweeper'] is sweeper
+
+    def test_reads_include_loans_not_yet_swept(self, client, admin_headers, member_user, sample_book):
+        """Test that overdue reads are exact before the first sweep"""
+        add_loans(member_user.id, sample_book.id, -4)
+        add_loans(member_user.id, sample_book.id, 7)
+
+        overdue = client.get('/transactions/overdue', headers=admin_headers).get_json()
+        stats = client.get('/transactions/stats', headers=admin_headers).get_json()
+        only = client.get('/transactions?overdue_only=true', headers=admin_headers).get_json()
+        members = client.get('/members?role=member', headers=admin_headers).get_json()
+
+        assert [(loan['status'], loan['fine']) for loan in overdue] == [('issued', 4 * FINE_PER_DAY)]
+        assert stats['overdue_transactions'] == 1
+        assert len(only) == 1
+        assert members[0]['overdue_transactions'] == 1
+
+        overdue_sweeper.sweep()
+
+        assert client.get('/transactions/stats', headers=admin_headers).get_json()['overdue_transactions'] == 1
+        assert client.get('/members?role=member', headers=admin_headers).get_json()[0]['overdue_transactions'] == 1
+
+    def test_one_process_sweeps_per_lock(self, app, member_user, sample_book, tmp_path):
+        """Test that a sweeper runs while a second one on the same lock stays stopped"""
+        app.config.update(OVERDUE_SWEEP_INTERVAL=0.05, OVERDUE_SWEEP_LOCK=str(tmp_path / 'sweeper.lock'))
+        sweeper = overdue_sweeper.OverdueSweeper(app)
+        other = overdue_sweeper.OverdueSweeper(app)
+        loan = add_loans(member_user.id, sample_book.id, -1)[0]
+        try:
+            assert sweeper.start()
+            assert not other.start()
+            for _ in range(100):
+                db.session.expire_all()
+                if loan.status == TransactionStatus.OVERDUE:
+                    break
+                time.sleep(0.05)
+        finally:
+            sweeper.stop()
+
+        assert loan.status == TransactionStatus.OVERDUE
+        assert other.start()
+        other.stop()
@@ -1,9 +1,10 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_identity, jwt_required
-import sqlite3
+from flask_jwt_extended import JWTManager
 import os
 from datetime import datetime, timedelta
+from utils.db import ConnectionManager
+from utils import circulation, claims, errors, pagination, schema, transaction_export
 from functools import wraps
 
 app = Flask(__name__)
@@ -23,26 +24,24 @@ CORS(app,
 
 # Database setup
 DATABASE = os.environ.get('DATABASE_URL', 'library.db')
+db_pool = ConnectionManager(lambda: DATABASE, app, on_connect=schema.upgrade)
+revocations = claims.Revocations(db_pool)
+errors.register(app)
 
 def admin_required(fn):
     """Decorator to require admin role for protected routes"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
+            current_user_id, token_claims = claims.current_claims(revocations)
             
-            # Check if user is admin
-            conn = sqlite3.connect(DATABASE)
-            cursor = conn.cursor()
-            cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-            user_role = cursor.fetchone()
-            conn.close()
-            
-            if not user_role or user_role[0] != 'admin':
+            # Check if user is admin - from the token, no users lookup
+            if not claims.is_admin(token_claims):
                 return jsonify({'error': 'Admin access required'}), 403
             
             return fn(*args, **kwargs)
+        except errors.ApiError:
+            raise
         except Exception as e:
             return jsonify({'error': 'Authentication required'}), 401
     
@@ -55,10 +54,9 @@ def health_check():
 
 # Transaction API Routes
 @app.route('/borrow/<int:book_id>', methods=['POST'])
-@jwt_required()
 def borrow_book(book_id):
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id, token_claims = claims.current_claims(revocations)
 
         data = request.get_json() or {}
         due_date = data.get('dueDate')
@@ -77,42 +75,8 @@ def borrow_book(book_id):
             except:
                 due_date = datetime.now() + timedelta(days=14)
 
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
-        # Check if book exists and is available
-        cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
-        book_row = cursor.fetchone()
-
-        if not book_row:
-            conn.close()
-            return jsonify({'error': 'Book not found'}), 404
-
-        # Check available copies (index 8 is availableCopies)
-        if book_row[8] <= 0:
-            conn.close()
-            return jsonify({'error': 'Book not available'}), 400
-
-        # Check if user already has this book
-        cursor.execute("SELECT id FROM transactions WHERE bookId = ? AND userId = ? AND status = 'active'", (book_id, current_user_id))
-        if cursor.fetchone():
-            conn.close()
-            return jsonify({'error': 'User already has this book'}), 400
-
-        # Create transaction
-        issue_date = datetime.now()
-        cursor.execute('''
-            INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status)
-            VALUES (?, ?, 'issue', ?, ?, 'active')
-        ''', (book_id, current_user_id, issue_date, due_date))
-
-        transaction_id = cursor.lastrowid
-
-        # Update book availability
-        cursor.execute("UPDATE books SET availableCopies = availableCopies - 1, updatedAt = ? WHERE id = ?", (datetime.now(), book_id))
-
-        conn.commit()
-        conn.close()
+        conn = db_pool.get_db()
+        transaction_id, issue_date = circulation.borrow_book(conn, book_id, current_user_id, due_date)
 
         transaction = {
             'id': str(transaction_id),
@@ -129,17 +93,69 @@ def borrow_book(book_id):
         }
 
         return jsonify(transaction), 201
+    except errors.ApiError:
+        raise
     except Exception as e:
         # Return proper JSON error response
         error_message = str(e) if str(e) else 'Authentication required'
         response = jsonify({'error': error_message, 'success': False})
         return response, 401
 
+@app.route('/borrow/batch', methods=['POST'])
+def borrow_batch():
+    """Circulation desk checkout: several books for the caller in one transaction"""
+    try:
+        current_user_id, token_claims = claims.current_claims(revocations)
+
+        data = request.get_json(silent=True) or {}
+        book_ids = circulation.check_batch(data.get('bookIds'))
+
+        due_date = data.get('dueDate')
+        if not due_date:
+            due_date = datetime.now() + timedelta(days=14)
+        else:
+            try:
+                if isinstance(due_date, str):
+                    if 'T' in due_date:
+                        due_date = datetime.fromisoformat(due_date.replace('Z', ''))
+                    else:
+                        due_date = datetime.strptime(due_date, '%Y-%m-%d')
+            except:
+                due_date = datetime.now() + timedelta(days=14)
+
+        conn = db_pool.get_db()
+        outcomes, issue_date = circulation.borrow_batch(conn, book_ids, current_user_id, due_date)
+
+        results = []
+        for book_id, transaction_id, error in outcomes:
+            if error is not None:
+                results.append({'bookId': book_id, 'status': error.status_code, 'error': error.message})
+                continue
+            results.append({'bookId': book_id, 'status': 201, 'transaction': {
+                'id': str(transaction_id),
+                'bookId': int(book_id),
+                'userId': str(current_user_id),
+                'type': 'issue',
+                'issueDate': issue_date.isoformat(),
+                'dueDate': due_date.isoformat(),
+                'returnDate': None,
+                'status': 'active',
+                'fine': 0,
+                'createdAt': issue_date.isoformat(),
+                'updatedAt': issue_date.isoformat()
+            }})
+
+        succeeded = sum(1 for result in results if result['status'] == 201)
+        return jsonify({'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded})
+    except errors.ApiError:
+        raise
+    except Exception as e:
+        return jsonify({'error': 'Authentication required'}), 401
+
 @app.route('/return/<int:transaction_id>', methods=['POST'])
-@jwt_required()
 def return_book(transaction_id):
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id, token_claims = claims.current_claims(revocations)
 
         data = request.get_json() or {}
         return_date = data.get('returnDate')
@@ -157,51 +173,9 @@ def return_book(transaction_id):
             except:
                 return_date = datetime.now()
 
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # Get transaction
-        cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
-        transaction_row = cursor.fetchone()
-
-        if not transaction_row:
-            conn.close()
-            return jsonify({'error': 'Transaction not found'}), 404
-
-        if transaction_row['status'] != 'active':
-            conn.close()
-            return jsonify({'error': 'Book is not currently issued'}), 400
-
-        # Check if user owns this transaction (unless admin)
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()['role']
-
-        if user_role != 'admin' and transaction_row['userId'] != current_user_id:
-            conn.close()
-            return jsonify({'error': 'You can only return your own books'}), 403
-
-        # Calculate fine if overdue
-        due_date = datetime.fromisoformat(transaction_row['dueDate'])
-        if return_date > due_date:
-            days_overdue = (return_date - due_date).days
-            fine = days_overdue * 10  # $10 per day
-        else:
-            fine = 0
-
-        # Update transaction
-        cursor.execute('''
-            UPDATE transactions
-            SET returnDate = ?, status = 'returned', fine = ?, updatedAt = ?
-            WHERE id = ?
-        ''', (return_date, fine, datetime.now(), transaction_id))
-
-        # Update book availability
-        cursor.execute("UPDATE books SET availableCopies = availableCopies + 1, updatedAt = ? WHERE id = ?",
-                       (datetime.now(), transaction_row['bookId']))
-
-        conn.commit()
-        conn.close()
+        conn = db_pool.get_db()
+        transaction_row, fine = circulation.return_book(conn, transaction_id, current_user_id, return_date,
+                                                      is_admin=claims.is_admin(token_claims))
 
         transaction = {
             'id': str(transaction_id),
@@ -218,76 +192,133 @@ def return_book(transaction_id):
         }
 
         return jsonify(transaction)
+    except errors.ApiError:
+        raise
+    except Exception as e:
+        return jsonify({'error': 'Authentication required'}), 401
+
+@app.route('/return/batch', methods=['POST'])
+def return_batch():
+    """Circulation desk check-in: several loans in one transaction"""
+    try:
+        current_user_id, token_claims = claims.current_claims(revocations)
+
+        data = request.get_json(silent=True) or {}
+        transaction_ids = circulation.check_batch(data.get('transactionIds'))
+
+        return_date = data.get('returnDate')
+        if not return_date:
+            return_date = datetime.now()
+        else:
+            try:
+                if isinstance(return_date, str):
+                    if 'T' in return_date:
+                        return_date = datetime.fromisoformat(return_date.replace('Z', ''))
+                    else:
+                        return_date = datetime.strptime(return_date, '%Y-%m-%d')
+            except:
+                return_date = datetime.now()
+
+        conn = db_pool.get_db()
+        outcomes = circulation.return_batch(conn, transaction_ids, current_user_id, return_date,
+                                            is_admin=claims.is_admin(token_claims))
+
+        now = datetime.now().isoformat()
+        results = []
+        for transaction_id, returned, error in outcomes:
+            if error is not None:
+                results.append({'transactionId': transaction_id, 'status': error.status_code, 'error': error.message})
+                continue
+            transaction_row, fine = returned
+            results.append({'transactionId': transaction_id, 'status': 200, 'transaction': {
+                'id': str(transaction_id),
+                'bookId': str(transaction_row['bookId']),
+                'userId': str(transaction_row['userId']),
+                'type': 'return',
+                'issueDate': transaction_row['issueDate'],
+                'dueDate': transaction_row['dueDate'],
+                'returnDate': return_date.isoformat(),
+                'status': 'returned',
+                'fine': fine,
+                'createdAt': transaction_row['createdAt'],
+                'updatedAt': now
+            }})
+
+        succeeded = sum(1 for result in results if result['status'] == 200)
+        return jsonify({'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded})
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Authentication required'}), 401
 
 @app.route('/transactions', methods=['GET'])
-@jwt_required()
 def get_transactions():
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id, token_claims = claims.current_claims(revocations)
+
+        page = pagination.from_request(request.args, allow_unbounded=claims.is_admin(token_claims))
 
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
+        conn = db_pool.get_db()
         cursor = conn.cursor()
 
-        # Get current user to check if admin
-        cursor.execute("SELECT role FROM users WHERE id = ?", (current_user_id,))
-        user_role = cursor.fetchone()['role']
+        # Role comes from the token claims
+        user_role = token_claims['role']
 
         # Build query based on user role
-        if user_role == 'admin':
+        if user_role == 'admin' and page.after:
             cursor.execute('''
-                SELECT t.*, u.firstName, u.lastName, u.email, b.title, b.author, b.isbn
-                FROM transactions t
-                JOIN users u ON t.userId = u.id
-                JOIN books b ON t.bookId = b.id
-                ORDER BY t.createdAt DESC
-            ''')
+                SELECT createdAt, id, json
+                FROM transactions_json
+                WHERE (createdAt, id) < (?, ?)
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (*page.after, page.fetch))
+        elif user_role == 'admin':
+            cursor.execute('''
+                SELECT createdAt, id, json
+                FROM transactions_json
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (page.fetch,))
+        elif page.after:
+            cursor.execute('''
+                SELECT createdAt, id, json
+                FROM transactions_json
+                WHERE userId = ? AND (createdAt, id) < (?, ?)
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (current_user_id, *page.after, page.fetch))
         else:
             cursor.execute('''
-                SELECT t.*, u.firstName, u.lastName, u.email, b.title, b.author, b.isbn
-                FROM transactions t
-                JOIN users u ON t.userId = u.id
-                JOIN books b ON t.bookId = b.id
-                WHERE t.userId = ?
-                ORDER BY t.createdAt DESC
-            ''', (current_user_id,))
-
-        transactions_rows = cursor.fetchall()
-        conn.close()
-
-        transactions = []
-        for t_row in transactions_rows:
-            transaction = {
-                'id': str(t_row['id']),
-                'bookId': str(t_row['bookId']),
-                'userId': str(t_row['userId']),
-                'type': t_row['type'],
-                'issueDate': t_row['issueDate'],
-                'dueDate': t_row['dueDate'],
-                'returnDate': t_row['returnDate'],
-                'status': t_row['status'],
-                'fine': t_row['fine'] or 0,
-                'createdAt': t_row['createdAt'],
-                'updatedAt': t_row['updatedAt'],
-                'book': {
-                    'title': t_row['title'],
-                    'author': t_row['author'],
-                    'isbn': t_row['isbn'] or ''
-                },
-                'user': {
-                    'firstName': t_row['firstName'],
-                    'lastName': t_row['lastName'],
-                    'email': t_row['email']
-                }
-            }
-            transactions.append(transaction)
-
-        return jsonify(transactions)
+                SELECT createdAt, id, json
+                FROM transactions_json
+                WHERE userId = ?
+                ORDER BY createdAt DESC, id DESC LIMIT ?
+            ''', (current_user_id, page.fetch))
+
+        return page.respond(cursor, db_pool)
+    except errors.ApiError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Authentication required'}), 401
 
+@app.route('/transactions/summary', methods=['GET'])
+@admin_required
+def get_transactions_summary():
+    """Loan totals for the admin dashboard"""
+    row = db_pool.get_db().execute(
+        "SELECT count(*) AS totalTransactions, coalesce(sum(status = 'active'), 0) AS activeTransactions FROM transactions"
+    ).fetchone()
+    return jsonify(dict(row))
+
+@app.route('/transactions/export', methods=['GET'])
+@admin_required
+def export_transactions():
+    """Full loan history as NDJSON or CSV, streamed from one read snapshot"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in transaction_export.FORMATS:
+        return jsonify({'error': "format must be 'ndjson' or 'csv'"}), 400
+
+    return Response(transaction_export.stream(db_pool, fmt), content_type=transaction_export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="transactions.{fmt}"'})
+
 # Handle preflight OPTIONS requests for CORS
 @app.before_request
 def handle_preflight():
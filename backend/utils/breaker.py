@@ -0,0 +1,137 @@
+"""
+Circuit breaker and bulkhead for the gateway's upstream services
+The breaker watches the outcome of the last few calls to one service; when
+too many fail or crawl it opens and calls are refused at once instead of
+tying up gateway threads, then lets a probe through after a cool-off. The
+bulkhead caps how many calls may be in flight to one service, so a slow
+service can't take every thread with it
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+WINDOW = int(os.environ.get('BREAKER_WINDOW', 20))
+MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 10))
+FAILURE_RATE = float(os.environ.get('BREAKER_FAILURE_RATE', 0.5))
+SLOW_CALL_SECONDS = float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', 2.0))
+SLOW_CALL_RATE = float(os.environ.get('BREAKER_SLOW_CALL_RATE', 0.8))
+OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 15.0))
+MAX_CONCURRENT = int(os.environ.get('UPSTREAM_MAX_CONCURRENT', 16))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    """Call refused without reaching the service: breaker open or bulkhead full"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Count-based sliding window of (failed, slow) call outcomes"""
+
+    def __init__(self, window=WINDOW, min_calls=MIN_CALLS, failure_rate=FAILURE_RATE,
+                 slow_call_seconds=SLOW_CALL_SECONDS, slow_call_rate=SLOW_CALL_RATE,
+                 open_seconds=OPEN_SECONDS, clock=time.monotonic):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = None
+        self._probing = False
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self):
+        """Whether a call may go ahead now; in half-open only one probe at a time"""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._probing):
+                self._probing = self.state == HALF_OPEN
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, failed, seconds):
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._trip()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if self.state == CLOSED and calls >= self.min_calls:
+                failures = sum(1 for outcome in self._outcomes if outcome[0])
+                slow_calls = sum(1 for outcome in self._outcomes if outcome[1])
+                if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                    self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.trips += 1
+        self._outcomes.clear()
+
+    def retry_after(self):
+        """Whole seconds until an open breaker lets a probe through (at least 1)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 1
+            return max(1, math.ceil(self.opened_at + self.open_seconds - self.clock()))
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'state': self.state,
+                'calls': calls,
+                'failureRate': round(sum(1 for o in self._outcomes if o[0]) / calls, 4) if calls else 0.0,
+                'slowCallRate': round(sum(1 for o in self._outcomes if o[1]) / calls, 4) if calls else 0.0,
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
+
+
+class Bulkhead:
+    """Non-blocking cap on concurrent calls; a full bulkhead rejects instead of queueing"""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def acquire(self):
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'inFlight': self.in_flight, 'maxConcurrent': self.max_concurrent, 'rejected': self.rejected}
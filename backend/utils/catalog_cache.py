@@ -0,0 +1,111 @@
+"""
+In-process cache of rendered catalog responses
+Entries hold the JSON bytes of a books list page or single book, tagged with
+the catalog version they were rendered at. The version is a counter that
+triggers on `books` bump, so writes from another process (the transaction
+service borrowing a copy) make entries stale too; handlers in this process
+also drop entries as soon as they commit. Concurrent misses for the same
+entry render it once
+"""
+
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from utils import pagination
+from utils.singleflight import SingleFlight
+
+
+def catalog_version(conn):
+    row = conn.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+class CatalogCache:
+    """LRU of rendered GET responses, checked against the catalog version on every hit"""
+
+    def __init__(self, db_pool, max_entries=1024):
+        self.db_pool = db_pool
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (database, endpoint, book_id, query) -> (version, body, headers)
+        self._lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self):
+        book_id = (request.view_args or {}).get('book_id')
+        return self.db_pool.database, request.endpoint, book_id, request.query_string
+
+    def cached(self, fn):
+        """Serve a GET view from the cache; only 200 responses are stored.
+        Unbounded listings are streamed, never buffered into the cache"""
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.args.get('limit') == pagination.UNBOUNDED:
+                return fn(*args, **kwargs)
+
+            key = self._key()
+            # Read before rendering: a write in between leaves the entry already stale
+            version = catalog_version(self.db_pool.get_db())
+
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                else:
+                    entry = None
+                    self.misses += 1
+
+            if entry is not None:
+                response = current_app.response_class(entry[1], mimetype='application/json')
+                response.headers.extend(entry[2])
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            def render():
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code == 200:
+                    headers = [(name, value) for name, value in response.headers if name.startswith('X-')]
+                    with self._lock:
+                        self._entries[key] = (version, response.get_data(), headers)
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+                return response.status_code, response.get_data(), list(response.headers)
+
+            # Readers that miss together share the leader's render
+            status, body, headers = self.flights.do(key + (version,), render)
+            response = current_app.response_class(body, status=status, headers=headers)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+    def invalidate(self, book_id=None):
+        """Drop every list page plus the entry for book_id (all entries if None)"""
+        with self._lock:
+            self.invalidations += 1
+            if book_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[2] is None or key[2] == int(book_id)]:
+                del self._entries[key]
+
+    def stats(self):
+        version = catalog_version(self.db_pool.get_db())
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'version': version,
+                'singleFlight': self.flights.stats(),
+            }
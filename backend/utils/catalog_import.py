@@ -0,0 +1,262 @@
+"""
+Bulk catalog import from CSV or JSON Lines
+Rows are parsed one at a time from the input stream, validated, and inserted
+with executemany in batches; each transaction covers many batches, runs with
+bulk-load pragmas and indexes its rows for search in one pass at the end, so
+a million titles load in minutes instead of one commit per row. Rejected rows go to a reject sink with their line number and
+reason, and memory stays bounded by the batch size whatever the input size
+
+Usage: python -m utils.catalog_import books.csv [--format csv|jsonl] [--rejects rejects.jsonl] [--database library.db]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from utils import circulation, errors
+
+BATCH_SIZE = 5000          # rows per executemany
+TRANSACTION_ROWS = 100000  # rows per committed transaction
+DEFAULT_IMAGE_URL = 'https://via.placeholder.com/150x200'
+MAX_REPORTED_REJECTS = 1000  # rejects echoed back by the HTTP endpoint
+
+REQUIRED_FIELDS = ('title', 'author', 'category', 'publishedYear', 'totalCopies')
+
+# Applied for the length of an import only; the connection defaults come back afterwards
+BULK_PRAGMAS = ('PRAGMA synchronous = OFF', 'PRAGMA cache_size = -65536')
+RESTORE_PRAGMAS = ('PRAGMA synchronous = NORMAL', 'PRAGMA cache_size = -2000')
+
+INSERT_BOOK = '''
+    INSERT INTO books (title, author, isbn, category, publishedYear, description, totalCopies, availableCopies, imageUrl, updatedAt)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+FTS_TRIGGER = "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'books_fts_insert'"
+INDEX_NEW_BOOKS = '''
+    INSERT INTO books_fts (rowid, title, author, isbn, description)
+    SELECT id, title, author, isbn, description FROM books WHERE id > ?
+'''
+
+ImportResult = namedtuple('ImportResult', 'imported rejected seconds')
+
+
+class CatalogImportError(errors.ApiError):
+    """Input the import can't start on (unknown format, missing CSV columns)"""
+
+
+class RowError(ValueError):
+    """One row failed validation; the import carries on without it"""
+
+
+class RejectSample(list):
+    """Reject sink for the HTTP endpoint: keeps the first `limit` rejects for
+    the response body (the CLI writes every reject to a file instead)"""
+
+    def __init__(self, limit=MAX_REPORTED_REJECTS):
+        super().__init__()
+        self.limit = limit
+
+    def __call__(self, line_number, error, record):
+        if len(self) < self.limit:
+            self.append({'line': line_number, 'error': error, 'record': record})
+
+
+def parse_csv(stream):
+    """(line number, record) for each row of a text stream with a header row"""
+    reader = csv.DictReader(stream)
+    missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or ())]
+    if missing:
+        raise CatalogImportError(f"CSV header is missing {', '.join(missing)}")
+    for record in reader:
+        yield reader.line_num, record
+
+
+def parse_jsonl(stream):
+    """(line number, record) for each non-blank line of a JSON Lines text stream"""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, RowError(f'Invalid JSON: {e}')
+
+
+PARSERS = {'csv': parse_csv, 'jsonl': parse_jsonl}
+
+
+def _whole_number(record, field, minimum):
+    value = record.get(field)
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field} must be a whole number')
+    if isinstance(value, float) and value != number or isinstance(value, bool):
+        raise RowError(f'{field} must be a whole number')
+    if number < minimum:
+        raise RowError(f'{field} must be at least {minimum}')
+    return number
+
+
+def validate(record, now):
+    """Parameters for INSERT_BOOK from one record, or RowError"""
+    if isinstance(record, RowError):
+        raise record
+    if not isinstance(record, dict):
+        raise RowError('Expected an object')
+    missing = [field for field in REQUIRED_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        raise RowError(f"Required fields missing: {', '.join(missing)}")
+    text = {}
+    for field in ('title', 'author', 'category', 'isbn', 'description', 'imageUrl'):
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            raise RowError(f'{field} must be a string')
+        text[field] = (value or '').strip()
+    year = _whole_number(record, 'publishedYear', 0)
+    copies = _whole_number(record, 'totalCopies', 1)
+    return (text['title'], text['author'], text['isbn'], text['category'], year, text['description'],
+            copies, copies, text['imageUrl'] or DEFAULT_IMAGE_URL, now)
+
+
+def import_books(conn, rows, rejects=None, progress=None, batch_size=BATCH_SIZE,
+                 transaction_rows=TRANSACTION_ROWS):
+    """Insert every valid record from rows, an iterable of (line number, record)
+
+    rejects(line_number, error_message, record) is called for each bad row and
+    progress(imported, rejected) after each batch. Transactions already
+    committed stay in place if the import fails part way
+    """
+    started = time.monotonic()
+    rows = iter(rows)
+    counts = {'imported': 0, 'rejected': 0, 'done': False}
+
+    def load_transaction(conn):
+        # One bulk FTS insert per transaction instead of the per-row trigger; the
+        # trigger is dropped and put back inside this write transaction, so no
+        # other connection ever sees it missing
+        trigger = conn.execute(FTS_TRIGGER).fetchone()
+        if trigger is not None:
+            conn.execute('DROP TRIGGER books_fts_insert')
+        last_id = conn.execute('SELECT coalesce(max(id), 0) FROM books').fetchone()[0]
+
+        # Same text the sqlite3 datetime adapter would produce, formatted once
+        now = datetime.now().isoformat(' ')
+        in_transaction = 0
+        while in_transaction < transaction_rows and not counts['done']:
+            batch = []
+            for line_number, record in rows:
+                try:
+                    batch.append(validate(record, now))
+                except RowError as e:
+                    counts['rejected'] += 1
+                    if rejects is not None:
+                        rejects(line_number, str(e), None if isinstance(record, RowError) else record)
+                    continue
+                if len(batch) == batch_size:
+                    break
+            else:
+                counts['done'] = True
+            if batch:
+                conn.executemany(INSERT_BOOK, batch)
+                counts['imported'] += len(batch)
+                in_transaction += len(batch)
+            if progress is not None:
+                progress(counts['imported'], counts['rejected'])
+
+        if trigger is not None:
+            conn.execute(INDEX_NEW_BOOKS, (last_id,))
+            conn.execute(trigger[0])
+
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+    try:
+        while not counts['done']:
+            circulation.run_immediate(conn, load_transaction)
+    finally:
+        for pragma in RESTORE_PRAGMAS:
+            conn.execute(pragma)
+
+    return ImportResult(counts['imported'], counts['rejected'], time.monotonic() - started)
+
+
+def import_stream(conn, stream, fmt, **kwargs):
+    """import_books over a binary UTF-8 stream, e.g. a request body"""
+    if fmt not in PARSERS:
+        raise CatalogImportError('Send text/csv or application/x-ndjson, or pass ?format=csv|jsonl')
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        return import_books(conn, PARSERS[fmt](text), **kwargs)
+    finally:
+        text.detach()
+
+
+def format_for(content_type, filename=''):
+    """Import format from an explicit Content-Type or a file extension"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv') or filename.endswith('.csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/json-lines') \
+            or filename.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def main(argv=None):
+    from utils.db import ConnectionManager
+    from utils import schema
+
+    parser = argparse.ArgumentParser(description='Bulk-load books from CSV or JSON Lines')
+    parser.add_argument('path', help="input file, or '-' for stdin")
+    parser.add_argument('--format', choices=sorted(PARSERS), help='default: from the file extension')
+    parser.add_argument('--rejects', help='JSON Lines file for rejected rows (default: <path>.rejects.jsonl)')
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL', 'library.db'))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or format_for(None, args.path)
+    if fmt is None:
+        parser.error('cannot tell the format from the file name; pass --format')
+    rejects_path = args.rejects or ('rejects.jsonl' if args.path == '-' else f'{args.path}.rejects.jsonl')
+
+    conn = ConnectionManager(args.database, on_connect=schema.bootstrap).connect()
+    source = sys.stdin.buffer if args.path == '-' else open(args.path, 'rb')
+    last_report = [0.0]
+
+    def report(imported, rejected):
+        now = time.monotonic()
+        if now - last_report[0] >= 1:
+            last_report[0] = now
+            print(f'\r{imported:,} imported, {rejected:,} rejected', end='', file=sys.stderr, flush=True)
+
+    try:
+        with open(rejects_path, 'w') as reject_file:
+            def reject(line_number, error, record):
+                reject_file.write(json.dumps({'line': line_number, 'error': error, 'record': record}) + '\n')
+
+            result = import_stream(conn, source, fmt, rejects=reject, progress=report,
+                                   batch_size=args.batch_size)
+    except CatalogImportError as e:
+        print(e.message, file=sys.stderr)
+        return 1
+    finally:
+        source.close()
+        conn.close()
+
+    print(f'\r{result.imported:,} imported, {result.rejected:,} rejected in {result.seconds:.1f}s '
+          f'({result.imported / max(result.seconds, 1e-9):,.0f} rows/s)', file=sys.stderr)
+    if result.rejected:
+        print(f'Rejected rows written to {rejects_path}', file=sys.stderr)
+    else:
+        os.unlink(rejects_path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Borrow and return for the raw-sqlite services
+Each operation runs in one BEGIN IMMEDIATE transaction so two workers can
+never hand out the same last copy, and SQLITE_BUSY is retried with backoff.
+The batch variants run a whole desk checkout in one such transaction, with a
+savepoint per item so a rejected item leaves the others intact
+"""
+
+import random
+import sqlite3
+import time
+from datetime import datetime
+
+from utils import errors
+
+FINE_PER_DAY = 10  # $10 per day overdue
+MAX_BATCH = 50  # items per batch borrow/return
+
+
+class CirculationError(errors.ApiError):
+    """Borrow/return rejected"""
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def run_immediate(conn, work, attempts=6, base_delay=0.005):
+    """Run work(conn) inside BEGIN IMMEDIATE, retrying while the database is busy"""
+    if conn.in_transaction:
+        conn.rollback()
+
+    for attempt in range(attempts):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e) or attempt == attempts - 1:
+                raise
+            # Exponential backoff with jitter so waiting writers spread out
+            time.sleep(base_delay * (2 ** attempt) * (1 + random.random()))
+            continue
+
+        try:
+            result = work(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return result
+
+
+def _borrow(conn, book_id, user_id, issue_date, due_date):
+    # Take a copy only if one is left - the WHERE clause is the availability check
+    cursor = conn.execute('''
+        UPDATE books SET availableCopies = availableCopies - 1, updatedAt = ?
+        WHERE id = ? AND availableCopies > 0
+    ''', (issue_date, book_id))
+
+    if cursor.rowcount == 0:
+        if conn.execute("SELECT 1 FROM books WHERE id = ?", (book_id,)).fetchone() is None:
+            raise CirculationError('Book not found', 404)
+        raise CirculationError('Book not available', 400)
+
+    try:
+        cursor = conn.execute('''
+            INSERT INTO transactions (bookId, userId, type, issueDate, dueDate, status)
+            SELECT ?, ?, 'issue', ?, ?, 'active'
+            WHERE NOT EXISTS (
+                SELECT 1 FROM transactions
+                WHERE bookId = ? AND userId = ? AND status = 'active'
+            )
+        ''', (book_id, user_id, issue_date, due_date, book_id, user_id))
+    except sqlite3.IntegrityError:
+        cursor = None
+
+    if cursor is None or cursor.rowcount == 0:
+        raise CirculationError('User already has this book', 400)
+
+    return cursor.lastrowid
+
+
+def borrow_book(conn, book_id, user_id, due_date, issue_date=None):
+    """Issue one copy of a book; returns (transaction_id, issue_date)"""
+    issue_date = issue_date or datetime.now()
+    return run_immediate(conn, lambda conn: _borrow(conn, book_id, user_id, issue_date, due_date)), issue_date
+
+
+def _return(conn, transaction_id, user_id, return_date, is_admin):
+    transaction_row = conn.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,)).fetchone()
+
+    if not transaction_row:
+        raise CirculationError('Transaction not found', 404)
+
+    if transaction_row['status'] != 'active':
+        raise CirculationError('Book is not currently issued', 400)
+
+    # Only check the role when someone returns another user's loan
+    if str(transaction_row['userId']) != str(user_id):
+        admin = is_admin
+        if admin is None:
+            role_row = conn.execute("SELECT role FROM users WHERE id = ?", (user_id,)).fetchone()
+            admin = role_row is not None and role_row['role'] == 'admin'
+        if not admin:
+            raise CirculationError('You can only return your own books', 403)
+
+    due_date = datetime.fromisoformat(transaction_row['dueDate'])
+    if return_date > due_date:
+        fine = (return_date - due_date).days * FINE_PER_DAY
+    else:
+        fine = 0
+
+    now = datetime.now()
+    cursor = conn.execute('''
+        UPDATE transactions
+        SET returnDate = ?, status = 'returned', fine = ?, updatedAt = ?
+        WHERE id = ? AND status = 'active'
+    ''', (return_date, fine, now, transaction_id))
+
+    if cursor.rowcount == 0:
+        raise CirculationError('Book is not currently issued', 400)
+
+    conn.execute("UPDATE books SET availableCopies = availableCopies + 1, updatedAt = ? WHERE id = ?",
+                 (now, transaction_row['bookId']))
+
+    return transaction_row, fine
+
+
+def return_book(conn, transaction_id, user_id, return_date, is_admin=None):
+    """Close an active loan; returns (transaction_row, fine)
+
+    is_admin comes from the caller's token claims; None falls back to a role lookup
+    """
+    return run_immediate(conn, lambda conn: _return(conn, transaction_id, user_id, return_date, is_admin))
+
+
+def _each_in_savepoint(conn, items, work):
+    """[(item, result, None) or (item, None, CirculationError)] for work(conn, item) on every item"""
+    results = []
+    for item in items:
+        conn.execute('SAVEPOINT circulation_item')
+        try:
+            results.append((item, work(conn, item), None))
+        except CirculationError as e:
+            # Undo only this item's writes (a borrow may have taken the copy already)
+            conn.execute('ROLLBACK TO circulation_item')
+            results.append((item, None, e))
+        conn.execute('RELEASE circulation_item')
+    return results
+
+
+def check_batch(ids):
+    """Validate a batch body's id list; returns it as ints"""
+    if not isinstance(ids, list) or not ids:
+        raise CirculationError('Expected a non-empty list of ids', 400)
+    if len(ids) > MAX_BATCH:
+        raise CirculationError(f'At most {MAX_BATCH} items per batch', 400)
+    if not all(isinstance(item, int) and not isinstance(item, bool) for item in ids):
+        raise CirculationError('Ids must be integers', 400)
+    return ids
+
+
+def borrow_batch(conn, book_ids, user_id, due_date, issue_date=None):
+    """Issue one copy of each book in one transaction; returns (results, issue_date)
+    where results is [(book_id, transaction_id, None) or (book_id, None, CirculationError)]"""
+    issue_date = issue_date or datetime.now()
+    results = run_immediate(conn, lambda conn: _each_in_savepoint(
+        conn, book_ids, lambda conn, book_id: _borrow(conn, book_id, user_id, issue_date, due_date)))
+    return results, issue_date
+
+
+def return_batch(conn, transaction_ids, user_id, return_date, is_admin=None):
+    """Close each loan in one transaction; returns
+    [(transaction_id, (transaction_row, fine), None) or (transaction_id, None, CirculationError)]"""
+    return run_immediate(conn, lambda conn: _each_in_savepoint(
+        conn, transaction_ids, lambda conn, transaction_id: _return(conn, transaction_id, user_id,
+                                                                    return_date, is_admin)))
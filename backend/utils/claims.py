@@ -0,0 +1,114 @@
+"""
+Role and account status carried in JWT claims for the raw-sqlite services
+Tokens embed role, isActive and the user's authVersion, which a trigger bumps
+whenever role or isActive changes. Handlers authorize from the claims; a
+per-process snapshot of bumped versions, refreshed every REVOCATION_TTL
+seconds, rejects tokens issued before a demotion or block. Behind the gateway
+the claims arrive in its signed identity header and the JWT isn't decoded again
+"""
+
+import threading
+import time
+
+from flask import current_app, request
+from flask_jwt_extended import decode_token, get_jwt, get_jwt_identity, verify_jwt_in_request
+
+from utils import errors, identity
+
+REVOCATION_TTL = 30  # seconds a demoted or blocked user's old token may keep working
+
+
+class ClaimsError(errors.ApiError):
+    """Token missing, revoked or lacking a role"""
+
+    status_code = 401
+
+
+def token_claims(user_row):
+    """additional_claims for create_access_token from a users row"""
+    return {
+        'role': user_row['role'],
+        'isActive': bool(user_row['isActive']),
+        'authVersion': user_row['authVersion'],
+    }
+
+
+class Revocations:
+    """Snapshot of users whose authVersion moved past 0, shared by every request in the process"""
+
+    def __init__(self, db_pool, ttl=REVOCATION_TTL):
+        self.db_pool = db_pool
+        self.ttl = ttl
+        self._versions = {}
+        self._loaded_at = None
+        self._database = None
+        self._lock = threading.Lock()
+
+    def expire(self):
+        """Reload on the next check - called after this process changes a role or status"""
+        with self._lock:
+            self._loaded_at = None
+
+    def auth_version(self, user_id):
+        database = self.db_pool.database
+        with self._lock:
+            stale = (self._loaded_at is None or self._database != database
+                     or time.monotonic() - self._loaded_at > self.ttl)
+        if stale:
+            rows = self.db_pool.get_db().execute(
+                'SELECT id, authVersion FROM users WHERE authVersion > 0'
+            ).fetchall()
+            with self._lock:
+                self._versions = {row['id']: row['authVersion'] for row in rows}
+                self._loaded_at = time.monotonic()
+                self._database = database
+        return self._versions.get(int(user_id), 0)
+
+
+def current_claims(revocations):
+    """Verify the request's JWT, or the gateway's identity header when it comes
+    from the trusted network; returns (user_id, claims) or raises ClaimsError"""
+    forwarded = request.headers.get(identity.IDENTITY_HEADER)
+    verified = identity.verify(forwarded) if forwarded and identity.is_trusted(request.remote_addr) else None
+    if verified:
+        user_id, claims = verified
+    else:
+        # Unsigned, expired or from outside: fall back to the caller's own token
+        verify_jwt_in_request()
+        user_id = get_jwt_identity()
+        claims = get_jwt()
+    return _checked(user_id, claims, revocations)
+
+
+def bearer_claims(authorization, revocations):
+    """(user_id, claims) for an Authorization header outside a Flask request
+    (the asyncio gateway); needs an app context, raises like current_claims"""
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme != 'Bearer' or not token:
+        raise ClaimsError('Authentication required')
+    claims = decode_token(token)
+    return _checked(claims[current_app.config['JWT_IDENTITY_CLAIM']], claims, revocations)
+
+
+def _checked(user_id, claims, revocations):
+    if 'role' not in claims:
+        raise ClaimsError('Token is out of date, please log in again')
+    if claims.get('authVersion', 0) != revocations.auth_version(user_id):
+        raise ClaimsError('Token has been revoked, please log in again')
+    if not claims.get('isActive', True):
+        raise ClaimsError('Account is inactive', 403)
+    return user_id, claims
+
+
+def is_admin(claims):
+    return claims.get('role') == 'admin'
+
+
+def is_admin_request(revocations):
+    """Whether the request carries valid admin claims, for endpoints that are
+    public but have admin-only options; never raises"""
+    try:
+        _, claims = current_claims(revocations)
+    except Exception:
+        return False
+    return is_admin(claims)
@@ -0,0 +1,119 @@
+"""
+SQLite connection manager for the raw-sqlite services
+Keeps a small pool of configured connections per database file so requests
+reuse an open connection instead of reconnecting on every call
+"""
+
+import sqlite3
+import threading
+from queue import LifoQueue, Empty, Full
+from flask import g
+
+# Applied once when a connection is opened, not on every request
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+)
+
+
+class ConnectionManager:
+    """Pool of reusable SQLite connections checked out per app context"""
+
+    def __init__(self, database, app=None, pool_size=8, cached_statements=256, timeout=5.0, on_connect=None):
+        # `database` may be a path or a callable returning the current path,
+        # so modules that reassign their DATABASE global (the tests do) still work
+        self._database = database
+        self.on_connect = on_connect
+        self.pool_size = pool_size
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._g_key = f'_sqlite_conn_{id(self)}'
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Return checked-out connections to the pool when the app context ends"""
+        app.teardown_appcontext(self.teardown)
+
+    @property
+    def database(self):
+        return self._database() if callable(self._database) else self._database
+
+    def connect(self, database=None):
+        """Open a new configured connection that is not pooled (scripts, bootstrap)"""
+        conn = sqlite3.connect(database or self.database,
+                               timeout=self.timeout,
+                               cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def _pool(self, database):
+        with self._lock:
+            pool = self._pools.get(database)
+            if pool is None:
+                pool = self._pools[database] = LifoQueue(maxsize=self.pool_size)
+            return pool
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if none are idle"""
+        database = self.database
+        try:
+            conn = self._pool(database).get_nowait()
+        except Empty:
+            conn = self.connect(database)
+        return database, conn
+
+    def release(self, database, conn):
+        """Reset a connection and put it back in the pool"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+
+        try:
+            self._pool(database).put_nowait(conn)
+        except Full:
+            conn.close()
+
+    def get_db(self):
+        """Connection bound to the current app context"""
+        entry = g.get(self._g_key)
+        if entry is None:
+            entry = self.acquire()
+            setattr(g, self._g_key, entry)
+        return entry[1]
+
+    def detach(self):
+        """Take the current app context's connection away from teardown, for a
+        response body generated after the context ends; the caller must
+        release() it. Returns (database, conn), or None if there was none"""
+        return g.pop(self._g_key, None)
+
+    def teardown(self, exception=None):
+        entry = g.pop(self._g_key, None)
+        if entry is not None:
+            self.release(*entry)
+
+    def close_all(self):
+        """Close every idle pooled connection"""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except Empty:
+                    break
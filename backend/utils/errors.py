@@ -0,0 +1,29 @@
+"""
+Base class for errors a request can't recover from. Each carries the message
+and HTTP status (plus any response headers) its JSON reply needs; apps register
+handle_api_error once instead of catching every subclass in each route
+"""
+
+from flask import jsonify
+
+
+class ApiError(Exception):
+    """Request rejected; carries the HTTP status for the handler"""
+
+    status_code = 400
+    headers = None
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.message = message
+        if status_code is not None:
+            self.status_code = status_code
+
+
+def handle_api_error(error):
+    return jsonify({'error': error.message}), error.status_code, error.headers or {}
+
+
+def register(app):
+    """Reply to any ApiError raised in app (a Flask app or blueprint) with its message and status"""
+    app.register_error_handler(ApiError, handle_api_error)
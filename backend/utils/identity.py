@@ -0,0 +1,76 @@
+"""
+Gateway-signed identity header for calls between the gateway and services
+The gateway verifies the caller's JWT once and forwards the result as a
+compact HMAC-signed header: user id, role, isActive, authVersion and an
+expiry. Services on a trusted network accept it in place of the JWT, so
+they skip token decoding; the claims checks that follow are unchanged.
+The header is off unless INTERNAL_IDENTITY_SECRET is set, and only loopback
+callers are trusted unless INTERNAL_TRUSTED_NETWORKS widens that
+"""
+
+import base64
+import hashlib
+import hmac
+import ipaddress
+import os
+import time
+
+IDENTITY_HEADER = 'X-Internal-Identity'
+SECRET = os.environ.get('INTERNAL_IDENTITY_SECRET')  # unset: never sign, never accept
+TTL = int(os.environ.get('INTERNAL_IDENTITY_TTL', 60))  # only has to outlive the hop to the service
+TRUSTED_NETWORKS = tuple(ipaddress.ip_network(net.strip()) for net in os.environ.get(
+    'INTERNAL_TRUSTED_NETWORKS', '127.0.0.0/8,::1/128').split(','))
+
+
+def _signature(payload, secret):
+    digest = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def enabled(secret=None):
+    return bool(secret or SECRET)
+
+
+def headers(user_id, claims):
+    """{IDENTITY_HEADER: signed value} to forward, or {} while no secret is configured"""
+    return {IDENTITY_HEADER: sign(user_id, claims)} if enabled() else {}
+
+
+def sign(user_id, claims, ttl=TTL, secret=None, now=None):
+    """Header value for a verified caller; never outlives the JWT it came from"""
+    secret = secret or SECRET
+    if not secret:
+        raise RuntimeError('INTERNAL_IDENTITY_SECRET is not set')
+    now = int(time.time() if now is None else now)
+    expires = min(now + ttl, claims.get('exp', now + ttl))
+    payload = '{}:{}:{}:{}:{}'.format(user_id, claims['role'], int(bool(claims.get('isActive', True))),
+                                      claims.get('authVersion', 0), expires)
+    return f'{payload}:{_signature(payload, secret)}'
+
+
+def verify(value, secret=None, now=None):
+    """(user_id, claims) from a header made by sign(), or None if forged, malformed,
+    expired or no secret is configured"""
+    secret = secret or SECRET
+    if not secret:
+        return None
+    payload, _, signature = value.rpartition(':')
+    if not payload or not hmac.compare_digest(signature, _signature(payload, secret)):
+        return None
+    try:
+        user_id, role, is_active, auth_version, expires = payload.split(':')
+        auth_version, expires = int(auth_version), int(expires)
+    except ValueError:
+        return None
+    if expires <= (time.time() if now is None else now):
+        return None
+    return user_id, {'role': role, 'isActive': is_active == '1', 'authVersion': auth_version, 'exp': expires}
+
+
+def is_trusted(remote_addr, networks=TRUSTED_NETWORKS):
+    """Only callers inside the service network may present the header"""
+    try:
+        address = ipaddress.ip_address(remote_addr)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
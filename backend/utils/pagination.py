@@ -0,0 +1,200 @@
+"""
+Keyset pagination for the raw-sqlite listing endpoints
+Pages are ordered by (createdAt, id) descending and continued with an opaque
+cursor holding the last row's key, so every page is one index range read.
+Internal consumers may ask for limit=all instead; that list is streamed as a
+JSON array straight off the sqlite cursor rather than built up in memory.
+Rows can arrive already rendered to JSON by SQLite, in which case their text
+goes into the body untouched
+"""
+
+import base64
+import binascii
+import json
+
+from flask import current_app, jsonify
+
+from utils import errors
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+UNBOUNDED = 'all'
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class PaginationError(errors.ApiError):
+    """Bad cursor or limit"""
+
+
+def encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(createdAt, id) from a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+    if not isinstance(row_id, int) or not isinstance(created_at, (str, int, float, type(None))):
+        raise PaginationError('Invalid cursor')
+    return created_at, row_id
+
+
+class Page:
+    """One page request: `after` is the (createdAt, id) key to continue below;
+    a limit of None is an unbounded listing"""
+
+    def __init__(self, limit=DEFAULT_LIMIT, after=None, explicit=False):
+        self.limit = limit
+        self.after = after
+        # Clients that ask for a cursor/limit get the {items, next} envelope;
+        # older clients keep getting a bare (bounded) array
+        self.explicit = explicit
+
+    @property
+    def fetch(self):
+        """Rows to select - one extra tells us whether another page exists
+        (-1, no limit at all to SQLite, when unbounded)"""
+        return -1 if self.limit is None else self.limit + 1
+
+    def split(self, rows):
+        """Trim the look-ahead row; returns (rows, next_cursor)"""
+        if self.limit is None or len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        last = rows[-1]
+        return rows, encode_cursor(last['createdAt'], last['id'])
+
+    def response(self, items, next_cursor):
+        if self.explicit:
+            response = jsonify({'items': items, 'next': next_cursor})
+        else:
+            response = jsonify(items)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    def respond(self, cursor, db_pool, render=None):
+        """Response for an executed cursor. With render, each row is turned into
+        a dict and serialized here; without, each row's `json` column already
+        holds the item's JSON text (see the *_json views) and is sent verbatim.
+        Unbounded listings stream from the cursor; the response takes the
+        request's connection from db_pool and hands it back when it's closed,
+        whether or not the body was ever read"""
+        if self.limit is None:
+            if render is None:
+                items, encode = (row['json'] for row in cursor), str
+            else:
+                items, encode = (render(row) for row in cursor), _encoder()
+            opening, closing = self._envelope(None)
+            response = current_app.response_class(stream_array(items, encode, opening, closing),
+                                                  mimetype='application/json')
+            entry = db_pool.detach()
+            if entry is not None:
+                response.call_on_close(lambda: db_pool.release(*entry))
+            return response
+
+        rows, next_cursor = self.split(cursor.fetchall())
+        if render is not None:
+            return self.response([render(row) for row in rows], next_cursor)
+
+        opening, closing = self._envelope(next_cursor)
+        body = b''.join((opening, ','.join([row['json'] for row in rows]).encode(), closing))
+        response = current_app.response_class(body, mimetype='application/json')
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    def _envelope(self, next_cursor):
+        """Bytes around the items, laid out as response() would write them"""
+        if self.explicit:
+            return b'{"items":[', b'],"next":' + json.dumps(next_cursor).encode() + b'}\n'
+        return b'[', b']\n'
+
+
+def _encoder():
+    """Encoder producing what jsonify would for one item, under the app's JSON settings"""
+    provider = current_app.json
+    return json.JSONEncoder(default=provider.default, ensure_ascii=provider.ensure_ascii,
+                            sort_keys=provider.sort_keys, separators=(',', ':')).encode
+
+
+def stream_array(items, encode, opening=b'[', closing=b']\n', chunk_bytes=STREAM_CHUNK_BYTES):
+    """Yield a JSON array of items in chunks of about chunk_bytes; only one
+    chunk is held at a time"""
+    parts, size, separator = [opening], len(opening), b''
+    for item in items:
+        encoded = separator + encode(item).encode()
+        parts.append(encoded)
+        size += len(encoded)
+        separator = b','
+        if size >= chunk_bytes:
+            yield b''.join(parts)
+            parts, size = [], 0
+    parts.append(closing)
+    yield b''.join(parts)
+
+
+class RankedPage(Page):
+    """Page of a relevance-ordered result set, which has no row key to continue from
+
+    Ranking has to score every match before the first row comes back anyway,
+    so the cursor carries the offset of the next page instead.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, offset=0):
+        super().__init__(limit, explicit=True)
+        self.offset = offset
+
+    def split(self, rows):
+        if len(rows) <= self.limit:
+            return rows, None
+        return rows[:self.limit], encode_cursor(None, self.offset + self.limit)
+
+
+def _limit(args, default, allow_unbounded=False):
+    limit = args.get('limit')
+    if limit is None:
+        return default
+    if limit == UNBOUNDED:
+        # allow_unbounded may be a callable, so only limit=all requests pay for the check
+        if not (allow_unbounded() if callable(allow_unbounded) else allow_unbounded):
+            raise PaginationError('limit=all is only available to admins', 403)
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, MAX_LIMIT)
+
+
+def from_request(args, allow_unbounded=False):
+    """Page for the `cursor` and `limit` query parameters"""
+    limit = _limit(args, DEFAULT_LIMIT, allow_unbounded)
+
+    token = args.get('cursor')
+    after = decode_cursor(token) if token else None
+    if after is not None and after[0] is None:
+        raise PaginationError('Invalid cursor')
+
+    return Page(limit, after, explicit='cursor' in args or 'limit' in args)
+
+
+def ranked_from_request(args, default_limit=20):
+    """RankedPage for the `cursor` and `limit` query parameters"""
+    limit = _limit(args, default_limit)
+
+    token = args.get('cursor')
+    offset = 0
+    if token:
+        marker, offset = decode_cursor(token)
+        if marker is not None or offset < 0:
+            raise PaginationError('Invalid cursor')
+
+    return RankedPage(limit, offset)
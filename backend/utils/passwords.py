@@ -0,0 +1,115 @@
+"""
+Password hashing off the request threads
+PBKDF2 hashing and verification run in a small process pool so a login wave
+does not hold the GIL against every other request. Callers beyond the
+in-flight limit get HashingBusy (a fast 503) instead of queueing, and hashes
+made with older cost parameters are upgraded on the next successful login
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from utils import errors
+
+# Full werkzeug method string - stored hashes with any other prefix are rehashed on login
+PASSWORD_METHOD = os.environ.get('PASSWORD_METHOD', 'pbkdf2:sha256:600000')
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', HASH_WORKERS * 8))
+HASH_TIMEOUT = 10.0
+
+
+class HashingBusy(errors.ApiError):
+    """Too many hashes in flight; the client should retry shortly"""
+
+    status_code = 503
+    headers = {'Retry-After': '1'}
+
+    def __init__(self, message='Server is busy, please retry', status_code=None):
+        super().__init__(message, status_code)
+
+
+def needs_rehash(password_hash, method=PASSWORD_METHOD):
+    return password_hash.split('$', 1)[0] != method
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password, method):
+    """(valid, upgraded_hash) - the upgrade is computed in the same worker round trip"""
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if needs_rehash(password_hash, method):
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+class PasswordHasher:
+    """Bounded process pool for password hashing; workers=0 hashes inline and
+    max_pending<=0 puts no limit on hashes in flight"""
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=MAX_PENDING, method=PASSWORD_METHOD, timeout=HASH_TIMEOUT):
+        self.workers = workers
+        self.method = method
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending > 0 else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created on first use so forked server workers each start their own
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        if self.workers == 0:
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+
+        try:
+            future = self._pool().submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self.shutdown()
+            raise HashingBusy()
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the worker is done, not just until we stop
+        # waiting, so max_pending bounds the hashes the pool is really running
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingBusy()
+        except BrokenProcessPool:
+            self.shutdown()
+            raise HashingBusy()
+
+    def _release(self, future=None):
+        if self._slots is not None:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """(valid, upgraded_hash or None) for a login attempt"""
+        return self._run(_verify, password_hash, password, self.method)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,104 @@
+"""
+Route table for the API gateway's proxied endpoints
+Shared by the Flask gateway and the asyncio gateway so both serve the same
+/api/* surface; routes the gateway answers itself (login, signup, stats)
+are not listed here
+"""
+
+import re
+from collections import namedtuple
+
+from werkzeug.http import HTTP_STATUS_CODES
+
+# method, gateway rule (Flask syntax), upstream service, upstream path template, endpoint name
+ProxyRoute = namedtuple('ProxyRoute', 'method rule upstream target endpoint')
+
+PROXY_ROUTES = (
+    ProxyRoute('GET', '/api/books', 'book-service', '/books', 'get_books'),
+    ProxyRoute('GET', '/api/books/search', 'book-service', '/books/search', 'search_books'),
+    ProxyRoute('GET', '/api/books/cache-stats', 'book-service', '/books/cache-stats', 'get_catalog_cache_stats'),
+    ProxyRoute('GET', '/api/books/<int:book_id>', 'book-service', '/books/{book_id}', 'get_book'),
+    ProxyRoute('POST', '/api/books', 'book-service', '/books', 'create_book'),
+    ProxyRoute('POST', '/api/books/import', 'book-service', '/books/import', 'import_books'),
+    ProxyRoute('PUT', '/api/books/<int:book_id>', 'book-service', '/books/{book_id}', 'update_book'),
+    ProxyRoute('DELETE', '/api/books/<int:book_id>', 'book-service', '/books/{book_id}', 'delete_book'),
+    ProxyRoute('POST', '/api/borrow/batch', 'transaction-service', '/borrow/batch', 'borrow_batch'),
+    ProxyRoute('POST', '/api/return/batch', 'transaction-service', '/return/batch', 'return_batch'),
+    ProxyRoute('POST', '/api/borrow/<int:book_id>', 'transaction-service', '/borrow/{book_id}', 'borrow_book'),
+    ProxyRoute('POST', '/api/return/<int:transaction_id>', 'transaction-service', '/return/{transaction_id}', 'return_book'),
+    ProxyRoute('GET', '/api/transactions', 'transaction-service', '/transactions', 'get_transactions'),
+    ProxyRoute('GET', '/api/transactions/export', 'transaction-service', '/transactions/export', 'export_transactions'),
+    ProxyRoute('GET', '/api/members', 'member-service', '/members', 'get_members'),
+    ProxyRoute('PUT', '/api/members/<int:user_id>', 'member-service', '/members/{user_id}', 'update_member'),
+)
+
+# Sections of GET /api/dashboard, fetched concurrently: name, upstream service, path.
+# Each is a one-row aggregate, so the totals hold however large the tables grow
+DASHBOARD_SECTIONS = (
+    ('books', 'book-service', '/books/summary'),
+    ('members', 'member-service', '/members/summary'),
+    ('transactions', 'transaction-service', '/transactions/summary'),
+)
+
+# Public reads the gateway caches: endpoint -> (fresh seconds, stale-while-revalidate seconds)
+CACHE_TTLS = {
+    'get_books': (10, 60),
+    'search_books': (10, 60),
+    'get_book': (30, 120),
+}
+
+# Mutations that change cached reads. List and search entries are always
+# purged, plus the book named by this path parameter; '*' purges every book
+# (a return only names the transaction)
+PURGES = {
+    'create_book': None,
+    'import_books': None,
+    'update_book': 'book_id',
+    'delete_book': 'book_id',
+    'borrow_book': 'book_id',
+    'return_book': '*',
+    'borrow_batch': '*',
+    'return_batch': '*',
+}
+
+# Uploads streamed to the service as they arrive instead of buffered in the
+# gateway: endpoint -> upstream read timeout in seconds
+STREAMED_UPLOADS = {
+    'import_books': 900,
+}
+
+# Downloads the asyncio gateway relays chunk by chunk instead of reading whole
+# (the Flask gateway streams every proxied body already)
+STREAMED_DOWNLOADS = {'export_transactions'}
+
+# Headers passed through in each direction; the body itself is never parsed,
+# so Content-Length and Content-Encoding stay valid end to end
+FORWARD_REQUEST_HEADERS = ('Authorization', 'Content-Type', 'Accept-Encoding', 'If-None-Match')
+FORWARD_RESPONSE_HEADERS = ('Content-Type', 'Content-Length', 'Content-Encoding', 'ETag',
+                            'Cache-Control', 'Retry-After', 'X-Cache', 'X-Next-Cursor', 'Content-Disposition')
+
+# Streamed pass-through chunk size
+CHUNK_SIZE = 64 * 1024
+
+UNAVAILABLE = {
+    'book-service': 'Book service unavailable',
+    'member-service': 'Member service unavailable',
+    'transaction-service': 'Transaction service unavailable',
+}
+
+def needs_error_envelope(status, content_type):
+    """Upstream errors that aren't already a JSON {'error': ...} body (HTML
+    404/500 pages, empty 502s) get rewritten; everything else is passed through"""
+    return status >= 400 and not (content_type or '').startswith('application/json')
+
+
+def error_envelope(status):
+    return {'error': HTTP_STATUS_CODES.get(status, 'Upstream error')}
+
+
+_CONVERTER = re.compile(r'<(?:(\w+):)?(\w+)>')
+
+
+def starlette_path(rule):
+    """'/api/books/<int:book_id>' -> '/api/books/{book_id:int}'"""
+    return _CONVERTER.sub(lambda m: '{%s:%s}' % (m.group(2), m.group(1)) if m.group(1) else '{%s}' % m.group(2), rule)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Query-plan advisor for the raw-sqlite modules
+Collects every SQL string passed to execute()/executemany() (plus module-level
+*_SQL constants), runs EXPLAIN QUERY PLAN against a freshly bootstrapped schema
+and reports full table scans and temporary sort b-trees
+
+Usage: python -m utils.query_advisor [paths...]
+"""
+
+import ast
+import os
+import re
+import sqlite3
+import sys
+
+from utils import schema
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = (
+    'app.py',
+    'corrected_app.py',
+    'book_service.py',
+    'member_service.py',
+    'transaction_service.py',
+    'legacy_routes.py',
+    'gateway.py',
+    'utils',
+)
+
+PLANNED_STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW|sqlite_)\S+$')
+
+
+def _python_files(paths):
+    for path in paths:
+        path = os.path.join(BACKEND_DIR, path)
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith('.py'):
+                    yield os.path.join(path, name)
+        elif path.endswith('.py'):
+            yield path
+
+
+def collect_queries(paths=DEFAULT_PATHS):
+    """Yield (location, sql) for every literal SQL string in the given modules"""
+    for filename in _python_files(paths):
+        with open(filename, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename)
+        relative = os.path.relpath(filename, BACKEND_DIR)
+
+        for node in ast.walk(tree):
+            sql = None
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ('execute', 'executemany') and node.args
+                    and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+                sql = node.args[0].value
+            elif (isinstance(node, ast.Assign) and len(node.targets) == 1
+                    and isinstance(node.targets[0], ast.Name) and node.targets[0].id.endswith('_SQL')
+                    and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+                sql = node.value.value
+
+            if sql and sql.strip().upper().startswith(PLANNED_STATEMENTS):
+                yield f'{relative}:{node.lineno}', ' '.join(sql.split())
+
+
+def explain(conn, sql):
+    """Plan detail lines for one statement, with NULL bound to every placeholder"""
+    bindings = (None,) * sql.count('?')
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', bindings)]
+
+
+def plan_issues(plan):
+    """Full table scans and temp b-trees in a query plan"""
+    return [detail for detail in plan if FULL_SCAN.match(detail) or 'TEMP B-TREE' in detail]
+
+
+def advise(paths=DEFAULT_PATHS, conn=None):
+    """List of (location, sql, issues) for every statement with a problem plan"""
+    if conn is None:
+        conn = sqlite3.connect(':memory:')
+        schema.bootstrap(conn)
+
+    report = []
+    seen = set()
+    for location, sql in collect_queries(paths):
+        if sql in seen:
+            continue
+        seen.add(sql)
+        try:
+            issues = plan_issues(explain(conn, sql))
+        except sqlite3.Error as e:
+            issues = [f'could not plan: {e}']
+        if issues:
+            report.append((location, sql, issues))
+    return report
+
+
+def main(argv=None):
+    paths = (argv if argv is not None else sys.argv[1:]) or DEFAULT_PATHS
+    report = advise(paths)
+
+    for location, sql, issues in report:
+        print(f'{location}: {sql}')
+        for issue in issues:
+            print(f'    -> {issue}')
+
+    if report:
+        print(f'\n❌ {len(report)} statement(s) need an index')
+        return 1
+    print('✅ No full scans or temp b-trees found')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Gateway cache of proxied public GET responses
+Entries hold the upstream body bytes and pass-through headers for a fixed
+TTL, then keep being served for a stale-while-revalidate window while one
+background request refreshes them. Mutations proxied by the same gateway
+purge the entries they affect; anything else is bounded by the TTL
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_BYTES = int(os.environ.get('GATEWAY_CACHE_MAX_BYTES', 32 * 2**20))
+MAX_ENTRIES = int(os.environ.get('GATEWAY_CACHE_MAX_ENTRIES', 4096))
+
+# key is (endpoint, book_id, query string, accept-encoding)
+CachedResponse = namedtuple('CachedResponse', 'headers body fresh_until stale_until')
+
+
+class ResponseCache:
+    """LRU of upstream 200 responses, bounded by total body bytes and entry count"""
+
+    def __init__(self, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES, refresh_workers=2):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._size = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.refresh_workers = refresh_workers
+        # Bumped by every purge so a fetch that started before it can't store old data
+        self.epoch = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.purges = 0
+        self.evictions = 0
+
+    def lookup(self, key, now=None):
+        """Return (entry, state): state is HIT, STALE (past its TTL but inside
+        the revalidate window) or MISS, in which case entry is None"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry.stale_until:
+                self.misses += 1
+                return None, 'MISS'
+            self._entries.move_to_end(key)
+            if now < entry.fresh_until:
+                self.hits += 1
+                return entry, 'HIT'
+            self.stale_hits += 1
+            return entry, 'STALE'
+
+    def claim_refresh(self, key):
+        """True for exactly one caller per stale entry; that caller refreshes it"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def store(self, key, epoch, headers, body, ttl, stale_ttl, now=None):
+        """Cache a 200 response fetched when self.epoch was `epoch`"""
+        now = time.monotonic() if now is None else now
+        entry = CachedResponse(headers, body, now + ttl, now + ttl + stale_ttl)
+        with self._lock:
+            if epoch != self.epoch or len(body) > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+                self.evictions += 1
+
+    def finish_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+            self.refreshes += 1
+
+    def refresh_in_background(self, key, fetch, ttl, stale_ttl):
+        """Run fetch() -> (status, headers, body) on a worker thread and store a 200"""
+        epoch = self.epoch
+
+        def refresh():
+            try:
+                status, headers, body = fetch()
+                if status == 200:
+                    self.store(key, epoch, headers, body, ttl, stale_ttl)
+            except Exception:
+                pass  # keep serving the stale copy until it expires
+            finally:
+                self.finish_refresh(key)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                    thread_name_prefix='gateway-cache-refresh')
+        self._executor.submit(refresh)
+
+    def purge(self, book_id=None, all_books=False):
+        """Drop every list/search entry plus the entry for book_id (every
+        per-book entry too if all_books)"""
+        with self._lock:
+            self.epoch += 1
+            self.purges += 1
+            for key in [key for key in self._entries
+                        if key[1] is None or all_books or key[1] == book_id]:
+                self._size -= len(self._entries.pop(key).body)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'hits': self.hits,
+                'staleHits': self.stale_hits,
+                'misses': self.misses,
+                'hitRate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                'refreshes': self.refreshes,
+                'purges': self.purges,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'maxBytes': self.max_bytes,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
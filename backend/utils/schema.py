@@ -0,0 +1,252 @@
+"""
+Schema bootstrap for the raw-sqlite library database
+Tables are created idempotently; secondary indexes are versioned through
+PRAGMA user_version so existing databases pick them up on first connect
+"""
+
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        firstName TEXT NOT NULL,
+        lastName TEXT NOT NULL,
+        role TEXT NOT NULL DEFAULT 'member',
+        isActive BOOLEAN DEFAULT 1,
+        createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT NOT NULL,
+        isbn TEXT,
+        category TEXT NOT NULL,
+        publishedYear INTEGER,
+        description TEXT,
+        totalCopies INTEGER NOT NULL,
+        availableCopies INTEGER NOT NULL,
+        imageUrl TEXT,
+        createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        bookId INTEGER NOT NULL,
+        userId INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        issueDate TIMESTAMP NOT NULL,
+        dueDate TIMESTAMP NOT NULL,
+        returnDate TIMESTAMP,
+        status TEXT NOT NULL,
+        fine REAL DEFAULT 0,
+        createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (bookId) REFERENCES books (id),
+        FOREIGN KEY (userId) REFERENCES users (id)
+    )
+    ''',
+)
+
+# Each entry is one schema version; append new steps, never edit shipped ones
+MIGRATIONS = (
+    # 1: indexes behind the listing, loan lookup and member queries
+    (
+        'CREATE INDEX IF NOT EXISTS idx_books_created ON books (createdAt, id)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions (createdAt, id)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (userId, createdAt)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_user_status ON transactions (userId, status)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_book_status ON transactions (bookId, status)',
+        'CREATE INDEX IF NOT EXISTS idx_users_role_created ON users (role, createdAt)',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_transactions_active_loan
+        ON transactions (bookId, userId) WHERE status = 'active'
+        ''',
+    ),
+    # 2: full-text catalog search, kept in sync with books by triggers
+    (
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5 (
+            title, author, isbn, description,
+            content = 'books', content_rowid = 'id',
+            prefix = '2 3', tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        # Title matches outrank author, isbn and description matches
+        "INSERT INTO books_fts (books_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 1.0)')",
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author, isbn, description)
+            VALUES (new.id, new.title, new.author, new.isbn, new.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, isbn, description)
+            VALUES ('delete', old.id, old.title, old.author, old.isbn, old.description);
+        END
+        ''',
+        # Only the indexed columns - borrow/return updates to copies skip the index
+        '''
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author, isbn, description ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, isbn, description)
+            VALUES ('delete', old.id, old.title, old.author, old.isbn, old.description);
+            INSERT INTO books_fts (rowid, title, author, isbn, description)
+            VALUES (new.id, new.title, new.author, new.isbn, new.description);
+        END
+        ''',
+        "INSERT INTO books_fts (books_fts) VALUES ('rebuild')",
+    ),
+    # 3: catalog version stamp, bumped on every books write, for the catalog cache
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        ''',
+        'INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS catalog_version_insert AFTER INSERT ON books BEGIN
+            UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS catalog_version_update AFTER UPDATE ON books BEGIN
+            UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS catalog_version_delete AFTER DELETE ON books BEGIN
+            UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+        END
+        ''',
+    ),
+    # 4: per-user auth version carried in JWT claims; a role or status change revokes old tokens
+    (
+        'ALTER TABLE users ADD COLUMN authVersion INTEGER NOT NULL DEFAULT 0',
+        '''
+        CREATE TRIGGER IF NOT EXISTS users_auth_version AFTER UPDATE OF role, isActive ON users
+        WHEN old.role IS NOT new.role OR old.isActive IS NOT new.isActive BEGIN
+            UPDATE users SET authVersion = authVersion + 1 WHERE id = new.id;
+        END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_users_auth_version ON users (authVersion) WHERE authVersion > 0',
+    ),
+    # 5: list rows rendered to their API JSON by SQLite (keys sorted, as jsonify writes them);
+    # the listing queries select from these and the views flatten into them, indexes and all
+    (
+        '''
+        CREATE VIEW IF NOT EXISTS books_json AS
+        SELECT id, createdAt, json_object(
+            'author', author,
+            'availableCopies', availableCopies,
+            'category', category,
+            'createdAt', createdAt,
+            'description', coalesce(description, ''),
+            'id', CAST(id AS TEXT),
+            'imageUrl', imageUrl,
+            'isbn', coalesce(isbn, ''),
+            'publishedYear', publishedYear,
+            'title', title,
+            'totalCopies', totalCopies,
+            'updatedAt', updatedAt
+        ) AS json
+        FROM books
+        ''',
+        '''
+        CREATE VIEW IF NOT EXISTS members_json AS
+        SELECT id, role, createdAt, json_object(
+            'createdAt', createdAt,
+            'email', email,
+            'firstName', firstName,
+            'id', id,
+            'isActive', json(CASE WHEN isActive THEN 'true' ELSE 'false' END),
+            'lastName', lastName,
+            'password', '',
+            'role', role
+        ) AS json
+        FROM users
+        ''',
+        '''
+        CREATE VIEW IF NOT EXISTS transactions_json AS
+        SELECT t.id, t.userId, t.createdAt, json_object(
+            'book', json_object('author', b.author, 'isbn', coalesce(b.isbn, ''), 'title', b.title),
+            'bookId', CAST(t.bookId AS TEXT),
+            'createdAt', t.createdAt,
+            'dueDate', t.dueDate,
+            'fine', CASE WHEN t.fine THEN t.fine ELSE 0 END,
+            'id', CAST(t.id AS TEXT),
+            'issueDate', t.issueDate,
+            'returnDate', t.returnDate,
+            'status', t.status,
+            'type', t.type,
+            'updatedAt', t.updatedAt,
+            'user', json_object('email', u.email, 'firstName', u.firstName, 'lastName', u.lastName),
+            'userId', CAST(t.userId AS TEXT)
+        ) AS json
+        FROM transactions t
+        JOIN users u ON t.userId = u.id
+        JOIN books b ON t.bookId = b.id
+        ''',
+    ),
+    # 6: dashboard summaries add up available copies from an index instead of the books table
+    (
+        'CREATE INDEX IF NOT EXISTS idx_books_available ON books (availableCopies)',
+    ),
+)
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _has_tables(conn):
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('users', 'books', 'transactions')"
+    ).fetchall()
+    return len(rows) == 3
+
+
+def upgrade(conn):
+    """Apply pending migrations; no-op on an up-to-date or not yet created database"""
+    if get_version(conn) >= SCHEMA_VERSION or not _has_tables(conn):
+        return
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Another worker may have upgraded while we waited for the lock
+        version = get_version(conn)
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                try:
+                    conn.execute(statement)
+                except sqlite3.IntegrityError as e:
+                    # Existing duplicate active loans; the borrow path still refuses new ones
+                    logger.warning(f"Schema v{number}: skipped index ({e})")
+            conn.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def bootstrap(conn):
+    """Create the tables and bring the index set up to date"""
+    for statement in TABLES:
+        conn.execute(statement)
+    conn.commit()
+    upgrade(conn)
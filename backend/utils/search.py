@@ -0,0 +1,33 @@
+"""
+Full-text catalog search over the books_fts index
+User input is turned into an FTS5 query of quoted terms (the last one a
+prefix, for search-as-you-type) so operators in the text are never parsed
+"""
+
+import re
+
+MAX_TERMS = 8
+
+_TERM = re.compile(r'\w[\w\'-]*', re.UNICODE)
+
+
+def match_query(text):
+    """FTS5 MATCH expression for free text, or None if it has no searchable terms"""
+    terms = _TERM.findall(text or '')[:MAX_TERMS]
+    if not terms:
+        return None
+
+    quoted = ['"{}"'.format(term.replace('"', '""')) for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_books(conn, match, limit, offset=0):
+    """Book rows matching an FTS5 expression, best bm25 rank first"""
+    return conn.execute('''
+        SELECT b.* FROM books_fts
+        JOIN books b ON b.id = books_fts.rowid
+        WHERE books_fts MATCH ?
+        ORDER BY books_fts.rank
+        LIMIT ? OFFSET ?
+    ''', (match, limit, offset)).fetchall()
@@ -0,0 +1,126 @@
+"""
+Request coalescing for identical concurrent reads
+The first caller for a key (the leader) runs the computation; callers that
+arrive with the same key while it is in flight wait for it and share its
+result, or its exception, instead of repeating the query. Nothing is kept
+once the leader finishes - caching is the caller's business
+"""
+
+import asyncio
+import threading
+
+
+class _FlightStats:
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.coalesced_leaders = 0
+        self.max_absorbed = 0
+
+    def _record(self, absorbed):
+        with self._stats_lock:
+            if absorbed:
+                self.coalesced_leaders += 1
+                self.max_absorbed = max(self.max_absorbed, absorbed)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'coalescedLeaders': self.coalesced_leaders,
+                # followers absorbed per leader that had any
+                'meanAbsorbed': round(self.followers / self.coalesced_leaders, 2) if self.coalesced_leaders else 0.0,
+                'maxAbsorbed': self.max_absorbed,
+                'inFlight': len(self._calls),
+            }
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight(_FlightStats):
+    """Thread-based single-flight for the Flask apps"""
+
+    def __init__(self):
+        super().__init__()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return fn() - computed once for all concurrent callers with this key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                call.followers += 1
+                leader = False
+        with self._stats_lock:
+            if leader:
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            self._record(call.followers)
+            call.done.set()
+
+
+class AsyncSingleFlight(_FlightStats):
+    """asyncio single-flight for the async gateway; all callers share one event loop"""
+
+    def __init__(self):
+        super().__init__()
+        self._calls = {}  # key -> [future, followers]
+
+    async def do(self, key, fn):
+        """Return await fn() - awaited once for all concurrent callers with this key"""
+        call = self._calls.get(key)
+        if call is not None:
+            call[1] += 1
+            with self._stats_lock:
+                self.followers += 1
+            # shield: one follower going away must not cancel the leader's work
+            return await asyncio.shield(call[0])
+
+        call = self._calls[key] = [asyncio.get_running_loop().create_future(), 0]
+        with self._stats_lock:
+            self.leaders += 1
+        try:
+            result = await fn()
+            call[0].set_result(result)
+            return result
+        except asyncio.CancelledError:
+            call[0].cancel()
+            raise
+        except Exception as e:
+            call[0].set_exception(e)
+            call[0].exception()  # mark retrieved when nobody was waiting
+            raise
+        finally:
+            del self._calls[key]
+            self._record(call[1])
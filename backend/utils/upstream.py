@@ -0,0 +1,135 @@
+"""
+Keep-alive HTTP clients for the gateway's upstream services
+One requests.Session per service with a sized connection pool, so proxied
+calls reuse open TCP connections instead of handshaking on every request,
+and every call carries connect/read timeouts and goes through the service's
+bulkhead and circuit breaker
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.breaker import Bulkhead, CircuitBreaker, UpstreamUnavailable
+
+POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 32))
+CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 2.0))
+READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 10.0))
+
+
+class Upstream:
+    """Pooled session to one backend service; paths are relative to base_url"""
+
+    def __init__(self, name, base_url, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, breaker=None, bulkhead=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.bulkhead = bulkhead or Bulkhead()
+
+        # Every request goes to the same host, so one pool of pool_size sockets;
+        # extra concurrent callers open throwaway connections rather than block
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def request(self, method, path, **kwargs):
+        """Raises UpstreamUnavailable straight away if the bulkhead is full or
+        the breaker is open; 5xx responses and slow calls count against the breaker.
+        A stream=True response keeps its bulkhead slot, and its call keeps timing,
+        until the response is closed"""
+        kwargs.setdefault('timeout', self.timeout)
+        if not self.bulkhead.acquire():
+            raise UpstreamUnavailable('too many requests in flight')
+        try:
+            if not self.breaker.allow():
+                raise UpstreamUnavailable('circuit open', retry_after=self.breaker.retry_after())
+            with self._lock:
+                self.requests += 1
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, self.base_url + path, **kwargs)
+            except requests.exceptions.RequestException:
+                with self._lock:
+                    self.errors += 1
+                self.breaker.record(True, time.monotonic() - started)
+                raise
+        except BaseException:
+            self.bulkhead.release()
+            raise
+
+        finish = self._finisher(response.status_code >= 500, started)
+        if not kwargs.get('stream'):
+            finish()
+            return response
+
+        close = response.close
+
+        def close_and_finish():
+            try:
+                close()
+            finally:
+                finish()
+        response.close = close_and_finish
+        return response
+
+    def _finisher(self, failed, started):
+        """Records the call with the breaker and frees its bulkhead slot, once"""
+        pending = [True]
+
+        def finish():
+            with self._lock:
+                if not pending:
+                    return
+                pending.clear()
+            self.breaker.record(failed, time.monotonic() - started)
+            self.bulkhead.release()
+        return finish
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def stats(self):
+        pools = self.adapter.poolmanager.pools
+        opened = idle = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                # The pool queue is pre-filled with None placeholders; count real sockets
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+
+        with self._lock:
+            return {
+                'url': self.base_url,
+                'requests': self.requests,
+                'errors': self.errors,
+                'connectionsOpened': opened,
+                'idleConnections': idle,
+                'poolSize': self.pool_size,
+                'timeout': {'connect': self.timeout[0], 'read': self.timeout[1]},
+                'breaker': self.breaker.stats(),
+                'bulkhead': self.bulkhead.stats(),
+            }
+
+    def close(self):
+        self.session.close()
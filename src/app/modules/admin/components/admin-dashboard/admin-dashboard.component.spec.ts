@@ -15,7 +15,7 @@ describe('AdminDashboardComponent', () => {
   let mockAuthService: jasmine.SpyObj<AuthService>;
 
   beforeEach(async () => {
-    mockBookService = jasmine.createSpyObj('BookService', ['getAllBooks', 'getAllTransactions']);
+    mockBookService = jasmine.createSpyObj('BookService', ['getDashboard']);
     mockAuthService = jasmine.createSpyObj('AuthService', ['getAllMembers'], {
       currentUser: signal({
         id: '1',
@@ -29,9 +29,9 @@ describe('AdminDashboardComponent', () => {
       })
     });
 
-    mockBookService.getAllBooks.and.returnValue(of([]));
-    mockBookService.getAllTransactions.and.returnValue(of([]));
-    mockAuthService.getAllMembers.and.returnValue(of([]));
+    mockBookService.getDashboard.and.returnValue(of({
+      totalBooks: 6, availableBooks: 15, totalMembers: 2, activeTransactions: 1, unavailable: []
+    }));
 
     await TestBed.configureTestingModule({
       declarations: [AdminDashboardComponent],
@@ -52,8 +52,8 @@ describe('AdminDashboardComponent', () => {
   });
 
   it('should load dashboard data on init', () => {
-    expect(mockBookService.getAllBooks).toHaveBeenCalled();
-    expect(mockAuthService.getAllMembers).toHaveBeenCalled();
-    expect(mockBookService.getAllTransactions).toHaveBeenCalled();
+    expect(mockBookService.getDashboard).toHaveBeenCalled();
+    expect(component.totalBooks).toBe(6);
+    expect(component.totalMembers).toBe(2);
   });
 });
@@ -37,51 +37,27 @@ export class AdminDashboardComponent implements OnInit, OnDestroy {
 
   private loadDashboardData(): void {
     console.log('Loading admin dashboard data...');
-    
-    // Load books data
-    this.bookService.getAllBooks().pipe(
+
+    // One gateway call fetches books, members and transactions side by side
+    this.bookService.getDashboard().pipe(
       takeUntil(this.destroy$)
     ).subscribe({
-      next: (books) => {
-        console.log('Books loaded for admin dashboard:', books);
-        this.totalBooks = books.length;
-        this.availableBooks = books.reduce((sum, book) => sum + book.availableCopies, 0);
+      next: (summary) => {
+        console.log('Admin dashboard loaded:', summary);
+        this.totalBooks = summary.totalBooks;
+        this.availableBooks = summary.availableBooks;
+        this.totalMembers = summary.totalMembers;
+        this.activeTransactions = summary.activeTransactions;
+        if (summary.unavailable.length) {
+          console.warn('Dashboard sections unavailable:', summary.unavailable);
+        }
       },
       error: (error) => {
-        console.error('Error loading books for admin dashboard:', error);
+        console.error('Error loading admin dashboard:', error);
         // Set default values on error to prevent infinite loops
         this.totalBooks = 0;
         this.availableBooks = 0;
-      }
-    });
-
-    // Load members data
-    console.log('Loading members for admin dashboard...');
-    this.authService.getAllMembers().pipe(
-      takeUntil(this.destroy$)
-    ).subscribe({
-      next: (members) => {
-        console.log('Members loaded for admin dashboard:', members);
-        this.totalMembers = members.filter(m => m.isActive).length;
-        console.log('Total active members:', this.totalMembers);
-      },
-      error: (error) => {
-        console.error('Error loading members for admin dashboard:', error);
         this.totalMembers = 0;
-      }
-    });
-
-    // Load transactions data
-    this.bookService.getAllTransactions().pipe(
-      takeUntil(this.destroy$)
-    ).subscribe({
-      next: (transactions) => {
-        console.log('Transactions loaded for admin dashboard:', transactions);
-        this.activeTransactions = transactions.filter(t => t.status === 'active').length;
-      },
-      error: (error) => {
-        console.error('Error loading transactions for admin dashboard:', error);
-        // Set default values on error to prevent infinite loops
         this.activeTransactions = 0;
       }
     });
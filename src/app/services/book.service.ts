@@ -46,6 +46,26 @@ interface BackendTransaction {
   };
 }
 
+// GET /api/dashboard - a section the gateway couldn't fetch comes back as { error }
+interface SectionError {
+  error: string;
+}
+
+interface BackendDashboard {
+  books: { totalBooks: number; availableCopies: number } | SectionError;
+  members: { totalMembers: number; activeMembers: number } | SectionError;
+  transactions: { totalTransactions: number; activeTransactions: number } | SectionError;
+  partial: boolean;
+}
+
+export interface AdminDashboardSummary {
+  totalBooks: number;
+  availableBooks: number;
+  totalMembers: number;
+  activeTransactions: number;
+  unavailable: string[];
+}
+
 @Injectable({
   providedIn: 'root'
 })
@@ -270,6 +290,28 @@ export class BookService {
     );
   }
 
+  // Admin dashboard: book, member and transaction totals in one gateway round trip
+  getDashboard(): Observable<AdminDashboardSummary> {
+    return this.http.get<BackendDashboard>(`${this.apiUrl}/dashboard`, { headers: this.getAuthHeaders() }).pipe(
+      map(dashboard => {
+        const books = 'error' in dashboard.books ? null : dashboard.books;
+        const members = 'error' in dashboard.members ? null : dashboard.members;
+        const transactions = 'error' in dashboard.transactions ? null : dashboard.transactions;
+        return {
+          totalBooks: books?.totalBooks ?? 0,
+          availableBooks: books?.availableCopies ?? 0,
+          totalMembers: members?.activeMembers ?? 0,
+          activeTransactions: transactions?.activeTransactions ?? 0,
+          unavailable: (['books', 'members', 'transactions'] as const).filter(section => 'error' in dashboard[section])
+        };
+      }),
+      catchError((error: any) => {
+        console.error('Error fetching admin dashboard:', error);
+        return throwError(() => new Error(error.error?.error || 'Failed to fetch dashboard'));
+      })
+    );
+  }
+
   // Transaction operations
   getAllTransactions(): Observable<TransactionWithDetails[]> {
     this.isLoadingSignal.set(true);
@@ -151,26 +151,25 @@ export class CorrectedBookService {
 
   searchBooks(query: string, category?: BookCategory): Observable<Book[]> {
     this.isLoadingSignal.set(true);
-    // For now, we'll fetch all books and filter client-side
-    // In a real implementation, you'd add query parameters to the API
-    return this.getAllBooks().pipe(
-      map(books => {
-        let filteredBooks = books;
+    const filterByCategory = (books: Book[]) =>
+      category ? books.filter(book => book.category === category) : books;
 
-        if (query) {
-          const searchQuery = query.toLowerCase();
-          filteredBooks = filteredBooks.filter(book => 
-            book.title.toLowerCase().includes(searchQuery) ||
-            book.author.toLowerCase().includes(searchQuery) ||
-            book.isbn.includes(searchQuery)
-          );
-        }
-
-        if (category) {
-          filteredBooks = filteredBooks.filter(book => book.category === category);
-        }
+    if (!query.trim()) {
+      return this.getAllBooks().pipe(map(filterByCategory));
+    }
 
-        return filteredBooks;
+    // Ranked full-text search runs server-side; only the best matches come back
+    return this.http.get<{ items: BackendBook[]; next: string | null }>(
+      `${this.apiUrl}/books/search`, { params: { q: query, limit: 100 } }
+    ).pipe(
+      map(page => {
+        this.isLoadingSignal.set(false);
+        return filterByCategory(page.items.map(book => this.convertBackendBook(book)));
+      }),
+      catchError((error: any) => {
+        this.isLoadingSignal.set(false);
+        console.error('Error searching books:', error);
+        return throwError(() => new Error(error.error?.error || 'Failed to search books'));
       })
     );
   }